@@ -0,0 +1,185 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _pairs_clause(pairs, prefix=''):
+    return f"({prefix}student_id, {prefix}subject_id) IN ({', '.join(['(%s, %s)'] * len(pairs))})"
+
+
+class AbsenceStreakTracker:
+    """
+    Maintains absence_streaks, the number of consecutive absent sessions per
+    (student, subject) together with present / total session counts, as
+    attendance rows are written. Sessions appended in date order update the
+    row in O(1); corrections to older sessions, or a latest session flipping
+    from present to absent, recompute just the affected pairs from
+    attendance.
+
+    `record` runs inside the caller's transaction, so the streaks commit or
+    roll back with the attendance rows. Hooks registered with `subscribe` are
+    called as `hook(cursor, events)`, also inside that transaction, whenever
+    a write leaves a streak at or above `threshold` and longer than before.
+    """
+
+    def __init__(self, threshold=3):
+        self.threshold = threshold
+        self._hooks = []
+
+    def subscribe(self, hook):
+        self._hooks.append(hook)
+        return hook
+
+    def record(self, cursor, rows):
+        """
+        Feed attendance rows (student_id, subject_id, date, status) that were
+        just written through `cursor`. Returns the threshold events as dicts
+        with student_id, subject_id, streak and date.
+        """
+        if not rows:
+            return []
+
+        # Keyed by date, so a session written twice in `rows` counts once with
+        # the status written last
+        by_pair = {}
+        for student_id, subject_id, date, status in rows:
+            by_pair.setdefault((int(student_id), int(subject_id)), {})[date] = 1 if status else 0
+        pairs = sorted(by_pair)
+        params = [value for pair in pairs for value in pair]
+
+        cursor.execute(f"""
+            SELECT student_id, subject_id, current_streak, present_count, total_count,
+                   last_date, last_status
+            FROM absence_streaks
+            WHERE {_pairs_clause(pairs)}
+            FOR UPDATE
+        """, params)
+        previous = {(row['student_id'], row['subject_id']): row for row in cursor.fetchall()}
+
+        states = {}
+        stale = []
+        for pair in pairs:
+            state = previous.get(pair)
+            streak = state['current_streak'] if state else 0
+            present = state['present_count'] if state else 0
+            total = state['total_count'] if state else 0
+            last_date = state['last_date'] if state else None
+            last_status = state['last_status'] if state else None
+            for date, status in sorted(by_pair[pair].items()):
+                if last_date is None or date > last_date:
+                    # A session newer than any seen is a new attendance row
+                    streak = 0 if status else streak + 1
+                    present += status
+                    total += 1
+                elif date == last_date and (status or not last_status):
+                    # Same session rewritten: present clears the streak,
+                    # absent over absent leaves it as is
+                    streak = 0 if status else streak
+                    present += status - last_status
+                else:
+                    stale.append(pair)
+                    break
+                last_date, last_status = date, status
+            else:
+                states[pair] = (streak, present, total, last_date, last_status)
+
+        if stale:
+            states.update(self._recompute(cursor, stale))
+
+        cursor.execute(f"""
+            INSERT INTO absence_streaks
+            (student_id, subject_id, current_streak, present_count, total_count, last_date, last_status)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(states))}
+            ON DUPLICATE KEY UPDATE
+                current_streak = VALUES(current_streak),
+                present_count = VALUES(present_count),
+                total_count = VALUES(total_count),
+                last_date = VALUES(last_date),
+                last_status = VALUES(last_status)
+        """, [value for pair, state in sorted(states.items()) for value in pair + state])
+
+        events = []
+        for pair, (streak, _, _, last_date, _) in sorted(states.items()):
+            before = previous[pair]['current_streak'] if pair in previous else 0
+            if streak >= self.threshold and streak > before:
+                events.append({
+                    "student_id": pair[0],
+                    "subject_id": pair[1],
+                    "streak": streak,
+                    "date": last_date
+                })
+
+        if events:
+            for hook in self._hooks:
+                hook(cursor, events)
+        return events
+
+    def _recompute(self, cursor, pairs):
+        """
+        Rebuild `pairs` from attendance. The streak is the absent sessions
+        after the most recent present one.
+        """
+        params = [value for pair in pairs for value in pair]
+        cursor.execute(f"""
+            SELECT
+                a.student_id,
+                a.subject_id,
+                SUM(a.status = 0 AND a.date > COALESCE(p.last_present, '1000-01-01')) as current_streak,
+                SUM(a.status = 1) as present_count,
+                COUNT(*) as total_count,
+                MAX(a.date) as last_date,
+                MAX(a.date) = MAX(p.last_present) as last_status
+            FROM attendance a
+            LEFT JOIN (
+                SELECT student_id, subject_id, MAX(date) as last_present
+                FROM attendance
+                WHERE status = 1 AND {_pairs_clause(pairs)}
+                GROUP BY student_id, subject_id
+            ) p ON p.student_id = a.student_id AND p.subject_id = a.subject_id
+            WHERE {_pairs_clause(pairs, 'a.')}
+            GROUP BY a.student_id, a.subject_id
+        """, params + params)
+        logger.info(f"Recomputed absence streaks for {len(pairs)} student/subject pairs")
+        return {
+            (row['student_id'], row['subject_id']): (
+                int(row['current_streak'] or 0),
+                int(row['present_count'] or 0),
+                row['total_count'],
+                row['last_date'],
+                1 if row['last_status'] else 0
+            )
+            for row in cursor.fetchall()
+        }
+
+    def at_risk(self, cursor, teacher_id=None, student_id=None, min_streak=None):
+        """
+        Students whose current streak is at least `min_streak` (default
+        `threshold`), optionally limited to one teacher's subjects or one
+        student. Served from absence_streaks, no attendance scan.
+        """
+        conditions = ["st.current_streak >= %s"]
+        params = [min_streak or self.threshold]
+        if teacher_id is not None:
+            conditions.append("sub.teacher_id = %s")
+            params.append(teacher_id)
+        if student_id is not None:
+            conditions.append("st.student_id = %s")
+            params.append(student_id)
+
+        cursor.execute(f"""
+            SELECT
+                st.student_id,
+                s.name as student_name,
+                s.roll_number,
+                st.subject_id,
+                sub.name as subject_name,
+                sub.code as subject_code,
+                st.current_streak,
+                st.last_date
+            FROM absence_streaks st
+            JOIN students s ON st.student_id = s.id
+            JOIN subjects sub ON st.subject_id = sub.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY st.current_streak DESC, s.name
+        """, params)
+        return cursor.fetchall()
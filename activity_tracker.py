@@ -0,0 +1,176 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    """
+    In-memory per-(student, subject) inactivity state machine.
+
+    A student becomes inactive after `inactive_threshold` consecutive inactive
+    frames and only counts as active again after `recover_frames` consecutive
+    active frames, so a single noisy detection neither raises nor clears an
+    alert. Alerts for the same student/subject are at least `alert_cooldown`
+    seconds apart. Each detection is handed to `log_writer` for
+    class_monitoring_logs; the students row is updated every `flush_interval`
+    seconds.
+    """
+
+    def __init__(self, pool, log_writer, window=10, inactive_threshold=5, recover_frames=2,
+                 alert_cooldown=600, flush_interval=15, state_ttl=7200):
+        self.pool = pool
+        self.log_writer = log_writer
+        self.window = window
+        self.inactive_threshold = inactive_threshold
+        self.recover_frames = recover_frames
+        self.alert_cooldown = alert_cooldown
+        self.flush_interval = flush_interval
+        self.state_ttl = state_ttl
+
+        self._states = {}
+        self._pending_students = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def _state(self, key):
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = {
+                'recent': deque(maxlen=self.window),
+                'inactive_streak': 0,
+                'active_streak': 0,
+                'inactive': False,
+                'last_alert': None,
+                'last_seen': 0.0
+            }
+        return state
+
+    def record(self, student_id, subject_id, is_active):
+        """
+        Feed one detection and return the resulting verdict. When `alert` is
+        true the caller is expected to notify the mentor, and to call
+        `alert_failed` if that does not work out.
+        """
+        self._ensure_flusher()
+        student_id = int(student_id)
+        subject_id = int(subject_id) if subject_id else None
+        now = time.time()
+        timestamp = datetime.now()
+
+        with self._lock:
+            state = self._state((student_id, subject_id))
+            state['recent'].append(is_active)
+            state['last_seen'] = now
+
+            if is_active:
+                state['active_streak'] += 1
+                if state['active_streak'] >= self.recover_frames:
+                    state['inactive_streak'] = 0
+                    state['inactive'] = False
+            else:
+                state['active_streak'] = 0
+                state['inactive_streak'] += 1
+                if state['inactive_streak'] >= self.inactive_threshold:
+                    state['inactive'] = True
+
+            alert = (
+                state['inactive']
+                and state['inactive_streak'] >= self.inactive_threshold
+                and (state['last_alert'] is None or now - state['last_alert'] >= self.alert_cooldown)
+            )
+            if alert:
+                state['previous_alert'] = state['last_alert']
+                state['last_alert'] = now
+                state['inactive_streak'] = 0
+
+            pending = self._pending_students.setdefault(student_id, {'last_active': None})
+            pending['inactivity_count'] = state['inactive_streak']
+            if is_active:
+                pending['last_active'] = timestamp
+
+            recent = state['recent']
+            verdict = {
+                "inactivity_count": state['inactive_streak'],
+                "inactive": state['inactive'],
+                "alert": alert,
+                "active_ratio": round(sum(recent) / len(recent), 2)
+            }
+
+        if subject_id:
+            self.log_writer.append(student_id, subject_id, 'active' if is_active else 'inactive', timestamp)
+        return verdict
+
+    def alert_failed(self, student_id, subject_id):
+        student_id = int(student_id)
+        subject_id = int(subject_id) if subject_id else None
+        with self._lock:
+            state = self._states.get((student_id, subject_id))
+            if state is not None:
+                state['last_alert'] = state.pop('previous_alert', None)
+                state['inactive_streak'] = self.inactive_threshold
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name='activity-flusher', daemon=True)
+                self._flusher.start()
+                atexit.register(self.stop)
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            students, self._pending_students = self._pending_students, {}
+            cutoff = time.time() - self.state_ttl
+            for key in [k for k, v in self._states.items() if v['last_seen'] < cutoff]:
+                del self._states[key]
+
+        if not students:
+            return
+
+        try:
+            with self.pool.acquire() as db:
+                cursor = db.cursor()
+                try:
+                    cursor.executemany("""
+                        UPDATE students
+                        SET inactivity_count = %s,
+                            last_active = COALESCE(%s, last_active)
+                        WHERE id = %s
+                    """, [
+                        (values['inactivity_count'], values['last_active'], student_id)
+                        for student_id, values in students.items()
+                    ])
+                    db.commit()
+                finally:
+                    cursor.close()
+            logger.info(f"Flushed activity state for {len(students)} students")
+        except Exception as e:
+            logger.error(f"Activity flush failed, re-queueing {len(students)} students: {e}")
+            with self._lock:
+                for student_id, values in students.items():
+                    newer = self._pending_students.setdefault(student_id, values)
+                    if newer['last_active'] is None:
+                        newer['last_active'] = values['last_active']
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "tracked": len(self._states),
+                "inactive": sum(1 for s in self._states.values() if s['inactive']),
+                "pending_students": len(self._pending_students)
+            }
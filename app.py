@@ -1,25 +1,39 @@
-from flask import Flask, request, jsonify
+import time
+_import_started = time.perf_counter()
+from flask import Flask, Blueprint, Request, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-import mysql.connector
-from datetime import datetime
-import cv2
-import numpy as np
+from datetime import datetime, timedelta
 import logging
 from twilio.rest import Client
-import requests
 import json
 from werkzeug.security import  check_password_hash
 import os
 from werkzeug.utils import secure_filename
-app = Flask(__name__)
-CORS(app)
+from werkzeug.exceptions import RequestEntityTooLarge
+from mysql.connector import errorcode, IntegrityError
+import db_pool
+from db_pool import get_db, release_db
+from detection import DetectionEngine, FrameDropped
+from activity_tracker import ActivityTracker
+import monitoring_logs
+from monitoring_logs import MonitoringLogWriter, PartitionManager
+import notifications
+import recovery
+from schedule_index import ScheduleIndex
+from absence_streaks import AbsenceStreakTracker
+import attendance_summary
+import response_cache
+from course_catalog import CourseCatalog
+from attendance_summary import AttendanceSummaryCache
+from uploads import UploadStore, UploadTooLarge, UploadOffsetMismatch
+from blob_store import BlobStore
+api = Blueprint('api', __name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 TWILIO_ACCOUNT_SID = ''
 TWILIO_AUTH_TOKEN = ''
 TWILIO_PHONE_NUMBER = ''
 API_KEY = ''
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 DB_CONFIG = {
     'host': 'localhost',
     'user': 'root',
@@ -33,14 +47,394 @@ DB_CONFIG = {
 #     'database': '',
 #     'port': ,
 # }
-def get_db_connection():
+DB_POOL_CONFIG = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'timeout': 5.0,
+    'recycle': 1800,
+    'idle_timeout': 300,
+    'pre_ping': True
+}
+connection_pool = db_pool.ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+
+if TWILIO_ACCOUNT_SID:
+    notification_transport = notifications.TwilioTransport(
+        Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN), TWILIO_PHONE_NUMBER
+    )
+else:
+    notification_transport = notifications.FakeTransport()
+NOTIFICATION_CONFIG = {
+    'batch_size': 20,
+    'poll_interval': 5,
+    'max_attempts': 5,
+    'backoff_base': 30,
+    'rate_limit': 5,
+    'rate_window': 3600
+}
+notification_dispatcher = notifications.NotificationDispatcher(
+    connection_pool, notification_transport, **NOTIFICATION_CONFIG
+)
+
+RECOVERY_CONFIG = {
+    'max_concurrency': 4,
+    'call_timeout': 10,
+    'request_budget': 4.0,
+    'question_ttl': 7 * 24 * 3600
+}
+if API_KEY:
+    question_provider = recovery.GeminiQuestionProvider(
+        API_KEY,
+        timeout=RECOVERY_CONFIG['call_timeout'],
+        max_connections=RECOVERY_CONFIG['max_concurrency']
+    )
+else:
+    question_provider = recovery.StubQuestionProvider()
+def assignment_created(subject_id, assignment_id):
+    with connection_pool.acquire() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            tags = assignment_tags(cursor, assignment_id)
+        finally:
+            cursor.close()
+    if tags:
+        api_cache.invalidate(*tags)
+
+recovery_generator = recovery.RecoveryAssignmentGenerator(
+    connection_pool,
+    question_provider,
+    recovery.QuestionBank(ttl=RECOVERY_CONFIG['question_ttl']),
+    max_concurrency=RECOVERY_CONFIG['max_concurrency'],
+    on_created=assignment_created
+)
+
+# Reloads go through cache_versions, so /admin/schedule/reload reaches every
+# process within check_interval seconds
+schedule_index = ScheduleIndex(
+    connection_pool,
+    ttl=600,
+    versions=response_cache.DatabaseVersions(connection_pool),
+    check_interval=10
+)
+
+# gunicorn.conf.py exports its worker count; 1 for `python app.py`
+WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', '1'))
+# The activity tracker keeps each student's streaks and alert cooldowns in
+# process memory, so every frame has to reach the same process. With several
+# workers that process is monitor_ws.py (the client's only path), and the
+# HTTP frame endpoints are turned off.
+HTTP_FRAME_INGEST = WEB_WORKERS == 1
+
+DETECTION_CONFIG = {
+    # Detection processes per server process: the cores but one, shared by
+    # the web workers so 4 workers do not start 4 full-size pools (with
+    # HTTP_FRAME_INGEST off they start none). DETECTION_WORKERS overrides it,
+    # e.g. when monitor_ws.py shares the host with other CPU-bound services.
+    'workers': int(os.environ.get('DETECTION_WORKERS', '0')) or max(1, ((os.cpu_count() or 2) - 1) // WEB_WORKERS),
+    'max_pending': 16,
+    'timeout': 5.0,
+    # Frames are detected at this width at most; see detection.DEFAULT_PREPROCESS
+    # and benchmark_detection.py for picking the values
+    'preprocess': {
+        'target_width': 640,
+        'max_reduce': 4
+    },
+    # Per-student face tracking: search around the last face box, with a
+    # full-frame scan every `full_scan_every` frames or after a miss
+    'tracking': {
+        'margin': 0.5,
+        'full_scan_every': 10,
+        'ttl': 30
+    }
+}
+detection_engine = DetectionEngine(**DETECTION_CONFIG)
+ABSENCE_STREAK_CONFIG = {
+    'threshold': 3
+}
+absence_tracker = AbsenceStreakTracker(**ABSENCE_STREAK_CONFIG)
+ATTENDANCE_SUMMARY_CONFIG = {
+    'threshold': ABSENCE_STREAK_CONFIG['threshold'],
+    'ttl': 60,
+    'max_entries': 10000
+}
+# Versions in cache_versions, so every worker drops a student's summary
+attendance_summaries = AttendanceSummaryCache(
+    versions=response_cache.DatabaseVersions(connection_pool),
+    **ATTENDANCE_SUMMARY_CONFIG
+)
+ATTENDANCE_PAGE_SIZE = 50
+# Cached responses are kept per process, with tag versions in the database
+# (cache_versions) so an invalidation reaches every gunicorn worker; each
+# lookup costs one primary-key read. Set 'redis_url' to share the responses
+# themselves between processes instead.
+RESPONSE_CACHE_CONFIG = {
+    'redis_url': None,
+    'max_entries': 5000,
+    'default_ttl': 60
+}
+api_cache = response_cache.ResponseCache(
+    response_cache.create_backend(
+        RESPONSE_CACHE_CONFIG['redis_url'],
+        max_entries=RESPONSE_CACHE_CONFIG['max_entries'],
+        pool=connection_pool
+    ),
+    default_ttl=RESPONSE_CACHE_CONFIG['default_ttl']
+)
+
+# Set COURSE_CATALOG_PATH to a JSON file shaped like
+# course_catalog.DEFAULT_TEMPLATES to replace the built-in courses
+COURSE_CATALOG_PATH = None
+course_catalog = CourseCatalog.load(COURSE_CATALOG_PATH) if COURSE_CATALOG_PATH else CourseCatalog()
+
+# Submissions stream to uploads/.partial and are renamed into the blob store
+# (uploads/blobs, same filesystem). Large files should use the resumable
+# /student/uploads API in chunk_size pieces.
+UPLOAD_CONFIG = {
+    'root': 'uploads',
+    'max_bytes': 25 * 1024 * 1024,
+    'chunk_size': 1024 * 1024,
+    'session_ttl': 24 * 3600
+}
+SUBMISSION_EXTENSIONS = {'.pdf', '.doc', '.docx'}
+upload_store = UploadStore(**UPLOAD_CONFIG)
+BLOB_STORE_CONFIG = {
+    'root': os.path.join(UPLOAD_CONFIG['root'], 'blobs'),
+    'grace': 3600,
+    'gc_interval': 6 * 3600
+}
+blob_store = BlobStore(connection_pool, **BLOB_STORE_CONFIG)
+# Endpoints whose multipart file parts are parsed straight into upload_store
+STREAMED_UPLOAD_ENDPOINTS = {'api.submit_assignment'}
+
+class UploadRequest(Request):
+    """
+    Writes file parts for STREAMED_UPLOAD_ENDPOINTS into upload_store while
+    Werkzeug parses the body, hashed and size-capped as they arrive, instead
+    of spooling them to a temporary file first. Other endpoints keep
+    Werkzeug's default (in memory when small).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in STREAMED_UPLOAD_ENDPOINTS:
+            return upload_store.open_part()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+# Blobs never change, so downloads can be cached for long
+SUBMISSION_FILE_MAX_AGE = 7 * 24 * 3600
+
+def student_tags(args):
+    student_id = args.get('student_id')
+    return [f"student:{student_id}"] if student_id else None
+
+def student_assignment_tags(args):
+    # Assignments are listed per teacher; "teacher:<id>" is bumped when an
+    # assignment of one of their subjects is created or changed
+    student_id = args.get('student_id')
+    teacher_id = args.get('teacher_id')
+    return [f"student:{student_id}", f"teacher:{teacher_id}"] if student_id and teacher_id else None
+
+def assignment_tags(cursor, assignment_id):
+    """
+    Tags of the cached views listing `assignment_id`, i.e. its subject's
+    teacher.
+    """
+    cursor.execute("""
+        SELECT s.teacher_id
+        FROM assignments a
+        JOIN subjects s ON a.subject_id = s.id
+        WHERE a.id = %s
+    """, (assignment_id,))
+    row = cursor.fetchone()
+    return [f"teacher:{row['teacher_id']}"] if row and row['teacher_id'] else []
+
+def teacher_user_tags(args):
+    user_id = args.get('user_id')
+    return [f"teacher-user:{user_id}", 'students'] if user_id else None
+ATTENDANCE_MAX_PAGE_SIZE = 200
+INACTIVITY_THRESHOLD = 5
+MAX_BATCH_FRAMES = 200
+MONITORING_LOG_CONFIG = {
+    'batch_size': 500,
+    'flush_interval': 5,
+    'max_buffer': 50000,
+    'max_retries': 3
+}
+monitoring_log_writer = MonitoringLogWriter(connection_pool, **MONITORING_LOG_CONFIG)
+MONITORING_PARTITION_CONFIG = {
+    'months_ahead': 2,
+    'retention_months': 6,
+    'interval': 6 * 3600
+}
+monitoring_partitions = PartitionManager(connection_pool, **MONITORING_PARTITION_CONFIG)
+MONITORING_LOG_PAGE_SIZE = 200
+MONITORING_LOG_MAX_PAGE_SIZE = 1000
+ACTIVITY_TRACKER_CONFIG = {
+    'window': 10,
+    'inactive_threshold': INACTIVITY_THRESHOLD,
+    'recover_frames': 2,
+    'alert_cooldown': 600,
+    'flush_interval': 15
+}
+activity_tracker = ActivityTracker(connection_pool, monitoring_log_writer, **ACTIVITY_TRACKER_CONFIG)
+
+# Everything above is lazy: no connection, process or thread exists until
+# first use or warm_up().
+startup_timings = {}
+
+def warm_up(detection=None):
+    """
+    Eagerly initialize this process's services: open pooled connections,
+    load the schedule index, spawn detection workers (which load the
+    cascades) and start the background services. Meant for a server's
+    post-fork hook so a new worker is fully warm before taking traffic.
+    Detection workers are only spawned where frames are analyzed
+    (`detection`, default HTTP_FRAME_INGEST).
+    """
+    if detection is None:
+        detection = HTTP_FRAME_INGEST
+    started = time.perf_counter()
+    timings = {}
+
+    step = time.perf_counter()
+    connection_pool.prefill(DB_POOL_CONFIG['pool_size'])
+    timings['db_pool_ms'] = round((time.perf_counter() - step) * 1000, 2)
+
+    step = time.perf_counter()
+    schedule_index.load()
+    timings['schedule_index_ms'] = round((time.perf_counter() - step) * 1000, 2)
+
+    if detection:
+        step = time.perf_counter()
+        detection_engine.warm_up()
+        timings['detection_ms'] = round((time.perf_counter() - step) * 1000, 2)
+
+    start_background_services()
+
+    timings['total_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    startup_timings['warm_up'] = timings
+    logger.info(f"Warm-up finished: {timings}")
+    return timings
+
+def start_background_services():
+    notification_dispatcher.start()
+    monitoring_partitions.start()
+    blob_store.start()
+
+def create_app(warm=False):
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    # Werkzeug rejects bigger bodies before reading them; the margin covers
+    # multipart framing around a max-size file
+    app.config['MAX_CONTENT_LENGTH'] = UPLOAD_CONFIG['max_bytes'] + 64 * 1024
+    CORS(app)
+    db_pool.init_app(app, connection_pool)
+    app.register_blueprint(api)
+
+    @app.before_request
+    def _on_first_request():
+        if 'first_request_ms' not in startup_timings:
+            startup_timings['first_request_ms'] = round((time.perf_counter() - _import_started) * 1000, 2)
+            start_background_services()
+
+    startup_timings['import_ms'] = round((started - _import_started) * 1000, 2)
+    startup_timings['create_app_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    if warm:
+        warm_up()
+    startup_timings['ready_ms'] = round((time.perf_counter() - _import_started) * 1000, 2)
+    return app
+
+@api.route('/metrics/startup', methods=['GET'])
+def get_startup_metrics():
+    return jsonify({
+        "status": "success",
+        "data": startup_timings
+    })
+
+@api.route('/metrics/db-pool', methods=['GET'])
+def get_db_pool_metrics():
+    return jsonify({
+        "status": "success",
+        "data": connection_pool.metrics()
+    })
+
+@api.route('/metrics/detection', methods=['GET'])
+def get_detection_metrics():
+    return jsonify({
+        "status": "success",
+        "data": detection_engine.metrics()
+    })
+
+@api.route('/metrics/activity', methods=['GET'])
+def get_activity_metrics():
+    return jsonify({
+        "status": "success",
+        "data": activity_tracker.metrics()
+    })
+
+@api.route('/metrics/monitoring-logs', methods=['GET'])
+def get_monitoring_log_metrics():
+    return jsonify({
+        "status": "success",
+        "data": {
+            "writer": monitoring_log_writer.metrics(),
+            "partitions": monitoring_partitions.metrics()
+        }
+    })
+
+@api.route('/metrics/attendance-summaries', methods=['GET'])
+def get_attendance_summary_metrics():
+    return jsonify({
+        "status": "success",
+        "data": attendance_summaries.metrics()
+    })
+
+@api.route('/metrics/response-cache', methods=['GET'])
+def get_response_cache_metrics():
+    return jsonify({
+        "status": "success",
+        "data": api_cache.metrics()
+    })
+
+@api.route('/admin/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    # For changes made outside the API, e.g. marks imported into
+    # internal_assessments: {"tags": ["student:3", ...]}
+    tags = (request.json or {}).get('tags')
+    if not isinstance(tags, list) or not tags:
+        return jsonify({
+            "status": "error",
+            "message": "Tags are required"
+        }), 400
+    api_cache.invalidate(*[str(tag) for tag in tags])
+    return jsonify({
+        "status": "success",
+        "message": f"Invalidated {len(tags)} tags"
+    })
+
+@api.route('/metrics/notifications', methods=['GET'])
+def get_notification_metrics():
+    return jsonify({
+        "status": "success",
+        "data": notification_dispatcher.metrics()
+    })
+
+@api.route('/admin/schedule/reload', methods=['POST'])
+def reload_schedule():
+    # Call after editing subject_schedule, subjects or student classes
+    schedule_index.invalidate()
+    return jsonify({
+        "status": "success",
+        "message": "Schedule index will reload on next lookup"
+    })
+
+def parse_questions(description):
+    # Recovery assignments store a JSON list; teacher-created ones are plain text
     try:
-        return mysql.connector.connect(**DB_CONFIG)
-    except Exception as e:
-        logger.error(f"Database connection error: {e}")
-        raise
+        questions = json.loads(description)
+    except (TypeError, ValueError):
+        return [description] if description else []
+    return questions if isinstance(questions, list) else [str(questions)]
 
-@app.route('/student/recovery-assignments', methods=['GET'])
+@api.route('/student/recovery-assignments', methods=['GET'])
 def get_recovery_assignments():
     try:
         student_id = request.args.get('student_id')
@@ -52,142 +446,86 @@ def get_recovery_assignments():
                 "message": "Student ID is required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         
-        # Query for absent subjects
+        # Subjects on an absence streak (kept up to date by absence_tracker)
+        # together with their recent assignments and this student's
+        # submission state, in a single round-trip
         cursor.execute("""
-            WITH ConsecutiveAbsences AS (
-                SELECT 
-                    a.subject_id,
-                    s.name as subject_name,
-                    s.code as subject_code,
-                    COUNT(*) as absent_count,
-                    GROUP_CONCAT(a.date ORDER BY a.date) as absent_dates
-                FROM attendance a
-                JOIN subjects s ON a.subject_id = s.id
-                WHERE a.student_id = %s 
-                    AND a.status = 0 
-                    AND a.date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-                GROUP BY a.subject_id
-                HAVING COUNT(*) >= 3
-            )
-            SELECT * FROM ConsecutiveAbsences
-        """, (student_id,))
-
-        absent_subjects = cursor.fetchall()
-        logger.info(f"Found {len(absent_subjects)} subjects with consecutive absences")
+            SELECT 
+                ca.subject_id,
+                s.name as subject_name,
+                s.code as subject_code,
+                asg.id,
+                asg.title,
+                asg.description,
+                asg.due_date,
+                COALESCE(sub.id IS NOT NULL, FALSE) as is_submitted
+            FROM absence_streaks ca
+            JOIN subjects s ON ca.subject_id = s.id
+            LEFT JOIN assignments asg ON asg.subject_id = ca.subject_id
+                AND asg.created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+            LEFT JOIN assignment_submissions sub ON asg.id = sub.assignment_id 
+                AND sub.student_id = %s
+            WHERE ca.student_id = %s
+                AND ca.current_streak >= %s
+                AND ca.last_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+            ORDER BY ca.subject_id, asg.created_at DESC
+        """, (student_id, student_id, absence_tracker.threshold))
+
+        rows = cursor.fetchall()
         
         assignments_list = []
-        for subject in absent_subjects:
-            logger.info(f"Processing subject: {subject['subject_name']}")
-            
-            # Check for existing assignments
-            cursor.execute("""
-                SELECT 
-                    a.id,
-                    a.title,
-                    a.description,
-                    a.due_date,
-                    s.name as subject_name,
-                    s.code as subject_code,
-                    COALESCE(sub.id IS NOT NULL, FALSE) as is_submitted
-                FROM assignments a
-                JOIN subjects s ON a.subject_id = s.id
-                LEFT JOIN assignment_submissions sub ON a.id = sub.assignment_id 
-                    AND sub.student_id = %s
-                WHERE a.subject_id = %s
-                AND a.created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-            """, (student_id, subject['subject_id']))
-
-            existing_assignment = cursor.fetchone()
-            logger.info(f"Existing assignment found: {existing_assignment is not None}")
-
-            if not existing_assignment:
-                logger.info(f"Generating new assignment for {subject['subject_name']}")
-                
-                try:
-                    headers = {
-                        "Content-Type": "application/json"
-                    }
-
-                    payload = {
-                        "contents": [{
-                            "parts": [{
-                                "text": f"""Generate 5 random questions about {subject['subject_name']}.
-                                Include a mix of:
-                                - Easy questions (basic understanding)
-                                - Medium questions (application-based)
-                                - Hard questions (analysis and problem-solving)
-                                Make each question different in difficulty and concept.
-                                Return only the questions, one per line."""
-                            }]
-                        }]
-                    }
-
-                    logger.info("Sending request to Gemini API")
-                    response = requests.post(
-                        f"https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent?key={API_KEY}",
-                        headers=headers,
-                        json=payload,
-                        timeout=30
-                    )
-                    logger.info(f"Gemini API response status: {response.status_code}")
-                    logger.info(f"Gemini API response: {response.text}")
-
-                    if response.status_code == 200:
-                        response_json = response.json()
-                        questions = response_json.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '').strip().split('\n')
-                        questions = [q.strip() for q in questions if q.strip()][:5]
-                        
-                        logger.info(f"Generated {len(questions)} questions")
-                        logger.info(f"Questions: {questions}")
-
-                        # Insert new assignment
-                        cursor.execute("""
-                            INSERT INTO assignments 
-                            (subject_id, title, description, due_date, status, created_at)
-                            VALUES (%s, %s, %s, DATE_ADD(CURDATE(), INTERVAL 7 DAY), 'pending', CURDATE())
-                        """, (
-                            subject['subject_id'],
-                            f"Recovery Assignment - {subject['subject_name']}",
-                            json.dumps(questions)
-                        ))
-                        db.commit()
-                        logger.info("New assignment inserted successfully")
-
-                        # Fetch the newly created assignment
-                        cursor.execute("""
-                            SELECT 
-                                a.id,
-                                a.title,
-                                a.description,
-                                a.due_date,
-                                s.name as subject_name,
-                                s.code as subject_code,
-                                FALSE as is_submitted
-                            FROM assignments a
-                            JOIN subjects s ON a.subject_id = s.id
-                            WHERE a.id = LAST_INSERT_ID()
-                        """)
-                        new_assignment = cursor.fetchone()
-                        if new_assignment:
-                            new_assignment['questions'] = questions
-                            assignments_list.append(new_assignment)
-                            logger.info("New assignment added to list")
+        missing_subjects = []
+        absent_subject_ids = set()
+        for row in rows:
+            absent_subject_ids.add(row['subject_id'])
+            if row['id'] is None:
+                missing_subjects.append((row['subject_id'], row['subject_name']))
+                continue
+            row['questions'] = parse_questions(row['description'])
+            del row['subject_id']
+            assignments_list.append(row)
+        logger.info(f"Found {len(absent_subject_ids)} subjects with consecutive absences, "
+                    f"{len(missing_subjects)} without a recovery assignment")
+
+        generating = []
+        if missing_subjects:
+            # Don't hold a pooled connection while waiting on the LLM
+            cursor.close()
+            release_db()
+            finished = recovery_generator.generate_many(
+                missing_subjects, budget=RECOVERY_CONFIG['request_budget']
+            )
+            generating = [name for subject_id, name in missing_subjects if subject_id not in finished]
 
-                except Exception as e:
-                    logger.error(f"Error generating questions: {str(e)}")
-                    continue
-            else:
-                existing_assignment['questions'] = json.loads(existing_assignment['description'])
-                assignments_list.append(existing_assignment)
-                logger.info("Existing assignment added to list")
+            if finished:
+                db = get_db()
+                cursor = db.cursor(dictionary=True)
+                placeholders = ', '.join(['%s'] * len(finished))
+                cursor.execute(f"""
+                    SELECT 
+                        a.id,
+                        a.title,
+                        a.description,
+                        a.due_date,
+                        s.name as subject_name,
+                        s.code as subject_code,
+                        FALSE as is_submitted
+                    FROM assignments a
+                    JOIN subjects s ON a.subject_id = s.id
+                    WHERE a.id IN ({placeholders})
+                """, list(finished.values()))
+                for new_assignment in cursor.fetchall():
+                    new_assignment['questions'] = parse_questions(new_assignment['description'])
+                    assignments_list.append(new_assignment)
 
         logger.info(f"Returning {len(assignments_list)} assignments")
         return jsonify({
             "status": "success",
-            "data": assignments_list
+            "data": assignments_list,
+            "generating": generating
         })
 
     except Exception as e:
@@ -199,9 +537,7 @@ def get_recovery_assignments():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-@app.route('/attendance/request', methods=['POST'])
+@api.route('/attendance/request', methods=['POST'])
 def request_attendance():
     try:
         data = request.json
@@ -228,7 +564,7 @@ def request_attendance():
                 "message": "Teacher ID is required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         cursor.execute("""
@@ -239,7 +575,6 @@ def request_attendance():
 
         db.commit()
         cursor.close()
-        db.close()
 
         return jsonify({
             "status": "success",
@@ -252,7 +587,7 @@ def request_attendance():
             "status": "error",
             "message": str(e)
         }), 500
-@app.route('/current-class', methods=['GET'])
+@api.route('/current-class', methods=['GET'])
 def get_current_class_endpoint():
     try:
         student_id = request.args.get('student_id')
@@ -262,43 +597,25 @@ def get_current_class_endpoint():
                 "message": "Student ID is required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        current_day = datetime.now().weekday() + 1  # 1=Monday, 7=Sunday
-        current_time = datetime.now().strftime('%H:%M:%S')
-
-        cursor.execute("""
-            SELECT 
-                s.id as subject_id,
-                s.name as subject_name,
-                s.code as subject_code,
-                t.id as teacher_id,
-                t.name as teacher_name,
-                ss.start_time,
-                ss.end_time,
-                TIME_FORMAT(ss.start_time, '%h:%i %p') as formatted_start_time,
-                TIME_FORMAT(ss.end_time, '%h:%i %p') as formatted_end_time,
-                COALESCE(a.status, 0) as is_present,
-                COALESCE(ar.status, NULL) as attendance_status
-            FROM students st
-            JOIN subjects s ON s.class_id = st.class_id
-            JOIN teachers t ON s.teacher_id = t.id
-            JOIN subject_schedule ss ON s.id = ss.subject_id
-            LEFT JOIN attendance a ON a.subject_id = s.id 
-                AND a.student_id = st.id 
-                AND a.date = CURDATE()
-            LEFT JOIN attendance_requests ar ON ar.subject_id = s.id
-                AND ar.student_id = st.id
-                AND ar.class_date = CURDATE()
-            WHERE st.id = %s
-                AND ss.day_of_week = %s
-                AND %s BETWEEN ss.start_time AND ss.end_time
-        """, (student_id, current_day, current_time))
-        
-        current_class = cursor.fetchone()
+        class_id = schedule_index.student_class(cursor, student_id)
+        current_class = schedule_index.current_class(class_id) if class_id else None
         
         if current_class:
+            # Only the per-student attendance state comes from the database
+            cursor.execute("""
+                SELECT 
+                    (SELECT status FROM attendance
+                     WHERE student_id = %s AND subject_id = %s AND date = CURDATE()
+                     LIMIT 1) as is_present,
+                    (SELECT status FROM attendance_requests
+                     WHERE student_id = %s AND subject_id = %s AND class_date = CURDATE()
+                     LIMIT 1) as attendance_status
+            """, (student_id, current_class['subject_id'], student_id, current_class['subject_id']))
+            attendance_state = cursor.fetchone()
+
             return jsonify({
                 "status": "success",
                 "data": {
@@ -309,8 +626,8 @@ def get_current_class_endpoint():
                     "teacher_name": current_class['teacher_name'],
                     "formatted_start_time": current_class['formatted_start_time'],
                     "formatted_end_time": current_class['formatted_end_time'],
-                    "is_present": bool(current_class['is_present']),
-                    "attendance_status": current_class['attendance_status']
+                    "is_present": bool(attendance_state['is_present']),
+                    "attendance_status": attendance_state['attendance_status']
                 }
             })
         else:
@@ -325,8 +642,11 @@ def get_current_class_endpoint():
             "status": "error",
             "message": str(e)
         }), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
 
-@app.route('/attendance/mark-present', methods=['POST'])
+@api.route('/attendance/mark-present', methods=['POST'])
 def mark_attendance():
     try:
         data = request.json
@@ -345,15 +665,17 @@ def mark_attendance():
                 "message": "No ongoing class found"
             }), 404
 
-        db = get_db_connection()
+        # One date for the attendance row and the streak it feeds
+        today = datetime.now().date()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
         cursor.execute("""
             SELECT id, status 
             FROM attendance 
             WHERE student_id = %s 
             AND subject_id = %s 
-            AND date = CURRENT_DATE()
-        """, (student_id, current_class['subject_id']))
+            AND date = %s
+        """, (student_id, current_class['subject_id'], today))
         
         existing_attendance = cursor.fetchone()
 
@@ -366,12 +688,14 @@ def mark_attendance():
         else:
             cursor.execute("""
                 INSERT INTO attendance (student_id, subject_id, date, status)
-                VALUES (%s, %s, CURRENT_DATE(), 1)
-            """, (student_id, current_class['subject_id']))
+                VALUES (%s, %s, %s, 1)
+            """, (student_id, current_class['subject_id'], today))
+        absence_tracker.record(cursor, [(student_id, current_class['subject_id'], today, 1)])
 
         db.commit()
+        attendance_summaries.invalidate([student_id])
+        api_cache.invalidate(f"student:{student_id}")
         cursor.close()
-        db.close()
 
         return jsonify({
             "status": "success",
@@ -389,7 +713,8 @@ def mark_attendance():
             "status": "error",
             "message": str(e)
         }), 500
-@app.route('/student/course-recommendations', methods=['GET'])
+@api.route('/student/course-recommendations', methods=['GET'])
+@api_cache.cached(student_tags, ttl=300)
 def get_course_recommendations():
     try:
         student_id = request.args.get('student_id')
@@ -399,17 +724,19 @@ def get_course_recommendations():
                 "message": "Student ID is required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
+        # Rolling per-subject aggregate maintained by the
+        # internal_assessments triggers (migrations/0007)
         cursor.execute("""
             SELECT 
                 s.name as subject_name,
                 s.code as subject_code,
-                CAST(AVG((ia.marks_obtained/ia.total_marks) * 100) AS DECIMAL(5,2)) as percentage
-            FROM internal_assessments ia
-            JOIN subjects s ON ia.subject_id = s.id
-            WHERE ia.student_id = %s
-            GROUP BY s.name, s.code
+                CAST(agg.percentage_sum / NULLIF(agg.percentage_count, 0) AS DECIMAL(5,2)) as percentage
+            FROM assessment_aggregates agg
+            JOIN subjects s ON agg.subject_id = s.id
+            WHERE agg.student_id = %s
+            AND agg.row_count > 0
         """, (student_id,))
 
         performance = cursor.fetchall()
@@ -424,20 +751,12 @@ def get_course_recommendations():
         for subject in performance:
             percentage = float(subject['percentage']) if subject['percentage'] else 0
             subject_name = subject['subject_name']
-            if percentage < 60:
-                level = "Beginner"
-                courses = get_beginner_courses(subject_name)
-            elif percentage < 75:
-                level = "Intermediate"
-                courses = get_intermediate_courses(subject_name)
-            else:
-                level = "Advanced"
-                courses = get_advanced_courses(subject_name)
+            level = course_catalog.level_for(percentage)
 
             recommendations[subject_name] = {
                 "performance": percentage,
                 "level": level,
-                "courses": courses
+                "courses": course_catalog.courses(subject_name, level)
             }
 
         return jsonify({
@@ -453,7 +772,97 @@ def get_course_recommendations():
             "status": "error",
             "message": str(e)
         }), 500
-@app.route('/teacher/attendance-requests', methods=['GET'])
+@api.route('/class/course-recommendations', methods=['GET'])
+def get_class_course_recommendations():
+    """
+    Recommendations for every student of a class in one pass, streamed as
+    NDJSON: one line per student, then a summary line with level counts.
+    """
+    try:
+        class_id = request.args.get('class_id')
+        teacher_id = request.args.get('teacher_id')
+        if not all([class_id, teacher_id]):
+            return jsonify({
+                "status": "error",
+                "message": "Class ID and Teacher ID are required"
+            }), 400
+
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id FROM subjects
+            WHERE class_id = %s AND teacher_id = %s
+            LIMIT 1
+        """, (class_id, teacher_id))
+        if not cursor.fetchall():
+            cursor.close()
+            return jsonify({
+                "status": "error",
+                "message": "Class not found or unauthorized"
+            }), 404
+
+        # Every student's subject percentages in one query, ordered so each
+        # student's rows arrive together; rows are streamed off the
+        # unbuffered cursor rather than fetched all at once
+        cursor.execute("""
+            SELECT 
+                st.id as student_id,
+                st.name as student_name,
+                st.roll_number,
+                s.name as subject_name,
+                CAST(agg.percentage_sum / NULLIF(agg.percentage_count, 0) AS DECIMAL(5,2)) as percentage
+            FROM students st
+            JOIN assessment_aggregates agg ON agg.student_id = st.id AND agg.row_count > 0
+            JOIN subjects s ON agg.subject_id = s.id
+            WHERE st.class_id = %s
+            ORDER BY st.name, st.id
+        """, (class_id,))
+    except Exception as e:
+        logger.error(f"Error generating class course recommendations: {e}")
+        if 'cursor' in locals():
+            cursor.close()
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+    def generate():
+        students = 0
+        levels = {}
+        current = None
+        try:
+            for row in cursor:
+                if current is None or current['student_id'] != row['student_id']:
+                    if current is not None:
+                        students += 1
+                        yield json.dumps(current) + '\n'
+                    current = {
+                        "student_id": row['student_id'],
+                        "name": row['student_name'],
+                        "roll_number": row['roll_number'],
+                        "recommendations": {}
+                    }
+                percentage = float(row['percentage']) if row['percentage'] else 0
+                level = course_catalog.level_for(percentage)
+                levels[level] = levels.get(level, 0) + 1
+                current['recommendations'][row['subject_name']] = {
+                    "performance": percentage,
+                    "level": level,
+                    "courses": course_catalog.courses(row['subject_name'], level)
+                }
+            if current is not None:
+                students += 1
+                yield json.dumps(current) + '\n'
+            yield json.dumps({"summary": {"students": students, "levels": levels}}) + '\n'
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"Error streaming class course recommendations: {e}")
+            yield json.dumps({"error": str(e)}) + '\n'
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+@api.route('/teacher/attendance-requests', methods=['GET'])
 def get_attendance_requests():
     try:
         teacher_id = request.args.get('teacher_id')
@@ -465,7 +874,7 @@ def get_attendance_requests():
                 "message": "Teacher ID and date are required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         cursor.execute("""
@@ -481,7 +890,7 @@ def get_attendance_requests():
             JOIN students s ON ar.student_id = s.id
             JOIN subjects sub ON ar.subject_id = sub.id
             WHERE sub.teacher_id = %s 
-            AND DATE(ar.class_date) = %s
+            AND ar.class_date = %s
             ORDER BY ar.request_time DESC
         """, (teacher_id, date))
 
@@ -501,9 +910,7 @@ def get_attendance_requests():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-@app.route('/store-monitoring-log', methods=['POST'])
+@api.route('/store-monitoring-log', methods=['POST'])
 def store_monitoring_log():
     try:
         data = request.json
@@ -517,23 +924,19 @@ def store_monitoring_log():
                 "message": "Missing required parameters"
             }), 400
 
-        db = get_db_connection()
-        cursor = db.cursor()
-
-        cursor.execute("""
-            INSERT INTO class_monitoring_logs 
-            (student_id, subject_id, status) 
-            VALUES (%s, %s, %s)
-        """, (student_id, subject_id, status))
-
-        db.commit()
-        cursor.close()
-        db.close()
+        # Buffered; the writer inserts it with the next batch
+        try:
+            monitoring_log_writer.append(student_id, subject_id, status)
+        except ValueError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 400
 
         return jsonify({
             "status": "success",
             "message": "Monitoring log stored successfully"
-        })
+        }), 202
 
     except Exception as e:
         logger.error(f"Error storing monitoring log: {e}")
@@ -541,7 +944,8 @@ def store_monitoring_log():
             "status": "error",
             "message": str(e)
         }), 500
-@app.route('/teacher/students', methods=['GET'])
+@api.route('/teacher/students', methods=['GET'])
+@api_cache.cached(teacher_user_tags, ttl=300)
 def get_teacher_students():
     try:
         user_id = request.args.get('user_id')
@@ -551,7 +955,7 @@ def get_teacher_students():
                 "message": "User ID is required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         cursor.execute("""
@@ -596,15 +1000,47 @@ def get_teacher_students():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-@app.route('/teacher/monitoring-logs', methods=['GET'])
+@api.route('/teacher/at-risk-students', methods=['GET'])
+def get_at_risk_students():
+    try:
+        teacher_id = request.args.get('teacher_id')
+        min_streak = request.args.get('min_streak', type=int)
+
+        if not teacher_id:
+            return jsonify({
+                "status": "error",
+                "message": "Teacher ID is required"
+            }), 400
+
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        students = absence_tracker.at_risk(cursor, teacher_id=teacher_id, min_streak=min_streak)
+        for student in students:
+            student['last_date'] = student['last_date'].strftime('%Y-%m-%d')
+
+        return jsonify({
+            "status": "success",
+            "data": students
+        })
+
+    except Exception as e:
+        logger.error(f"Error fetching at-risk students: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+@api.route('/teacher/monitoring-logs', methods=['GET'])
 def get_monitoring_logs():
     try:
         student_id = request.args.get('student_id')
         subject_id = request.args.get('subject_id')
         date = request.args.get('date')
         teacher_id = request.args.get('teacher_id')
+        cursor_param = request.args.get('cursor')
 
         if not all([student_id, subject_id, date, teacher_id]):
             return jsonify({
@@ -612,10 +1048,23 @@ def get_monitoring_logs():
                 "message": "Missing required parameters"
             }), 400
 
-        db = get_db_connection()
-        cursor = db.cursor(dictionary=True)
+        try:
+            day = datetime.strptime(date, '%Y-%m-%d')
+            limit = min(max(int(request.args.get('limit', MONITORING_LOG_PAGE_SIZE)), 1), MONITORING_LOG_MAX_PAGE_SIZE)
+            after = monitoring_logs.decode_cursor(cursor_param) if cursor_param else None
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "Invalid date, limit or cursor"
+            }), 400
 
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
 
+        # The day is a half-open range of constant timestamps, so MySQL
+        # prunes to the one monthly partition holding it and the
+        # (student, subject, timestamp) index applies within it. Pages are
+        # keyset-paginated on (timestamp, id), newest first.
         query = """
             SELECT 
                 cml.id,
@@ -626,24 +1075,38 @@ def get_monitoring_logs():
             WHERE cml.student_id = %s
             AND cml.subject_id = %s
             AND s.teacher_id = %s
-            AND DATE(cml.timestamp) = %s
-            ORDER BY cml.timestamp DESC
+            AND cml.timestamp >= %s
+            AND cml.timestamp < %s
         """
-        
-        # Convert parameters to correct types
-        params = (
+        params = [
             int(student_id),
             int(subject_id),
             int(teacher_id),
-            date
-        )
-        
-        print("Query:", query)
-        print("Parameters:", params)
-        
+            day,
+            day + timedelta(days=1)
+        ]
+        if after:
+            query += """
+            AND cml.timestamp <= %s
+            AND (cml.timestamp < %s OR cml.id < %s)
+            """
+            params += [after[0], after[0], after[1]]
+        query += """
+            ORDER BY cml.timestamp DESC, cml.id DESC
+            LIMIT %s
+        """
+        params.append(limit + 1)
+
+        logger.debug(f"Monitoring logs query parameters: {params}")
+
         cursor.execute(query, params)
         logs = cursor.fetchall()
 
+        next_cursor = None
+        if len(logs) > limit:
+            logs = logs[:limit]
+            next_cursor = monitoring_logs.encode_cursor(logs[-1]['timestamp'], logs[-1]['id'])
+
         # Format timestamp after fetching
         formatted_logs = []
         for log in logs:
@@ -655,12 +1118,12 @@ def get_monitoring_logs():
 
         return jsonify({
             "status": "success",
-            "data": formatted_logs if formatted_logs else []
+            "data": formatted_logs,
+            "next_cursor": next_cursor
         })
 
     except Exception as e:
         logger.error(f"Error fetching monitoring logs: {e}")
-        print(f"Detailed error: {str(e)}")
         return jsonify({
             "status": "error",
             "message": str(e)
@@ -668,9 +1131,90 @@ def get_monitoring_logs():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-@app.route('/assignment/submission-details/<int:assignment_id>', methods=['GET'])
+
+def _percentages(active, inactive, not_joined):
+    total = active + inactive + not_joined
+    return {
+        "total": total,
+        "active": active,
+        "inactive": inactive,
+        "not_joined": not_joined,
+        "active_pct": round(active * 100 / total, 1) if total else 0,
+        "inactive_pct": round(inactive * 100 / total, 1) if total else 0,
+        "not_joined_pct": round(not_joined * 100 / total, 1) if total else 0
+    }
+
+@api.route('/teacher/monitoring-summary', methods=['GET'])
+def get_monitoring_summary():
+    try:
+        student_id = request.args.get('student_id')
+        subject_id = request.args.get('subject_id')
+        date = request.args.get('date')
+        teacher_id = request.args.get('teacher_id')
+
+        if not all([student_id, subject_id, date, teacher_id]):
+            return jsonify({
+                "status": "error",
+                "message": "Missing required parameters"
+            }), 400
+
+        try:
+            day = datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "Invalid date, expected YYYY-MM-DD"
+            }), 400
+
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        cursor.execute("""
+            SELECT 
+                r.bucket_start,
+                r.active_count,
+                r.inactive_count,
+                r.not_joined_count
+            FROM monitoring_rollups r
+            JOIN subjects s ON r.subject_id = s.id
+            WHERE r.student_id = %s
+            AND r.subject_id = %s
+            AND s.teacher_id = %s
+            AND r.bucket_start >= %s
+            AND r.bucket_start < %s
+            ORDER BY r.bucket_start
+        """, (int(student_id), int(subject_id), int(teacher_id), day, day + timedelta(days=1)))
+        buckets = cursor.fetchall()
+
+        timeline = []
+        for bucket in buckets:
+            entry = _percentages(bucket['active_count'], bucket['inactive_count'], bucket['not_joined_count'])
+            entry['bucket_start'] = bucket['bucket_start'].strftime('%Y-%m-%d %H:%M:%S')
+            timeline.append(entry)
+
+        return jsonify({
+            "status": "success",
+            "data": {
+                "bucket_minutes": monitoring_logs.ROLLUP_BUCKET_MINUTES,
+                "timeline": timeline,
+                "summary": _percentages(
+                    sum(b['active_count'] for b in buckets),
+                    sum(b['inactive_count'] for b in buckets),
+                    sum(b['not_joined_count'] for b in buckets)
+                )
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"Error fetching monitoring summary: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+@api.route('/assignment/submission-details/<int:assignment_id>', methods=['GET'])
 def get_submission_details(assignment_id):
     try:
         student_id = request.args.get('student_id')
@@ -682,7 +1226,7 @@ def get_submission_details(assignment_id):
                 "message": "Student ID and Teacher ID are required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         query = """
@@ -727,9 +1271,8 @@ def get_submission_details(assignment_id):
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-@app.route('/student/assignments', methods=['GET'])
+@api.route('/student/assignments', methods=['GET'])
+@api_cache.cached(student_assignment_tags)
 def get_student_assignments():
     try:
         student_id = request.args.get('student_id')
@@ -741,7 +1284,7 @@ def get_student_assignments():
                 "message": "Student ID and Teacher ID are required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         # Updated query to include both assignment and submission status
@@ -814,9 +1357,52 @@ def get_student_assignments():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-@app.route('/teacher/respond-attendance', methods=['POST'])
+@absence_tracker.subscribe
+def queue_absence_alerts(cursor, events):
+    """
+    Absence streak hook: queue student and parent SMS for every student
+    whose streak just reached the threshold. Runs on the writer's cursor,
+    so the messages commit together with the attendance rows.
+    """
+    student_ids = sorted({event['student_id'] for event in events})
+    subject_ids = sorted({event['subject_id'] for event in events})
+    cursor.execute(f"""
+        SELECT id, name, student_phone, parent_phone
+        FROM students
+        WHERE id IN ({', '.join(['%s'] * len(student_ids))})
+    """, student_ids)
+    students = {row['id']: row for row in cursor.fetchall()}
+    cursor.execute(f"""
+        SELECT id, name
+        FROM subjects
+        WHERE id IN ({', '.join(['%s'] * len(subject_ids))})
+    """, subject_ids)
+    subject_names = {row['id']: row['name'] for row in cursor.fetchall()}
+
+    for event in events:
+        student = students.get(event['student_id'])
+        subject_name = subject_names.get(event['subject_id'])
+        if not student or not subject_name:
+            continue
+
+        # Shorter messages for both student and parent
+        student_message = (
+            f"Alert: You missed {subject_name} for {event['streak']} classes in a row. "
+            f"Complete recovery assignment before deadline."
+        )
+
+        parent_message = (
+            f"Alert: {student['name']} has missed "
+            f"{subject_name} for {event['streak']} consecutive classes."
+        )
+
+        # Queued in the same transaction; the dispatcher sends after commit
+        dedup_key = f"absence:{student['id']}:{event['subject_id']}:{event['date']}"
+        notifications.enqueue(cursor, student['student_phone'], student_message, f"{dedup_key}:student")
+        notifications.enqueue(cursor, student['parent_phone'], parent_message, f"{dedup_key}:parent")
+        logger.info(f"Absence alerts queued for student {student['id']}")
+
+@api.route('/teacher/respond-attendance', methods=['POST'])
 def respond_to_attendance():
     try:
         data = request.json
@@ -836,16 +1422,14 @@ def respond_to_attendance():
                 "message": "Invalid status"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         # First verify the request exists and belongs to this teacher
         cursor.execute("""
-            SELECT ar.*, s.teacher_id, s.name as subject_name, s.id as subject_id,
-                   ss.start_time, ss.end_time
+            SELECT ar.*, s.teacher_id, s.name as subject_name, s.id as subject_id
             FROM attendance_requests ar
             JOIN subjects s ON ar.subject_id = s.id
-            JOIN subject_schedule ss ON s.id = ss.subject_id
             WHERE ar.id = %s AND s.teacher_id = %s
         """, (request_id, teacher_id))
         
@@ -880,80 +1464,22 @@ def respond_to_attendance():
             attendance_status
         ))
 
-        # If rejected, check for 3 consecutive absences
-        if status == 'rejected':
-            cursor.execute("""
-                SELECT COUNT(*) as absent_count,
-                       s.id as student_id, s.name as student_name,
-                       s.student_phone, s.parent_phone
-                FROM attendance a
-                JOIN students s ON a.student_id = s.id
-                WHERE a.student_id = %s 
-                AND a.subject_id = %s
-                AND a.status = 0
-                AND a.date >= DATE_SUB(%s, INTERVAL 3 DAY)
-                GROUP BY s.id
-            """, (
-                attendance_request['student_id'],
-                attendance_request['subject_id'],
-                attendance_request['class_date']
-            ))
-            
-            result = cursor.fetchone()
-            
-            if result and result['absent_count'] >= 3:
-                try:
-                    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-                    
-                    # Shorter messages for both student and parent
-                    student_message = (
-                        f"Alert: You missed {attendance_request['subject_name']} for 3 days. "
-                        f"Complete recovery assignment before deadline."
-                    )
-
-                    parent_message = (
-                        f"Alert: {result['student_name']} has missed "
-                        f"{attendance_request['subject_name']} for 3 consecutive days."
-                    )
-
-                    # Send student message
-                    if result['student_phone']:
-                        student_phone = result['student_phone']
-                        if not student_phone.startswith('+'):
-                            student_phone = '+' + student_phone
-
-                        logger.info(f"Sending to student: {student_phone}")
-                        try:
-                            message = client.messages.create(
-                                body=student_message,
-                                from_=TWILIO_PHONE_NUMBER,
-                                to=student_phone
-                            )
-                            logger.info(f"Student message sent: {message.sid}")
-                        except Exception as e:
-                            logger.error(f"Student message failed: {str(e)}")
-
-                    # Send parent message
-                    if result['parent_phone']:
-                        parent_phone = result['parent_phone']
-                        if not parent_phone.startswith('+'):
-                            parent_phone = '+' + parent_phone
-
-                        logger.info(f"Sending to parent: {parent_phone}")
-                        try:
-                            message = client.messages.create(
-                                body=parent_message,
-                                from_=TWILIO_PHONE_NUMBER,
-                                to=parent_phone
-                            )
-                            logger.info(f"Parent message sent: {message.sid}")
-                        except Exception as e:
-                            logger.error(f"Parent message failed: {str(e)}")
-
-                except Exception as e:
-                    logger.error(f"SMS notification error: {str(e)}")
+        # A rejection that completes an absence streak queues the alerts
+        recovery_subject = None
+        if absence_tracker.record(cursor, [(
+            attendance_request['student_id'],
+            attendance_request['subject_id'],
+            attendance_request['class_date'],
+            attendance_status
+        )]):
+            recovery_subject = (attendance_request['subject_id'], attendance_request['subject_name'])
 
         db.commit()
+        attendance_summaries.invalidate([attendance_request['student_id']])
+        api_cache.invalidate(f"student:{attendance_request['student_id']}")
+        notification_dispatcher.wake()
+        if recovery_subject:
+            recovery_generator.schedule(*recovery_subject)
 
         return jsonify({
             "status": "success",
@@ -969,196 +1495,325 @@ def respond_to_attendance():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-def get_beginner_courses(subject):
-    courses = [
-        {
-            "title": f"Introduction to {subject}",
-            "platform": "freeCodeCamp",
-            "difficulty": "Beginner",
-            "description": f"Learn the fundamentals of {subject} with hands-on practice",
-            "url": f"https://www.freecodecamp.org/learn/{subject.lower().replace(' ', '-')}"
-        },
-        {
-            "title": f"{subject} Basics",
-            "platform": "W3Schools",
-            "difficulty": "Beginner",
-            "description": f"Step-by-step guide to {subject} fundamentals",
-            "url": f"https://www.w3schools.com/{subject.lower().replace(' ', '')}"
-        },
-        {
-            "title": f"Getting Started with {subject}",
-            "platform": "MDN Web Docs",
-            "difficulty": "Beginner",
-            "description": f"Comprehensive guide to {subject} for beginners",
-            "url": f"https://developer.mozilla.org/en-US/docs/Learn/{subject.lower().replace(' ', '_')}"
-        }
-    ]
-    return courses
-
-def get_intermediate_courses(subject):
-    courses = [
-        {
-            "title": f"Intermediate {subject}",
-            "platform": "edX",
-            "difficulty": "Intermediate",
-            "description": f"Deepen your understanding of {subject} concepts",
-            "url": f"https://www.edx.org/learn/{subject.lower().replace(' ', '-')}"
-        },
-        {
-            "title": f"Professional {subject} Development",
-            "platform": "Codecademy",
-            "difficulty": "Intermediate",
-            "description": f"Build professional {subject} skills",
-            "url": f"https://www.codecademy.com/learn/{subject.lower().replace(' ', '-')}"
-        },
-        {
-            "title": f"{subject} in Practice",
-            "platform": "GeeksforGeeks",
-            "difficulty": "Intermediate",
-            "description": f"Practice-oriented {subject} learning",
-            "url": f"https://www.geeksforgeeks.org/{subject.lower().replace(' ', '-')}"
-        }
-    ]
-    return courses
-
-def get_advanced_courses(subject):
-    courses = [
-        {
-            "title": f"Advanced {subject} Concepts",
-            "platform": "MIT OpenCourseWare",
-            "difficulty": "Advanced",
-            "description": f"Master advanced {subject} topics",
-            "url": f"https://ocw.mit.edu/search/?q={subject.lower().replace(' ', '+')}"
-        },
-        {
-            "title": f"Expert {subject} Techniques",
-            "platform": "Stanford Online",
-            "difficulty": "Advanced",
-            "description": f"Advanced {subject} methodologies and best practices",
-            "url": f"https://online.stanford.edu/search-catalog?query={subject.lower().replace(' ', '+')}"
-        },
-        {
-            "title": f"{subject} Mastery",
-            "platform": "Khan Academy",
-            "difficulty": "Advanced",
-            "description": f"Complete mastery of {subject} concepts",
-            "url": f"https://www.khanacademy.org/search?query={subject.lower().replace(' ', '+')}"
-        }
-    ]
-    return courses
-def get_current_class(class_id):
+MAX_BULK_RESPONSES = 500
+
+@api.route('/teacher/respond-attendance/bulk', methods=['POST'])
+def respond_to_attendance_bulk():
     """
-    Get details of the currently ongoing class for a given class_id
+    Approve or reject many attendance requests at once:
+    {"teacher_id", "responses": [{"request_id", "status": "approved" | "rejected"}, ...]}
+    Requests, attendance and absence alerts are written in one transaction.
     """
     try:
-        days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        
-        db = get_db_connection()
-        cursor = db.cursor(dictionary=True)
-        current_time = datetime.now().strftime('%I:%M %p')
-        current_day = datetime.now().strftime('%A')
-        current_weekday = datetime.now().weekday() + 1
-        
-        print("\n=== ONGOING CLASS DETAILS ===")
-        print(f"Current Time: {current_time}")
-        print(f"Current Day: {current_day}")
-        print(f"Weekday Number: {current_weekday}")
-        print(f"Class ID being checked: {class_id}")
-        print("============================")
-
-        cursor.execute("""
-            SELECT 
-                s.id as subject_id,
-                s.name as subject_name,
-                s.code as subject_code,
-                t.name as teacher_name,
-                t.id as teacher_id,
-                TIME_FORMAT(ss.start_time, '%h:%i %p') as formatted_start_time,
-                TIME_FORMAT(ss.end_time, '%h:%i %p') as formatted_end_time,
-                ss.day_of_week
-            FROM subject_schedule ss
-            JOIN subjects s ON ss.subject_id = s.id
-            LEFT JOIN teachers t ON s.teacher_id = t.id
-            WHERE s.class_id = %s 
-            AND ss.day_of_week = WEEKDAY(CURRENT_DATE()) + 1
-            AND CURRENT_TIME() BETWEEN ss.start_time AND ss.end_time
-            LIMIT 1
-        """, (class_id,))
-        
-        class_info = cursor.fetchone()
-        
-        if class_info:
-            class_info['day_name'] = days[class_info['day_of_week'] - 1]
-
-            print("\n=== FOUND CLASS DETAILS ===")
-            print(f"Subject: {class_info['subject_name']} ({class_info['subject_code']})")
-            print(f"Teacher: {class_info['teacher_name']}")
-            print(f"Time: {class_info['formatted_start_time']} - {class_info['formatted_end_time']}")
-            print(f"Day: {class_info['day_name']}")
-            print("==========================\n")
-        else:
-            print("\n=== NO ONGOING CLASS FOUND ===")
-            print("Checking database for schedule...")
-            cursor.execute("""
-                SELECT 
-                    s.name as subject_name,
-                    ss.day_of_week,
-                    TIME_FORMAT(ss.start_time, '%h:%i %p') as formatted_start_time,
-                    TIME_FORMAT(ss.end_time, '%h:%i %p') as formatted_end_time
-                FROM subject_schedule ss
-                JOIN subjects s ON ss.subject_id = s.id
-                WHERE s.class_id = %s
-                ORDER BY ss.day_of_week, ss.start_time
-            """, (class_id,))
-            
-            all_schedules = cursor.fetchall()
-            if all_schedules:
-                print("\nAll scheduled classes for this class_id:")
-                for schedule in all_schedules:
-                    day_name = days[schedule['day_of_week'] - 1]
-                    print(f"{schedule['subject_name']} on {day_name}: "
-                          f"{schedule['formatted_start_time']} - {schedule['formatted_end_time']}")
-            else:
-                print("No schedule found for this class_id")
-            print("============================\n")
-
-        return class_info
+        data = request.json or {}
+        teacher_id = data.get('teacher_id')
+        responses = data.get('responses')
 
-    except Exception as e:
-        print("\n=== ERROR OCCURRED ===")
-        print(f"Error fetching current class: {e}")
-        print("=====================\n")
-        logger.error(f"Error fetching current class: {e}")
-        return None
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
-get_current_class(1)
-@app.route('/login', methods=['POST'])
-def login():
-    try:
-        data = request.json
-        email = data.get('email')
-        password = data.get('password')
-        role = data.get('role')
+        if not teacher_id or not isinstance(responses, list) or not responses:
+            return jsonify({
+                "status": "error",
+                "message": "Teacher ID and responses are required"
+            }), 400
 
-        # Validate required fields
-        if not all([email, password, role]):
+        if len(responses) > MAX_BULK_RESPONSES:
             return jsonify({
                 "status": "error",
-                "message": "Email, password and role are required"
+                "message": f"At most {MAX_BULK_RESPONSES} responses per request"
             }), 400
 
-        db = get_db_connection()
+        # Later entries for the same request win
+        results = {}
+        statuses = {}
+        invalid = []
+        for response in responses:
+            try:
+                request_id = int(response.get('request_id'))
+            except (AttributeError, TypeError, ValueError):
+                invalid.append({"request_id": None, "result": "error", "message": "Invalid request ID"})
+                continue
+            status = response.get('status')
+            if status not in ['approved', 'rejected']:
+                results[request_id] = {"request_id": request_id, "result": "error", "message": "Invalid status"}
+                statuses.pop(request_id, None)
+                continue
+            statuses[request_id] = status
+            results.pop(request_id, None)
+
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        # Get user with the specified email and role
-        cursor.execute("""
-            SELECT 
+        attendance_requests = {}
+        request_ids = sorted(statuses)
+        if request_ids:
+            placeholders = ', '.join(['%s'] * len(request_ids))
+            # Ownership for every request in one query
+            cursor.execute(f"""
+                SELECT ar.id, ar.student_id, ar.subject_id, ar.class_date,
+                       s.name as subject_name
+                FROM attendance_requests ar
+                JOIN subjects s ON ar.subject_id = s.id
+                WHERE ar.id IN ({placeholders}) AND s.teacher_id = %s
+                FOR UPDATE
+            """, request_ids + [teacher_id])
+            attendance_requests = {row['id']: row for row in cursor.fetchall()}
+
+        for request_id in request_ids:
+            if request_id not in attendance_requests:
+                results[request_id] = {"request_id": request_id, "result": "error", "message": "Attendance request not found or unauthorized"}
+                del statuses[request_id]
+
+        recovery_subjects = {}
+        alerted = set()
+        if statuses:
+            for status in ('approved', 'rejected'):
+                ids = [request_id for request_id, value in statuses.items() if value == status]
+                if not ids:
+                    continue
+                placeholders = ', '.join(['%s'] * len(ids))
+                cursor.execute(f"""
+                    UPDATE attendance_requests 
+                    SET status = %s, 
+                        response_time = CURRENT_TIMESTAMP,
+                        teacher_id = %s
+                    WHERE id IN ({placeholders})
+                """, [status, teacher_id] + ids)
+
+            rows = [
+                (
+                    attendance_requests[request_id]['student_id'],
+                    attendance_requests[request_id]['subject_id'],
+                    attendance_requests[request_id]['class_date'],
+                    1 if status == 'approved' else 0
+                )
+                for request_id, status in sorted(statuses.items())
+            ]
+            cursor.execute(f"""
+                INSERT INTO attendance 
+                (student_id, subject_id, date, status)
+                VALUES {', '.join(['(%s, %s, %s, %s)'] * len(rows))}
+                ON DUPLICATE KEY UPDATE status = VALUES(status)
+            """, [value for row in rows for value in row])
+
+            subject_names = {ar['subject_id']: ar['subject_name'] for ar in attendance_requests.values()}
+            for event in absence_tracker.record(cursor, rows):
+                alerted.add((event['student_id'], event['subject_id']))
+                recovery_subjects[event['subject_id']] = subject_names[event['subject_id']]
+
+        db.commit()
+        student_ids = {attendance_requests[request_id]['student_id'] for request_id in statuses}
+        attendance_summaries.invalidate(student_ids)
+        api_cache.invalidate(*[f"student:{student_id}" for student_id in student_ids])
+
+        for request_id, status in statuses.items():
+            ar = attendance_requests[request_id]
+            results[request_id] = {
+                "request_id": request_id,
+                "result": status,
+                "absence_alert": status == 'rejected' and (ar['student_id'], ar['subject_id']) in alerted
+            }
+
+        if recovery_subjects:
+            notification_dispatcher.wake()
+            for subject in recovery_subjects.items():
+                recovery_generator.schedule(*subject)
+
+        return jsonify({
+            "status": "success",
+            "message": f"{len(statuses)} attendance requests updated",
+            "data": [results[request_id] for request_id in sorted(results)] + invalid
+        })
+
+    except Exception as e:
+        logger.error(f"Error responding to attendance requests: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+ATTENDANCE_STATUSES = {'present': 1, 'absent': 0, 1: 1, 0: 0, True: 1, False: 0}
+MAX_BULK_ATTENDANCE = 500
+
+@api.route('/teacher/attendance/bulk', methods=['POST'])
+def mark_attendance_bulk():
+    """
+    Apply a roster's attendance for one subject and date:
+    {"teacher_id", "subject_id", "date" (default today),
+     "records": [{"student_id", "status": "present" | "absent"}, ...]}
+    All rows are written with one multi-row upsert in a single transaction.
+    """
+    try:
+        data = request.json or {}
+        teacher_id = data.get('teacher_id')
+        subject_id = data.get('subject_id')
+        records = data.get('records')
+
+        if not all([teacher_id, subject_id]) or not isinstance(records, list) or not records:
+            return jsonify({
+                "status": "error",
+                "message": "Teacher ID, subject ID and records are required"
+            }), 400
+
+        if len(records) > MAX_BULK_ATTENDANCE:
+            return jsonify({
+                "status": "error",
+                "message": f"At most {MAX_BULK_ATTENDANCE} records per request"
+            }), 400
+
+        try:
+            class_date = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else datetime.now().date()
+        except (TypeError, ValueError):
+            return jsonify({
+                "status": "error",
+                "message": "Invalid date, expected YYYY-MM-DD"
+            }), 400
+
+        # Later entries for the same student win
+        results = {}
+        statuses = {}
+        invalid = []
+        for record in records:
+            try:
+                student_id = int(record.get('student_id'))
+            except (AttributeError, TypeError, ValueError):
+                invalid.append({"student_id": None, "result": "error", "message": "Invalid student ID"})
+                continue
+            status = record.get('status')
+            if isinstance(status, str):
+                status = status.lower()
+            if not isinstance(status, (str, int)) or status not in ATTENDANCE_STATUSES:
+                results[student_id] = {"student_id": student_id, "result": "error", "message": "Invalid status"}
+                statuses.pop(student_id, None)
+                continue
+            statuses[student_id] = ATTENDANCE_STATUSES[status]
+            results.pop(student_id, None)
+
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        cursor.execute("""
+            SELECT id, name, class_id
+            FROM subjects
+            WHERE id = %s AND teacher_id = %s
+        """, (subject_id, teacher_id))
+        subject = cursor.fetchone()
+        if not subject:
+            return jsonify({
+                "status": "error",
+                "message": "Subject not found or unauthorized"
+            }), 404
+
+        student_ids = sorted(statuses)
+        existing = {}
+        if student_ids:
+            placeholders = ', '.join(['%s'] * len(student_ids))
+            # Enrolment and current attendance for the whole roster at once;
+            # FOR UPDATE keeps the reported previous state accurate
+            cursor.execute(f"""
+                SELECT s.id as student_id, a.status
+                FROM students s
+                LEFT JOIN attendance a ON a.student_id = s.id
+                    AND a.subject_id = %s
+                    AND a.date = %s
+                WHERE s.id IN ({placeholders})
+                AND s.class_id = %s
+                FOR UPDATE
+            """, [subject['id'], class_date] + student_ids + [subject['class_id']])
+            existing = {row['student_id']: row['status'] for row in cursor.fetchall()}
+
+        for student_id in student_ids:
+            if student_id not in existing:
+                results[student_id] = {"student_id": student_id, "result": "error", "message": "Student not enrolled in this class"}
+                del statuses[student_id]
+
+        rows = [(student_id, subject['id'], class_date, status) for student_id, status in sorted(statuses.items())]
+        alerted = []
+        if rows:
+            cursor.execute(f"""
+                INSERT INTO attendance 
+                (student_id, subject_id, date, status)
+                VALUES {', '.join(['(%s, %s, %s, %s)'] * len(rows))}
+                ON DUPLICATE KEY UPDATE status = VALUES(status)
+            """, [value for row in rows for value in row])
+
+            alerted = [event['student_id'] for event in absence_tracker.record(cursor, rows)]
+
+        db.commit()
+        attendance_summaries.invalidate(statuses)
+        api_cache.invalidate(*[f"student:{student_id}" for student_id in statuses])
+
+        for student_id, status in statuses.items():
+            previous = existing[student_id]
+            results[student_id] = {
+                "student_id": student_id,
+                "result": "created" if previous is None else "unchanged" if previous == status else "updated",
+                "status": "present" if status else "absent",
+                "absence_alert": student_id in alerted
+            }
+
+        if alerted:
+            notification_dispatcher.wake()
+            recovery_generator.schedule(subject['id'], subject['name'])
+
+        return jsonify({
+            "status": "success",
+            "message": f"Attendance saved for {len(rows)} students",
+            "data": {
+                "subject_id": subject['id'],
+                "date": class_date.isoformat(),
+                "results": [results[student_id] for student_id in sorted(results)] + invalid
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"Error marking bulk attendance: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+def get_current_class(class_id):
+    """
+    Get details of the currently ongoing class for a given class_id
+    """
+    try:
+        class_info = schedule_index.current_class(class_id)
+        
+        if class_info:
+            logger.debug(f"Ongoing class for class_id {class_id}: {class_info['subject_name']} "
+                         f"({class_info['formatted_start_time']} - {class_info['formatted_end_time']})")
+        else:
+            logger.debug(f"No ongoing class for class_id {class_id}")
+
+        return class_info
+
+    except Exception as e:
+        logger.error(f"Error fetching current class: {e}")
+        return None
+@api.route('/login', methods=['POST'])
+def login():
+    try:
+        data = request.json
+        email = data.get('email')
+        password = data.get('password')
+        role = data.get('role')
+
+        # Validate required fields
+        if not all([email, password, role]):
+            return jsonify({
+                "status": "error",
+                "message": "Email, password and role are required"
+            }), 400
+
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        # Get user with the specified email and role
+        cursor.execute("""
+            SELECT 
                 u.id,
                 u.email,
                 u.password,
@@ -1223,45 +1878,75 @@ def login():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
 def generate_session_token(user_id):
    
     return f"session_{user_id}_{datetime.now().timestamp()}"
-@app.route('/student/attendance', methods=['GET'])
+@api.route('/student/attendance', methods=['GET'])
 def get_student_attendance():
     try:
         student_id = request.args.get('student_id')
+        cursor_param = request.args.get('cursor')
         if not student_id:
             return jsonify({
                 "status": "error",
                 "message": "Student ID is required"
             }), 400
 
-        db = get_db_connection()
+        try:
+            limit = min(max(int(request.args.get('limit', ATTENDANCE_PAGE_SIZE)), 1), ATTENDANCE_MAX_PAGE_SIZE)
+            after = attendance_summary.decode_cursor(cursor_param) if cursor_param else None
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "Invalid limit or cursor"
+            }), 400
+
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("""
+        # Keyset-paginated on (date, id), newest first, along
+        # idx_attendance_student_date
+        query = """
             SELECT 
-                DATE_FORMAT(a.date, '%Y-%m-%d') as date,
+                a.id,
+                a.date,
                 s.name as subject,
                 a.status
             FROM attendance a
             JOIN subjects s ON a.subject_id = s.id
             WHERE a.student_id = %s
-            ORDER BY a.date DESC
-        """, (student_id,))
+        """
+        params = [student_id]
+        if after:
+            query += """
+            AND a.date <= %s
+            AND (a.date < %s OR a.id < %s)
+            """
+            params += [after[0], after[0], after[1]]
+        query += """
+            ORDER BY a.date DESC, a.id DESC
+            LIMIT %s
+        """
+        params.append(limit + 1)
 
+        cursor.execute(query, params)
         attendance_records = cursor.fetchall()
+
+        next_cursor = None
+        if len(attendance_records) > limit:
+            attendance_records = attendance_records[:limit]
+            next_cursor = attendance_summary.encode_cursor(attendance_records[-1]['date'], attendance_records[-1]['id'])
+
         formatted_records = [{
-            'date': record['date'],
+            'date': record['date'].strftime('%Y-%m-%d'),
             'subject': record['subject'],
             'status': int(record['status'])  # Ensure status is an integer
         } for record in attendance_records]
 
         return jsonify({
             "status": "success",
-            "data": formatted_records
+            "data": formatted_records,
+            "next_cursor": next_cursor
         })
 
     except Exception as e:
@@ -1273,10 +1958,130 @@ def get_student_attendance():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
-@app.route('/analyze-stream', methods=['POST'])
+@api.route('/student/attendance/summary', methods=['GET'])
+def get_student_attendance_summary():
+    try:
+        student_id = request.args.get('student_id')
+        if not student_id:
+            return jsonify({
+                "status": "error",
+                "message": "Student ID is required"
+            }), 400
+
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        return jsonify({
+            "status": "success",
+            "data": attendance_summaries.get(cursor, student_id)
+        })
+
+    except Exception as e:
+        logger.error(f"Error fetching attendance summary: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+def send_inactivity_alert(student_id, subject_id=None):
+    """
+    Queue the inactivity SMS for the student's mentor. Returns the
+    notification message, or None when the mentor has no phone number or
+    the alert was already queued. Alerts are deduplicated per student,
+    subject and alert_cooldown window, so workers with their own activity
+    trackers (or a retried request) queue one SMS between them.
+    """
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        print("Getting student and mentor details...")
+        # Get student and mentor details
+        cursor.execute("""
+            SELECT 
+                s.name as student_name,
+                m.phone_number as mentor_phone,
+                m.name as mentor_name,
+                s.class_id
+            FROM students s
+            JOIN mentors m ON s.mentor_id = m.id
+            WHERE s.id = %s
+        """, (student_id,))
+
+        result = cursor.fetchone()
+        
+        if not result:
+            print(f"No student/mentor found for student_id: {student_id}")
+            logger.error(f"No student or mentor found for student_id: {student_id}")
+            raise LookupError("Student or mentor not found")
+
+        print(f"Found student: {result['student_name']}")
+        print(f"Mentor: {result['mentor_name']}")
+        print(f"Mentor phone: {result['mentor_phone']}")
+
+        if not result['mentor_phone']:
+            return None
+
+        print("Getting current class information...")
+        current_class = get_current_class(result['class_id'])
+        
+        if current_class:
+            print(f"Current class found: {current_class['subject_name']}")
+            sms_message = (
+                f"STUDENT INACTIVITY ALERT!\n"
+                f"Student: {result['student_name']}\n"
+                f"Current Class: {current_class['subject_name']} ({current_class['subject_code']})\n"
+                f"Teacher: {current_class['teacher_name']}\n"
+                f"Class Time: {current_class['formatted_start_time']} - {current_class['formatted_end_time']}\n"
+                f"Alert Time: {datetime.now().strftime('%I:%M %p')}\n"
+                f"Status: Student has been inactive for {INACTIVITY_THRESHOLD} consecutive checks."
+            )
+        else:
+            print("No current class found")
+            sms_message = (
+                f"STUDENT INACTIVITY ALERT!\n"
+                f"Student: {result['student_name']}\n"
+                f"Time: {datetime.now().strftime('%I:%M %p')}\n"
+                f"Status: Student has been inactive for {INACTIVITY_THRESHOLD} consecutive checks.\n"
+                f"Note: No scheduled class found at this time."
+            )
+
+        print("\n=== QUEUEING SMS NOTIFICATION ===")
+        print(f"To: {result['mentor_name']} ({result['mentor_phone']})")
+        print("Message Content:")
+        print("------------------------")
+        print(sms_message)
+        print("------------------------")
+
+        now = datetime.now()
+        if not subject_id and current_class:
+            subject_id = current_class['subject_id']
+        window = int(now.timestamp() // activity_tracker.alert_cooldown)
+        dedup_key = f"inactive:{student_id}:{subject_id}:{now:%Y-%m-%d}:{window}"
+        queued = notifications.enqueue(cursor, result['mentor_phone'], sms_message, dedup_key)
+        db.commit()
+        if not queued:
+            logger.info(f"Inactivity alert {dedup_key} already queued")
+            return None
+        notification_dispatcher.wake()
+
+        logger.info(f"Inactivity alert queued for mentor {result['mentor_name']}")
+
+        return f"Alert SMS sent to mentor {result['mentor_name']}"
+    finally:
+        cursor.close()
+
+def frame_ingest_disabled():
+    return jsonify({
+        "status": "error",
+        "message": "Frames are analyzed by the monitoring WebSocket server (monitor_ws.py, /monitor)"
+    }), 410
+
+@api.route('/analyze-stream', methods=['POST'])
 def analyze_stream():
+    if not HTTP_FRAME_INGEST:
+        return frame_ingest_disabled()
     try:
         print("\n=== STARTING STREAM ANALYSIS ===")
         
@@ -1286,134 +2091,51 @@ def analyze_stream():
 
         file = request.files['image']
         student_id = request.form.get('student_id')
-        inactivity_count = int(request.form.get('inactivity_count', 0))
+        subject_id = request.form.get('subject_id')
+
+        if not student_id:
+            return jsonify({"status": "error", "message": "Student ID is required"}), 400
         
         print(f"Student ID: {student_id}")
-        print(f"Inactivity Count: {inactivity_count}")
 
-        npimg = np.frombuffer(file.read(), np.uint8)
-        img = cv2.imdecode(npimg, cv2.COLOR_BGR2GRAY)
-
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-
-        faces = face_cascade.detectMultiScale(img, 1.3, 5)
-        is_active = False
+        try:
+            detection = detection_engine.analyze(file.read(), key=student_id)
+        except FrameDropped as e:
+            logger.warning(f"Frame dropped for student {student_id}: {e}")
+            return jsonify({
+                "status": "error",
+                "message": str(e),
+                "dropped": True
+            }), 503
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
 
-        for (x, y, w, h) in faces:
-            roi_gray = img[y:y+h, x:x+w]
-            eyes = eye_cascade.detectMultiScale(roi_gray)
-            if len(eyes) >= 2:
-                is_active = True
-                break
+        is_active = detection['is_active']
+        verdict = activity_tracker.record(student_id, subject_id, is_active)
 
         print(f"Activity Detection Result: {'Active' if is_active else 'Inactive'}")
+        logger.debug(f"Detection timing for student {student_id}: {detection['timing']}")
         
         notification_sent = False
         notification_message = ""
         if not is_active:
-            print(f"Student inactive. Current count: {inactivity_count}")
+            print(f"Student inactive. Current count: {verdict['inactivity_count']}")
         
-        if not is_active and inactivity_count >= 5:
+        if verdict['alert']:
             print("\n=== INACTIVITY THRESHOLD REACHED ===")
             try:
-                db = get_db_connection()
-                cursor = db.cursor(dictionary=True)
-
-                print("Getting student and mentor details...")
-                # Get student and mentor details
-                cursor.execute("""
-                    SELECT 
-                        s.name as student_name,
-                        m.phone_number as mentor_phone,
-                        m.name as mentor_name,
-                        s.class_id
-                    FROM students s
-                    JOIN mentors m ON s.mentor_id = m.id
-                    WHERE s.id = %s
-                """, (student_id,))
-
-                result = cursor.fetchone()
-                
-                if not result:
-                    print(f"No student/mentor found for student_id: {student_id}")
-                    logger.error(f"No student or mentor found for student_id: {student_id}")
-                    return jsonify({
-                        "status": "error",
-                        "message": "Student or mentor not found"
-                    }), 404
-
-                print(f"Found student: {result['student_name']}")
-                print(f"Mentor: {result['mentor_name']}")
-                print(f"Mentor phone: {result['mentor_phone']}")
-
-                if result['mentor_phone']:
-                    print("Getting current class information...")
-                    current_class = get_current_class(result['class_id'])
-                    
-                    if current_class:
-                        print(f"Current class found: {current_class['subject_name']}")
-                        sms_message = (
-                            f"STUDENT INACTIVITY ALERT!\n"
-                            f"Student: {result['student_name']}\n"
-                            f"Current Class: {current_class['subject_name']} ({current_class['subject_code']})\n"
-                            f"Teacher: {current_class['teacher_name']}\n"
-                            f"Class Time: {current_class['formatted_start_time']} - {current_class['formatted_end_time']}\n"
-                            f"Alert Time: {datetime.now().strftime('%I:%M %p')}\n"
-                            f"Status: Student has been inactive for 5 consecutive checks."
-                        )
-                    else:
-                        print("No current class found")
-                        sms_message = (
-                            f"STUDENT INACTIVITY ALERT!\n"
-                            f"Student: {result['student_name']}\n"
-                            f"Time: {datetime.now().strftime('%I:%M %p')}\n"
-                            f"Status: Student has been inactive for 5 consecutive checks.\n"
-                            f"Note: No scheduled class found at this time."
-                        )
-
-                    print("\n=== SENDING SMS NOTIFICATION ===")
-                    print(f"To: {result['mentor_name']} ({result['mentor_phone']})")
-                    print("Message Content:")
-                    print("------------------------")
-                    print(sms_message)
-                    print("------------------------")
-
-                    try:
-                        message = twilio_client.messages.create(
-                            from_=TWILIO_PHONE_NUMBER,
-                            to=result['mentor_phone'],
-                            body=sms_message
-                        )
-                        
-                        notification_sent = True
-                        notification_message = f"Alert SMS sent to mentor {result['mentor_name']}"
-                        print(f"SMS sent successfully!")
-                        print(f"Message SID: {message.sid}")
-                        print("============================\n")
-                        
-                        logger.info(f"SMS sent successfully! Message SID: {message.sid}")
-
-                        print("Resetting inactivity count...")
-                        cursor.execute("""
-                            UPDATE students 
-                            SET inactivity_count = 0, last_active = CURRENT_TIMESTAMP 
-                            WHERE id = %s
-                        """, (student_id,))
-                        
-                        db.commit()
-
-                    except Exception as e:
-                        print("\n=== SMS SENDING FAILED ===")
-                        print(f"Error: {str(e)}")
-                        print("========================\n")
-                        logger.error(f"Failed to send SMS: {e}")
-                        return jsonify({
-                            "status": "error",
-                            "message": f"Failed to send SMS: {str(e)}"
-                        }), 500
+                sent_message = send_inactivity_alert(student_id, subject_id)
+                if sent_message:
+                    notification_sent = True
+                    notification_message = sent_message
 
+            except LookupError as e:
+                return jsonify({
+                    "status": "error",
+                    "message": str(e)
+                }), 404
             except Exception as e:
+                activity_tracker.alert_failed(student_id, subject_id)
                 print(f"\n=== DATABASE ERROR ===")
                 print(f"Error: {str(e)}")
                 print("====================\n")
@@ -1422,11 +2144,6 @@ def analyze_stream():
                     "status": "error",
                     "message": f"Database error: {str(e)}"
                 }), 500
-            finally:
-                if 'cursor' in locals():
-                    cursor.close()
-                if 'db' in locals():
-                    db.close()
 
         print("\n=== ANALYSIS COMPLETE ===")
         print(f"Is Active: {is_active}")
@@ -1439,7 +2156,9 @@ def analyze_stream():
             "message": "Student is active" if is_active else "Inactivity detected",
             "notification_sent": notification_sent,
             "notification_message": notification_message,
-            "should_reset": notification_sent
+            "should_reset": notification_sent,
+            "inactivity_count": verdict['inactivity_count'],
+            "timing": detection['timing']
         })
 
     except Exception as e:
@@ -1451,9 +2170,90 @@ def analyze_stream():
             "status": "error",
             "message": str(e)
         }), 500
+
+@api.route('/analyze-stream/batch', methods=['POST'])
+def analyze_stream_batch():
+    """
+    Analyze many frames in one request. Each file part is named after the
+    student it belongs to (e.g. `frame_12`). `subject_id` applies to the
+    whole batch and can be overridden per student with `subject_id_12`.
+    """
+    if not HTTP_FRAME_INGEST:
+        return frame_ingest_disabled()
+    try:
+        frames = {}
+        for field, file in request.files.items():
+            if not field.startswith('frame_') or not field[len('frame_'):].isdigit():
+                continue
+            frames[field[len('frame_'):]] = file.read()
+
+        if not frames:
+            return jsonify({
+                "status": "error",
+                "message": "No frames provided"
+            }), 400
+
+        if len(frames) > MAX_BATCH_FRAMES:
+            return jsonify({
+                "status": "error",
+                "message": f"At most {MAX_BATCH_FRAMES} frames per batch"
+            }), 400
+
+        detections = detection_engine.analyze_batch(frames)
+
+        results = {}
+        for student_id, detection in detections.items():
+            if 'error' in detection:
+                results[student_id] = {
+                    "status": "error",
+                    "message": detection['error'],
+                    "dropped": detection.get('dropped', False)
+                }
+                continue
+
+            is_active = detection['is_active']
+            subject_id = request.form.get(f'subject_id_{student_id}', request.form.get('subject_id'))
+            verdict = activity_tracker.record(student_id, subject_id, is_active)
+
+            notification_sent = False
+            notification_message = ""
+            if verdict['alert']:
+                try:
+                    sent_message = send_inactivity_alert(student_id, subject_id)
+                    if sent_message:
+                        notification_sent = True
+                        notification_message = sent_message
+                except Exception as e:
+                    logger.error(f"Inactivity alert failed for student {student_id}: {e}")
+                    if not isinstance(e, LookupError):
+                        activity_tracker.alert_failed(student_id, subject_id)
+                    notification_message = str(e)
+
+            results[student_id] = {
+                "status": "success",
+                "expression": "active" if is_active else "inactive",
+                "message": "Student is active" if is_active else "Inactivity detected",
+                "notification_sent": notification_sent,
+                "notification_message": notification_message,
+                "should_reset": notification_sent,
+                "inactivity_count": verdict['inactivity_count'],
+                "timing": detection['timing']
+            }
+
+        return jsonify({
+            "status": "success",
+            "data": results
+        })
+
+    except Exception as e:
+        logger.error(f"Batch stream analysis error: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
           
 
-@app.route('/student/check-submission/<int:assignment_id>', methods=['GET'])
+@api.route('/student/check-submission/<int:assignment_id>', methods=['GET'])
 def check_submission(assignment_id):
     try:
         student_id = request.args.get('student_id')
@@ -1463,7 +2263,7 @@ def check_submission(assignment_id):
                 "message": "Student ID is required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         cursor.execute("""
@@ -1488,10 +2288,9 @@ def check_submission(assignment_id):
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
 
-@app.route('/student/marks', methods=['GET'])
+@api.route('/student/marks', methods=['GET'])
+@api_cache.cached(student_tags, ttl=300)
 def get_student_marks():
     try:
         student_id = request.args.get('student_id')
@@ -1501,7 +2300,7 @@ def get_student_marks():
                 "message": "Student ID is required"
             }), 400
 
-        db = get_db_connection()
+        db = get_db()
         cursor = db.cursor(dictionary=True)
 
         cursor.execute("""
@@ -1535,10 +2334,71 @@ def get_student_marks():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'db' in locals():
-            db.close()
 
-@app.route('/student/submit-assignment', methods=['POST'])
+@api.app_errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({
+        "status": "error",
+        "message": f"Upload exceeds {UPLOAD_CONFIG['max_bytes'] // (1024 * 1024)} MB"
+    }), 413
+
+def save_submission(student_id, assignment_id, filename, temp_path, size, content_hash):
+    """
+    Record a received upload and move it into the blob store. The
+    unique_submission key decides duplicates, and the blob reference is
+    taken first (the lock order BlobStore.collect relies on) and stored
+    before commit, so a rejected submission never touches stored files.
+    """
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    created = False
+    try:
+        blob_store.add_ref(cursor, content_hash, size)
+        try:
+            cursor.execute("""
+                INSERT INTO assignment_submissions 
+                (assignment_id, student_id, file_path, file_name, content_hash, file_size, status)
+                VALUES (%s, %s, %s, %s, %s, %s, 'submitted')
+            """, (assignment_id, student_id, blob_store.path_for(content_hash),
+                  secure_filename(filename) or 'submission', content_hash, size))
+        except IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            db.rollback()
+            upload_store.discard(temp_path)
+            return jsonify({
+                "status": "error",
+                "message": "Assignment already submitted"
+            }), 400
+
+        cursor.execute("""
+            UPDATE assignments 
+            SET status = 'completed'
+            WHERE id = %s
+        """, (assignment_id,))
+        # The assignment row's status changes for everyone the teacher sees
+        tags = assignment_tags(cursor, assignment_id)
+        created = blob_store.put(temp_path, content_hash)
+        db.commit()
+        api_cache.invalidate(f"student:{student_id}", *tags)
+
+        return jsonify({
+            "status": "success",
+            "message": "Assignment submitted successfully"
+        })
+
+    except Exception:
+        # A blob this request created goes before its row lock is released
+        if created:
+            blob_store.discard(content_hash)
+        else:
+            upload_store.discard(temp_path)
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+@api.route('/student/submit-assignment', methods=['POST'])
 def submit_assignment():
     try:
         if 'file' not in request.files:
@@ -1557,67 +2417,233 @@ def submit_assignment():
                 "message": "Missing required fields"
             }), 400
 
-        allowed_extensions = {'.pdf', '.doc', '.docx'}
         file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in allowed_extensions:
+        if file_ext not in SUBMISSION_EXTENSIONS:
             return jsonify({
                 "status": "error",
                 "message": "Invalid file type. Please upload PDF or DOC/DOCX files only."
             }), 400
 
-        db = get_db_connection()
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id FROM assignment_submissions 
-            WHERE assignment_id = %s AND student_id = %s
-        """, (assignment_id, student_id))
-        
-        if cursor.fetchone():
+        # Already on disk, see UploadRequest
+        temp_path, size, content_hash = upload_store.receive(file.stream)
+        return save_submission(student_id, assignment_id, file.filename, temp_path, size, content_hash)
+
+    except UploadTooLarge as e:
+        # Raised while request.files parses the body
+        return jsonify({"status": "error", "message": str(e)}), 413
+    except Exception as e:
+        logger.error(f"Error submitting assignment: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@api.route('/student/uploads', methods=['POST'])
+def start_upload():
+    """
+    Open a resumable submission upload. Body: student_id, assignment_id,
+    filename and size. Chunks are then PUT to /student/uploads/<upload_id>
+    with an Upload-Offset header, and the upload is finished with POST
+    /student/uploads/<upload_id>/complete.
+    """
+    try:
+        data = request.json or {}
+        student_id = data.get('student_id')
+        assignment_id = data.get('assignment_id')
+        filename = data.get('filename')
+        size = data.get('size')
+
+        if not all([student_id, assignment_id, filename]) or not isinstance(size, int) or size <= 0:
             return jsonify({
                 "status": "error",
-                "message": "Assignment already submitted"
+                "message": "student_id, assignment_id, filename and size are required"
+            }), 400
+
+        if os.path.splitext(filename)[1].lower() not in SUBMISSION_EXTENSIONS:
+            return jsonify({
+                "status": "error",
+                "message": "Invalid file type. Please upload PDF or DOC/DOCX files only."
             }), 400
-        filename = secure_filename(f"{student_id}_{assignment_id}_{file.filename}")
-        file_path = os.path.join('uploads', filename)
-        file.save(file_path)
 
         try:
-            cursor.execute("""
-                INSERT INTO assignment_submissions 
-                (assignment_id, student_id, file_path, status)
-                VALUES (%s, %s, %s, 'submitted')
-            """, (assignment_id, student_id, file_path))
-            cursor.execute("""
-                UPDATE assignments 
-                SET status = 'completed'
-                WHERE id = %s
-            """, (assignment_id,))
+            upload_id = upload_store.start(size, {
+                "student_id": student_id,
+                "assignment_id": assignment_id,
+                "filename": filename
+            })
+        except UploadTooLarge as e:
+            return jsonify({"status": "error", "message": str(e)}), 413
+
+        return jsonify({
+            "status": "success",
+            "data": {
+                "upload_id": upload_id,
+                "offset": 0,
+                "chunk_size": upload_store.chunk_size
+            }
+        }), 201
+
+    except Exception as e:
+        logger.error(f"Error starting upload: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@api.route('/student/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def upload_chunk(upload_id):
+    """
+    GET returns the offset to resume from, PUT appends the raw request body
+    at the Upload-Offset header, DELETE abandons the upload.
+    """
+    try:
+        if request.method == 'DELETE':
+            upload_store.abort(upload_id)
+            return jsonify({"status": "success"})
+
+        if request.method == 'PUT':
+            offset = request.headers.get('Upload-Offset', type=int)
+            if offset is None:
+                return jsonify({
+                    "status": "error",
+                    "message": "Upload-Offset header is required"
+                }), 400
+            offset = upload_store.append(upload_id, offset, request.stream)
+        else:
+            offset = upload_store.status(upload_id)['offset']
+
+        return jsonify({
+            "status": "success",
+            "data": {"offset": offset}
+        })
+
+    except KeyError:
+        return jsonify({"status": "error", "message": "Upload not found"}), 404
+    except UploadOffsetMismatch as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "data": {"offset": e.offset}
+        }), 409
+    except UploadTooLarge as e:
+        return jsonify({"status": "error", "message": str(e)}), 413
+    except Exception as e:
+        logger.error(f"Error receiving upload chunk: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@api.route('/student/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    try:
+        try:
+            temp_path, size, content_hash, metadata = upload_store.complete(upload_id)
+        except KeyError:
+            return jsonify({"status": "error", "message": "Upload not found"}), 404
+        except UploadOffsetMismatch as e:
+            return jsonify({
+                "status": "error",
+                "message": f"Upload incomplete: {e}",
+                "data": {"offset": e.offset}
+            }), 409
 
-            db.commit()
+        return save_submission(metadata['student_id'], metadata['assignment_id'], metadata['filename'],
+                               temp_path, size, content_hash)
 
+    except Exception as e:
+        logger.error(f"Error completing upload: {e}")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+@api.route('/submissions/<int:submission_id>/file', methods=['GET'])
+def download_submission(submission_id):
+    """
+    Stream a submission's file to the student who submitted it
+    (`student_id`) or the teacher of its subject (`teacher_id`). Range and
+    conditional requests are served by send_file; full responses go through
+    the server's sendfile support.
+    """
+    try:
+        student_id = request.args.get('student_id', type=int)
+        teacher_id = request.args.get('teacher_id', type=int)
+
+        if student_id is None and teacher_id is None:
             return jsonify({
-                "status": "success",
-                "message": "Assignment submitted successfully"
-            })
+                "status": "error",
+                "message": "Student ID or Teacher ID is required"
+            }), 400
 
-        except Exception as e:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            raise e
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT
+                asub.file_path,
+                asub.file_name,
+                asub.content_hash,
+                asub.student_id,
+                s.teacher_id
+            FROM assignment_submissions asub
+            JOIN assignments a ON asub.assignment_id = a.id
+            JOIN subjects s ON a.subject_id = s.id
+            WHERE asub.id = %s
+        """, (submission_id,))
+        submission = cursor.fetchone()
+        cursor.close()
+        # Nothing below needs the database; don't hold a connection while
+        # a slow client downloads
+        release_db()
+
+        if not submission:
+            return jsonify({
+                "status": "error",
+                "message": "Submission not found"
+            }), 404
+
+        if not ((student_id is not None and student_id == submission['student_id'])
+                or (teacher_id is not None and teacher_id == submission['teacher_id'])):
+            return jsonify({
+                "status": "error",
+                "message": "Not allowed to access this submission"
+            }), 403
+
+        if not os.path.isfile(submission['file_path']):
+            return jsonify({
+                "status": "error",
+                "message": "Submission file not found"
+            }), 404
+
+        response = send_file(
+            os.path.abspath(submission['file_path']),
+            download_name=submission['file_name'] or os.path.basename(submission['file_path']),
+            conditional=True,
+            etag=submission['content_hash'] or True,
+            max_age=SUBMISSION_FILE_MAX_AGE if submission['content_hash'] else None
+        )
+        # Per-user content: browsers may keep it, shared caches must not
+        response.cache_control.private = True
+        response.cache_control.public = False
+        if submission['content_hash']:
+            response.cache_control.immutable = True
+        return response
 
     except Exception as e:
-        logger.error(f"Error submitting assignment: {e}")
+        logger.error(f"Error downloading submission {submission_id}: {e}")
         return jsonify({
             "status": "error",
             "message": str(e)
         }), 500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'db' in locals():
-            db.close()
 
+@api.route('/metrics/blob-store', methods=['GET'])
+def get_blob_store_metrics():
+    return jsonify({
+        "status": "success",
+        "data": blob_store.metrics()
+    })
 
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
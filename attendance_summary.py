@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(date, attendance_id):
+    return f"{date:%Y%m%d}-{attendance_id}"
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of `encode_cursor`; raises ValueError on a malformed cursor.
+    """
+    date, _, attendance_id = cursor.partition('-')
+    return datetime.strptime(date, '%Y%m%d').date(), int(attendance_id)
+
+
+class AttendanceSummaryCache:
+    """
+    Per-student attendance summaries (present / total / percentage / current
+    absence streak per subject), read from the counts AbsenceStreakTracker
+    keeps in absence_streaks and cached in-process for `ttl` seconds, LRU
+    bounded to `max_entries` students. Writers call `invalidate` after
+    committing attendance.
+
+    Every entry remembers the student's version from before its load, and is
+    only served while that version is still current, so a load racing a
+    write cannot outlive the write's `invalidate`. Versions are local
+    generation counters, or with `versions` (response_cache.DatabaseVersions)
+    the shared "attendance:<student_id>" tags, so an invalidation in one
+    worker reaches the summaries cached by all of them.
+    """
+
+    def __init__(self, threshold=3, ttl=60, max_entries=10000, versions=None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = versions
+
+        self._entries = OrderedDict()
+        # student_id -> generation of its last invalidate, LRU bounded like
+        # _entries; students evicted from it read as _floor
+        self._generations = OrderedDict()
+        self._generation = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _version(self, student_id):
+        if self.versions is not None:
+            return self.versions.versions([f"attendance:{student_id}"])[0]
+        with self._lock:
+            return self._generations.get(student_id, self._floor)
+
+    def get(self, cursor, student_id):
+        student_id = int(student_id)
+        version = self._version(student_id)
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry and entry[0] > time.monotonic() and entry[1] == version:
+                self._entries.move_to_end(student_id)
+                self._hits += 1
+                return entry[2]
+            self._misses += 1
+
+        summary = self._load(cursor, student_id)
+        with self._lock:
+            self._entries[student_id] = (time.monotonic() + self.ttl, version, summary)
+            self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return summary
+
+    def invalidate(self, student_ids):
+        student_ids = [int(student_id) for student_id in student_ids]
+        with self._lock:
+            for student_id in student_ids:
+                self._entries.pop(student_id, None)
+                if self.versions is None:
+                    self._generation += 1
+                    self._generations[student_id] = self._generation
+                    self._generations.move_to_end(student_id)
+            while len(self._generations) > self.max_entries:
+                # Raising the floor also changes what evicted students read
+                _, self._floor = self._generations.popitem(last=False)
+        if self.versions is not None and student_ids:
+            try:
+                self.versions.bump([f"attendance:{student_id}" for student_id in student_ids])
+            except Exception as e:
+                # The write is committed; other workers catch up within `ttl`
+                logger.error(f"Attendance summary invalidation failed for {student_ids}: {e}")
+
+    def _load(self, cursor, student_id):
+        cursor.execute("""
+            SELECT
+                st.subject_id,
+                s.name as subject,
+                s.code as subject_code,
+                st.present_count,
+                st.total_count,
+                st.current_streak,
+                DATE_FORMAT(st.last_date, '%Y-%m-%d') as last_date
+            FROM absence_streaks st
+            JOIN subjects s ON st.subject_id = s.id
+            WHERE st.student_id = %s
+            ORDER BY s.name
+        """, (student_id,))
+        subjects = cursor.fetchall()
+
+        present = total = 0
+        for subject in subjects:
+            subject['percentage'] = round(subject['present_count'] * 100 / subject['total_count'], 1) if subject['total_count'] else 0
+            subject['at_risk'] = subject['current_streak'] >= self.threshold
+            present += subject['present_count']
+            total += subject['total_count']
+
+        return {
+            "subjects": subjects,
+            "overall": {
+                "present_count": present,
+                "total_count": total,
+                "percentage": round(present * 100 / total, 1) if total else 0
+            }
+        }
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses
+            }
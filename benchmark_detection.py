@@ -0,0 +1,122 @@
+"""
+Accuracy / latency benchmark for the detection preprocessing settings.
+
+    python benchmark_detection.py FRAMES_DIR [--widths 960 640 480 320]
+                                  [--scale-factors 1.3 1.1] [--repeat 3]
+
+FRAMES_DIR holds JPEG frames as captured by ClassMonitoring. Frames inside an
+`active/` or `inactive/` subdirectory are labelled and each setting reports
+its accuracy against those labels; every setting also reports how often it
+agrees with the full-resolution baseline (the pre-preprocessing behaviour).
+Pick the smallest target_width whose accuracy holds up and set it in
+DETECTION_CONFIG['preprocess'].
+"""
+import argparse
+import os
+import sys
+import time
+
+import detection
+
+BASELINE = {'target_width': None, 'max_reduce': 1, 'scale_factor': 1.3, 'min_neighbors': 5}
+
+
+def load_frames(root):
+    """
+    [(path, frame_bytes, label)] for every JPEG under `root`; label is True /
+    False for frames in active/ / inactive/, else None.
+    """
+    frames = []
+    for directory, _, names in os.walk(root):
+        parent = os.path.basename(directory)
+        label = {'active': True, 'inactive': False}.get(parent)
+        for name in sorted(names):
+            if name.lower().endswith(('.jpg', '.jpeg')):
+                path = os.path.join(directory, name)
+                with open(path, 'rb') as f:
+                    frames.append((path, f.read(), label))
+    return frames
+
+
+def settings(widths, scale_factors):
+    yield 'baseline', BASELINE
+    for width in widths:
+        for scale_factor in scale_factors:
+            options = dict(detection.DEFAULT_PREPROCESS, target_width=width, scale_factor=scale_factor)
+            yield f"w={width} sf={scale_factor}", options
+            if scale_factor == scale_factors[0]:
+                # Same size without the reduced decode, to show what it saves
+                yield f"w={width} sf={scale_factor} resize-only", dict(options, max_reduce=1)
+
+
+def run(frames, options, repeat):
+    results, decode, detect = [], [], []
+    for _, frame_bytes, _ in frames:
+        for _ in range(repeat):
+            result = detection._analyze_frame(frame_bytes, time.time(), options)
+            decode.append(result['timing']['decode_ms'])
+            detect.append(result['timing']['detect_ms'])
+        results.append(result)
+    return results, decode, detect
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0
+
+
+def _p95(values):
+    values = sorted(values)
+    return values[int(len(values) * 0.95)] if values else 0
+
+
+def benchmark(frames, widths, scale_factors, repeat=3):
+    """
+    One row per setting: accuracy against the labels (None when no frame is
+    labelled), agreement with the baseline on is_active and on the face
+    count, and decode / detect latency in ms.
+    """
+    detection._load_cascades()
+    labelled = [i for i, frame in enumerate(frames) if frame[2] is not None]
+    reference = None
+    rows = []
+    for name, options in settings(widths, scale_factors):
+        results, decode, detect = run(frames, options, repeat)
+        if reference is None:
+            reference = results
+        totals = [a + b for a, b in zip(decode, detect)]
+        rows.append({
+            "setting": name,
+            "frame_size": results[0]['frame_size'] if results else None,
+            "accuracy": round(_mean([results[i]['is_active'] == frames[i][2] for i in labelled]), 3) if labelled else None,
+            "agreement": round(_mean([r['is_active'] == b['is_active'] for r, b in zip(results, reference)]), 3),
+            "face_agreement": round(_mean([r['faces'] == b['faces'] for r, b in zip(results, reference)]), 3),
+            "decode_ms": round(_mean(decode), 2),
+            "detect_ms": round(_mean(detect), 2),
+            "p95_ms": round(_p95(totals), 2)
+        })
+    return rows
+
+
+def print_table(rows):
+    columns = ["setting", "frame_size", "accuracy", "agreement", "face_agreement", "decode_ms", "detect_ms", "p95_ms"]
+    cells = [[str(row[column]) if row[column] is not None else '-' for column in columns] for row in rows]
+    widths = [max(len(column), *(len(cell[i]) for cell in cells)) for i, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)).rstrip())
+    for cell in cells:
+        print('  '.join(value.ljust(width) for value, width in zip(cell, widths)).rstrip())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark detection preprocessing settings")
+    parser.add_argument('frames', help="directory of captured JPEG frames")
+    parser.add_argument('--widths', type=int, nargs='+', default=[960, 640, 480, 320], help="target widths to try")
+    parser.add_argument('--scale-factors', type=float, nargs='+', default=[1.3, 1.1], help="detectMultiScale scale factors to try")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per frame, for steadier timings")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    if not frames:
+        print(f"No JPEG frames under {args.frames}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{len(frames)} frames, {sum(1 for frame in frames if frame[2] is not None)} labelled")
+    print_table(benchmark(frames, args.widths, args.scale_factors, args.repeat))
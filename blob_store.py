@@ -0,0 +1,240 @@
+"""
+Content-addressed storage for submission files.
+
+    python blob_store.py --import-legacy   move flat uploads/ files into the
+                                           blob store and repoint their rows
+    python blob_store.py --collect         delete unreferenced blobs now
+"""
+import argparse
+import atexit
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+# Legacy files were saved as secure_filename(f"{student_id}_{assignment_id}_{name}")
+_LEGACY_PREFIX = re.compile(r'^\d+_\d+_')
+
+
+class BlobStore:
+    """
+    Files stored once per SHA-256 under `root`, at root/ab/cd/abcd..., so
+    identical uploads share one file and no directory holds more than 256
+    shards. The blobs table (migrations/0009) counts the submissions that
+    point at each blob.
+
+    Writers call `add_ref` in the transaction that records the referencing
+    row, and only then `put` the file. The blob row lock serializes them
+    against `collect`, which removes blobs nobody references any more (after
+    `grace` seconds) and corrects counts left too high by FK cascades. Once
+    started, collection runs every `gc_interval` seconds.
+    """
+
+    def __init__(self, pool, root='uploads/blobs', grace=3600, gc_interval=6 * 3600):
+        self.pool = pool
+        self.root = root
+        self.grace = grace
+        self.gc_interval = gc_interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_run = None
+        self._collected = 0
+
+    def path_for(self, digest):
+        if not _DIGEST.match(digest or ''):
+            raise ValueError(f"Invalid content hash: {digest}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def add_ref(self, cursor, digest, size):
+        cursor.execute("""
+            INSERT INTO blobs (content_hash, size, ref_count)
+            VALUES (%s, %s, 1)
+            ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+        """, (digest, size))
+
+    def put(self, temp_path, digest):
+        """
+        Move `temp_path` into the store as `digest`, or drop it if the blob
+        already exists. Returns True if a new blob file was created. Call
+        after `add_ref`, before committing.
+        """
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return True
+
+    def discard(self, digest):
+        try:
+            os.remove(self.path_for(digest))
+        except FileNotFoundError:
+            pass
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='blob-collector', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.gc_interval):
+            try:
+                with self.pool.acquire() as db:
+                    self.collect(db)
+            except Exception as e:
+                logger.error(f"Blob collection failed: {e}")
+
+    def collect(self, db):
+        """
+        Delete blobs no submission references. Each candidate is re-checked
+        under its row lock, so a concurrent `add_ref` either wins (and the
+        blob stays) or waits until the file is gone and then stores it
+        afresh. Returns the number of blobs removed.
+        """
+        cursor = db.cursor(dictionary=True)
+        removed = 0
+        try:
+            cursor.execute("""
+                SELECT b.content_hash
+                FROM blobs b
+                WHERE b.updated_at < NOW() - INTERVAL %s SECOND
+                AND (b.ref_count <= 0 OR NOT EXISTS (
+                    SELECT 1 FROM assignment_submissions s
+                    WHERE s.content_hash = b.content_hash
+                ))
+            """, (self.grace,))
+            candidates = [row['content_hash'] for row in cursor.fetchall()]
+            db.commit()
+
+            for digest in candidates:
+                try:
+                    cursor.execute("SELECT ref_count FROM blobs WHERE content_hash = %s FOR UPDATE", (digest,))
+                    blob = cursor.fetchone()
+                    cursor.execute("""
+                        SELECT COUNT(*) as refs FROM assignment_submissions
+                        WHERE content_hash = %s LOCK IN SHARE MODE
+                    """, (digest,))
+                    refs = cursor.fetchone()['refs']
+                    if blob is None:
+                        pass
+                    elif refs:
+                        if refs != blob['ref_count']:
+                            cursor.execute("UPDATE blobs SET ref_count = %s WHERE content_hash = %s", (refs, digest))
+                    else:
+                        cursor.execute("DELETE FROM blobs WHERE content_hash = %s", (digest,))
+                        # Removed while the row is still locked, see above
+                        self.discard(digest)
+                        removed += 1
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Could not collect blob {digest}: {e}")
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self._last_run = time.time()
+            self._collected += removed
+        if removed:
+            logger.info(f"Removed {removed} unreferenced blobs")
+        return removed
+
+    def import_legacy(self, db):
+        """
+        Move submissions still stored as flat files into the store, one
+        commit per file. Returns the number of submissions moved.
+        """
+        cursor = db.cursor(dictionary=True)
+        moved = 0
+        try:
+            cursor.execute("""
+                SELECT id, file_path, file_name
+                FROM assignment_submissions
+                WHERE file_path NOT LIKE %s
+            """, (os.path.join(self.root, '%'),))
+            rows = cursor.fetchall()
+
+            for row in rows:
+                if not os.path.isfile(row['file_path']):
+                    logger.warning(f"Submission {row['id']}: {row['file_path']} is missing, skipped")
+                    continue
+
+                fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.import')
+                digest = hashlib.sha256()
+                with os.fdopen(fd, 'wb') as out, open(row['file_path'], 'rb') as f:
+                    for chunk in iter(lambda: f.read(64 * 1024), b''):
+                        digest.update(chunk)
+                        out.write(chunk)
+                digest = digest.hexdigest()
+                size = os.path.getsize(temp_path)
+
+                created = False
+                try:
+                    self.add_ref(cursor, digest, size)
+                    cursor.execute("""
+                        UPDATE assignment_submissions
+                        SET file_path = %s, file_name = %s, content_hash = %s, file_size = %s
+                        WHERE id = %s
+                    """, (
+                        self.path_for(digest),
+                        row['file_name'] or _LEGACY_PREFIX.sub('', os.path.basename(row['file_path'])),
+                        digest, size, row['id']
+                    ))
+                    created = self.put(temp_path, digest)
+                    db.commit()
+                except Exception:
+                    if created:
+                        self.discard(digest)
+                    elif os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    db.rollback()
+                    raise
+                os.remove(row['file_path'])
+                moved += 1
+        finally:
+            cursor.close()
+
+        logger.info(f"Moved {moved} submissions into the blob store")
+        return moved
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "last_run": self._last_run,
+                "collected": self._collected
+            }
+
+
+if __name__ == '__main__':
+    from app import blob_store, connection_pool
+
+    parser = argparse.ArgumentParser(description="Maintain the submission blob store")
+    parser.add_argument('--import-legacy', action='store_true', help="move flat uploads into the blob store")
+    parser.add_argument('--collect', action='store_true', help="delete unreferenced blobs")
+    args = parser.parse_args()
+
+    os.makedirs(blob_store.root, exist_ok=True)
+    with connection_pool.acquire() as db:
+        if args.import_legacy:
+            blob_store.import_legacy(db)
+        if args.collect:
+            blob_store.collect(db)
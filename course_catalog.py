@@ -0,0 +1,133 @@
+import json
+import threading
+
+# Course templates per level. Placeholders: {subject}, and the subject name
+# lower-cased with spaces replaced for URLs: {dash}, {plain}, {underscore},
+# {plus}.
+DEFAULT_TEMPLATES = {
+    "Beginner": [
+        {
+            "title": "Introduction to {subject}",
+            "platform": "freeCodeCamp",
+            "description": "Learn the fundamentals of {subject} with hands-on practice",
+            "url": "https://www.freecodecamp.org/learn/{dash}"
+        },
+        {
+            "title": "{subject} Basics",
+            "platform": "W3Schools",
+            "description": "Step-by-step guide to {subject} fundamentals",
+            "url": "https://www.w3schools.com/{plain}"
+        },
+        {
+            "title": "Getting Started with {subject}",
+            "platform": "MDN Web Docs",
+            "description": "Comprehensive guide to {subject} for beginners",
+            "url": "https://developer.mozilla.org/en-US/docs/Learn/{underscore}"
+        }
+    ],
+    "Intermediate": [
+        {
+            "title": "Intermediate {subject}",
+            "platform": "edX",
+            "description": "Deepen your understanding of {subject} concepts",
+            "url": "https://www.edx.org/learn/{dash}"
+        },
+        {
+            "title": "Professional {subject} Development",
+            "platform": "Codecademy",
+            "description": "Build professional {subject} skills",
+            "url": "https://www.codecademy.com/learn/{dash}"
+        },
+        {
+            "title": "{subject} in Practice",
+            "platform": "GeeksforGeeks",
+            "description": "Practice-oriented {subject} learning",
+            "url": "https://www.geeksforgeeks.org/{dash}"
+        }
+    ],
+    "Advanced": [
+        {
+            "title": "Advanced {subject} Concepts",
+            "platform": "MIT OpenCourseWare",
+            "description": "Master advanced {subject} topics",
+            "url": "https://ocw.mit.edu/search/?q={plus}"
+        },
+        {
+            "title": "Expert {subject} Techniques",
+            "platform": "Stanford Online",
+            "description": "Advanced {subject} methodologies and best practices",
+            "url": "https://online.stanford.edu/search-catalog?query={plus}"
+        },
+        {
+            "title": "{subject} Mastery",
+            "platform": "Khan Academy",
+            "description": "Complete mastery of {subject} concepts",
+            "url": "https://www.khanacademy.org/search?query={plus}"
+        }
+    ]
+}
+
+# (upper bound of the percentage, level), checked in order
+DEFAULT_LEVELS = [(60, "Beginner"), (75, "Intermediate"), (None, "Advanced")]
+
+
+class CourseCatalog:
+    """
+    Course recommendations keyed by (subject, level). Templates are loaded
+    once and each (subject, level) list is rendered on first use and then
+    served from memory; the returned lists are shared and must not be
+    modified.
+    """
+
+    def __init__(self, templates=None, levels=None):
+        self.templates = templates or DEFAULT_TEMPLATES
+        self.levels = levels or DEFAULT_LEVELS
+        self._courses = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Build a catalog from a JSON file shaped like DEFAULT_TEMPLATES.
+        """
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def level_for(self, percentage):
+        for bound, level in self.levels:
+            if bound is None or percentage < bound:
+                return level
+        return self.levels[-1][1]
+
+    def courses(self, subject, level):
+        key = (subject, level)
+        courses = self._courses.get(key)
+        if courses is None:
+            courses = self._render(subject, level)
+            with self._lock:
+                courses = self._courses.setdefault(key, courses)
+        return courses
+
+    def _render(self, subject, level):
+        slug = subject.lower()
+        values = {
+            "subject": subject,
+            "dash": slug.replace(' ', '-'),
+            "plain": slug.replace(' ', ''),
+            "underscore": slug.replace(' ', '_'),
+            "plus": slug.replace(' ', '+')
+        }
+        return [
+            {
+                "title": template["title"].format(**values),
+                "platform": template["platform"],
+                "difficulty": level,
+                "description": template["description"].format(**values),
+                "url": template["url"].format(**values)
+            }
+            for template in self.templates[level]
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._courses = {}
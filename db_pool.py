@@ -0,0 +1,217 @@
+import logging
+import queue
+import threading
+import time
+
+import mysql.connector
+from flask import current_app, g
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool.
+
+    Keeps up to `pool_size` idle connections around and allows up to
+    `max_overflow` extra connections under burst load; overflow connections
+    are closed instead of being returned to the idle set. Connections are
+    pinged on borrow (`pre_ping`) and replaced once they are older than
+    `recycle` seconds or have sat idle for longer than `idle_timeout`.
+    """
+
+    def __init__(self, config, pool_size=10, max_overflow=10, timeout=5.0,
+                 recycle=1800, idle_timeout=300, pre_ping=True):
+        self.config = config
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size + max_overflow)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._opened += 1
+        return {'conn': conn, 'created': time.monotonic(), 'last_used': time.monotonic()}
+
+    def _discard(self, entry):
+        try:
+            entry['conn'].close()
+        except Exception as e:
+            logger.warning(f"Error closing pooled connection: {e}")
+        with self._lock:
+            self._opened -= 1
+
+    def _is_usable(self, entry):
+        now = time.monotonic()
+        if self.recycle and now - entry['created'] > self.recycle:
+            return False
+        if self.idle_timeout and now - entry['last_used'] > self.idle_timeout:
+            return False
+        if self.pre_ping:
+            try:
+                entry['conn'].ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def acquire(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection")
+        waited = time.monotonic() - started
+
+        try:
+            entry = None
+            while entry is None:
+                try:
+                    entry = self._idle.get_nowait()
+                except queue.Empty:
+                    entry = self._open()
+                    break
+                if not self._is_usable(entry):
+                    self._discard(entry)
+                    with self._lock:
+                        self._reconnects += 1
+                    entry = None
+        except Exception as e:
+            self._slots.release()
+            logger.error(f"Database connection error: {e}")
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return PooledConnection(self, entry)
+
+    def release(self, entry):
+        try:
+            # End any implicit transaction so the next borrower gets a fresh snapshot
+            entry['conn'].rollback()
+            entry['last_used'] = time.monotonic()
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put(entry)
+            else:
+                self._discard(entry)
+        except Exception as e:
+            logger.warning(f"Dropping broken pooled connection: {e}")
+            self._discard(entry)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def prefill(self, count):
+        """
+        Open up to `count` idle connections ahead of traffic.
+        """
+        opened = []
+        try:
+            for _ in range(min(count, self.pool_size)):
+                opened.append(self.acquire())
+        finally:
+            for conn in opened:
+                conn.close()
+
+    def dispose(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "opened": self._opened,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3)
+            }
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a borrowed connection. `close()` hands the connection
+    back to the pool instead of closing the socket.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise RuntimeError("Connection already returned to the pool")
+        return getattr(self._entry['conn'], name)
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def init_app(app, pool):
+    """
+    Register `pool` as the request-scoped connection source for `app`.
+    """
+    app.extensions['db_pool'] = pool
+
+    @app.teardown_appcontext
+    def _return_db_connection(exc):
+        db = g.pop('db', None)
+        if db is not None:
+            db.close()
+
+
+def get_db():
+    """
+    Borrow one connection for the current app/request context. It is returned
+    to the pool automatically on teardown.
+    """
+    if 'db' not in g:
+        g.db = current_app.extensions['db_pool'].acquire()
+    return g.db
+
+
+def release_db():
+    """
+    Return the current context's connection early, e.g. before a request
+    waits on slow external work. A later get_db() borrows a fresh one.
+    """
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
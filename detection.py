@@ -0,0 +1,441 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Preprocessing and detection settings. Frames are decoded straight to
+# grayscale, at 1/2, 1/4 or 1/8 size when the JPEG is at least that much
+# wider than `target_width` (at most `max_reduce`), then area-resized down
+# to `target_width`. `target_width=None` keeps the full resolution.
+DEFAULT_PREPROCESS = {
+    'target_width': 640,
+    'max_reduce': 4,
+    'scale_factor': 1.3,
+    'min_neighbors': 5
+}
+
+_REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+}
+
+# Per-process cascades and settings, set once by the pool initializer
+_face_cascade = None
+_eye_cascade = None
+_preprocess = DEFAULT_PREPROCESS
+
+
+class FrameDropped(Exception):
+    pass
+
+
+def _load_cascades(preprocess=None):
+    global _face_cascade, _eye_cascade, _preprocess
+    # Each worker is single-threaded; let the pool provide the parallelism
+    cv2.setNumThreads(1)
+    _preprocess = dict(DEFAULT_PREPROCESS, **(preprocess or {}))
+    _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    _eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+
+
+def _jpeg_size(data):
+    """
+    (width, height) from a JPEG's SOF header without decoding it, or None.
+    """
+    if data[:2] != b'\xff\xd8':
+        return None
+    i, n = 2, len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return int.from_bytes(data[i + 7:i + 9], 'big'), int.from_bytes(data[i + 5:i + 7], 'big')
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+
+def preprocess_frame(frame_bytes, target_width=640, max_reduce=4, **_):
+    """
+    Decode `frame_bytes` to a grayscale image no wider than `target_width`,
+    using libjpeg's reduced-size decoding where possible so the full frame is
+    never materialized. Raises ValueError if the image cannot be decoded.
+    """
+    reduce = 1
+    size = _jpeg_size(frame_bytes) if target_width else None
+    if size:
+        for factor in (8, 4, 2):
+            if factor <= max_reduce and -(-size[0] // factor) >= target_width:
+                reduce = factor
+                break
+
+    img = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), _REDUCED_DECODE_FLAGS[reduce])
+    if img is None:
+        raise ValueError("Could not decode image")
+
+    height, width = img.shape[:2]
+    if target_width and width > target_width:
+        img = cv2.resize(img, (target_width, max(1, round(height * target_width / width))),
+                         interpolation=cv2.INTER_AREA)
+    return img
+
+
+def _search_region(img, hint):
+    """
+    (x, y, w, h) of the hint's face box grown by its `margin` (a fraction of
+    the box size) on each side and clipped to `img`, or None if the hint is
+    for another frame size.
+    """
+    height, width = img.shape[:2]
+    if not hint or list(hint['frame_size']) != [width, height]:
+        return None
+    x, y, w, h = hint['box']
+    margin = hint['margin']
+    x0, y0 = max(0, int(x - w * margin)), max(0, int(y - h * margin))
+    x1, y1 = min(width, int(x + w * (1 + margin))), min(height, int(y + h * (1 + margin)))
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _detect_faces(img, options, hint=None):
+    """
+    Face boxes in `img` and whether they came from the tracked region. With a
+    hint only the region around the previous face is scanned, for faces of
+    roughly the previous size; a miss falls back to the full frame.
+    """
+    region = _search_region(img, hint)
+    if region:
+        rx, ry, rw, rh = region
+        size = hint['box'][2]
+        faces = _face_cascade.detectMultiScale(
+            img[ry:ry+rh, rx:rx+rw], options['scale_factor'], options['min_neighbors'],
+            minSize=(int(size * 0.7), int(size * 0.7)),
+            maxSize=(int(size * 1.4), int(size * 1.4))
+        )
+        if len(faces):
+            return [(x + rx, y + ry, w, h) for (x, y, w, h) in faces], True
+    return _face_cascade.detectMultiScale(img, options['scale_factor'], options['min_neighbors']), False
+
+
+def _analyze_frame(frame_bytes, submitted_at, preprocess=None, hint=None):
+    started = time.time()
+    if _face_cascade is None:
+        _load_cascades()
+    options = preprocess or _preprocess
+
+    img = preprocess_frame(frame_bytes, **options)
+    decoded = time.time()
+
+    faces, tracked = _detect_faces(img, options, hint)
+    is_active = False
+    face = None
+
+    for (x, y, w, h) in faces:
+        roi_gray = img[y:y+h, x:x+w]
+        eyes = _eye_cascade.detectMultiScale(roi_gray)
+        if len(eyes) >= 2:
+            is_active = True
+            face = (x, y, w, h)
+            break
+    if face is None and len(faces):
+        face = max(faces, key=lambda box: box[2] * box[3])
+    finished = time.time()
+
+    return {
+        "is_active": is_active,
+        "faces": len(faces),
+        "face": [int(v) for v in face] if face is not None else None,
+        "tracked": tracked,
+        "frame_size": [img.shape[1], img.shape[0]],
+        "timing": {
+            "queue_ms": round((started - submitted_at) * 1000, 2),
+            "decode_ms": round((decoded - started) * 1000, 2),
+            "detect_ms": round((finished - decoded) * 1000, 2)
+        }
+    }
+
+
+def _warm_worker(delay):
+    # Holding each worker briefly makes the pool spawn all of them
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _analyze_frames(frames, submitted_at):
+    results = {}
+    for key, frame_bytes, hint in frames:
+        try:
+            results[key] = _analyze_frame(frame_bytes, submitted_at, None, hint)
+        except ValueError as e:
+            results[key] = {"error": str(e)}
+    return results
+
+
+class FaceTracker:
+    """
+    Last face box per stream (student), used to hint the next frame's search
+    at the region around it. Every `full_scan_every` frames, after a miss, or
+    once a box is older than `ttl` seconds the next frame gets no hint and is
+    scanned in full. At most `max_entries` streams are kept, LRU.
+    """
+
+    def __init__(self, margin=0.5, full_scan_every=10, ttl=30, max_entries=10000):
+        self.margin = margin
+        self.full_scan_every = full_scan_every
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self._tracked = 0
+        self._full_scans = 0
+        self._misses = 0
+
+    def hint(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return None
+            if state['expires'] <= time.monotonic() or state['since_full'] >= self.full_scan_every:
+                return None
+            return {"box": state['box'], "frame_size": state['frame_size'], "margin": self.margin}
+
+    def update(self, key, result):
+        with self._lock:
+            if result['tracked']:
+                self._tracked += 1
+            else:
+                self._full_scans += 1
+            if result['face'] is None:
+                if self._states.pop(key, None) is not None:
+                    self._misses += 1
+                return
+            state = self._states.get(key)
+            self._states[key] = {
+                "box": result['face'],
+                "frame_size": result['frame_size'],
+                "since_full": state['since_full'] + 1 if state and result['tracked'] else 0,
+                "expires": time.monotonic() + self.ttl
+            }
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+
+    def metrics(self):
+        with self._lock:
+            frames = self._tracked + self._full_scans
+            return {
+                "streams": len(self._states),
+                "tracked": self._tracked,
+                "full_scans": self._full_scans,
+                "misses": self._misses,
+                "tracked_ratio": round(self._tracked / frames, 3) if frames else None
+            }
+
+
+class DetectionEngine:
+    """
+    Runs face/eye detection in a bounded process pool.
+
+    At most `max_pending` frames (or batch chunks) may be queued or running at
+    once; further frames are rejected with FrameDropped instead of queueing
+    up latency.
+
+    Frames submitted with a key (the student id) are tracked: the last face
+    box per key is sent along with the next frame so the worker can search
+    around it instead of the whole frame (see FaceTracker). `tracking=None`
+    disables this.
+    """
+
+    def __init__(self, workers=2, max_pending=16, timeout=5.0, preprocess=None, tracking=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.preprocess = dict(DEFAULT_PREPROCESS, **(preprocess or {}))
+        self.tracker = FaceTracker(**tracking) if tracking is not None else None
+
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._processed = 0
+        self._dropped = 0
+        self._failed = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_load_cascades,
+                    initargs=(self.preprocess,)
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, payload, *args, dropped=1):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._dropped += dropped
+            raise FrameDropped("Detection queue is full, frame dropped")
+
+        submitted_at = time.time()
+        try:
+            try:
+                future = self._get_executor().submit(fn, payload, submitted_at, *args)
+            except BrokenProcessPool:
+                self._reset_executor()
+                future = self._get_executor().submit(fn, payload, submitted_at, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        future.submitted_at = submitted_at
+        return future
+
+    def _hint(self, key):
+        if self.tracker is None or key is None:
+            return None
+        return self.tracker.hint(str(key))
+
+    def _track(self, key, result):
+        if self.tracker is not None and key is not None:
+            self.tracker.update(str(key), result)
+
+    def submit(self, frame_bytes, key=None):
+        future = self._submit(_analyze_frame, frame_bytes, None, self._hint(key))
+        future.track_key = key
+        return future
+
+    def result(self, future, timeout=None):
+        """
+        Wait up to `timeout` (default the engine's) for a submitted frame.
+        Async callers await the future first and pass timeout=0.
+        """
+        try:
+            result = future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self._failed += 1
+            raise
+        except BrokenProcessPool:
+            self._reset_executor()
+            with self._lock:
+                self._failed += 1
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+
+        self._track(getattr(future, 'track_key', None), result)
+        total_ms = round((time.time() - future.submitted_at) * 1000, 2)
+        result['timing']['total_ms'] = total_ms
+        with self._lock:
+            self._processed += 1
+            self._total_ms += total_ms
+            self._max_ms = max(self._max_ms, total_ms)
+        return result
+
+    def analyze(self, frame_bytes, key=None):
+        return self.result(self.submit(frame_bytes, key))
+
+    def analyze_batch(self, frames):
+        """
+        Analyze a {key: frame_bytes} mapping, tracking faces per key. Frames
+        are split into one chunk per worker so a batch costs a handful of IPC
+        round-trips rather than one per frame. Chunks that cannot be queued
+        come back as dropped.
+        """
+        items = [(key, frame_bytes, self._hint(key)) for key, frame_bytes in frames.items()]
+        if not items:
+            return {}
+        chunk_size = -(-len(items) // self.workers)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+        results = {}
+        pending = []
+        for chunk in chunks:
+            try:
+                pending.append((chunk, self._submit(_analyze_frames, chunk, dropped=len(chunk))))
+            except FrameDropped as e:
+                for key, _, _ in chunk:
+                    results[key] = {"error": str(e), "dropped": True}
+
+        deadline = time.time() + self.timeout
+        for chunk, future in pending:
+            try:
+                chunk_results = future.result(timeout=max(0.0, deadline - time.time()))
+            except FutureTimeout:
+                future.cancel()
+                chunk_results = {key: {"error": "Detection timed out"} for key, _, _ in chunk}
+            except BrokenProcessPool:
+                self._reset_executor()
+                chunk_results = {key: {"error": "Detection worker crashed"} for key, _, _ in chunk}
+
+            for key, result in chunk_results.items():
+                if 'error' not in result:
+                    self._track(key, result)
+
+            total_ms = round((time.time() - future.submitted_at) * 1000, 2)
+            with self._lock:
+                for result in chunk_results.values():
+                    if 'error' in result:
+                        self._failed += 1
+                        continue
+                    result['timing']['total_ms'] = total_ms
+                    self._processed += 1
+                    self._total_ms += total_ms
+                    self._max_ms = max(self._max_ms, total_ms)
+            results.update(chunk_results)
+        return results
+
+    def warm_up(self):
+        """
+        Start every worker process now so cascades are loaded before the
+        first frame arrives.
+        """
+        executor = self._get_executor()
+        futures = [executor.submit(_warm_worker, 0.05) for _ in range(self.workers)]
+        return len({future.result(timeout=30) for future in futures})
+
+    def shutdown(self):
+        self._reset_executor()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "preprocess": self.preprocess,
+                "pending": self.max_pending - self._slots._value,
+                "processed": self._processed,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "avg_ms": round(self._total_ms / self._processed, 2) if self._processed else 0.0,
+                "max_ms": self._max_ms,
+                "tracking": self.tracker.metrics() if self.tracker else None
+            }
@@ -0,0 +1,22 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# Class monitoring frames are not served here: run one `python monitor_ws.py`
+# next to gunicorn. The activity tracker keeps per-student state in memory,
+# so with more than one worker the app disables /analyze-stream and routes
+# every frame through that single process (HTTP_FRAME_INGEST in app.py).
+import os
+
+bind = '0.0.0.0:5000'
+# Set WEB_CONCURRENCY rather than passing -w, so the app sees the same count
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+raw_env = [f"WEB_CONCURRENCY={workers}"]
+threads = 8
+# Submission downloads (send_file) go out through os.sendfile
+sendfile = True
+
+
+def post_worker_init(worker):
+    # Open pooled connections, load the schedule and spawn detection workers
+    # (if this worker analyzes frames) before it starts accepting requests
+    from app import warm_up
+    warm_up()
@@ -0,0 +1,233 @@
+"""
+Versioned schema migrations for the smart_classroom database.
+
+    python migrate.py                 apply pending migrations
+    python migrate.py --status        list applied / pending migrations
+    python migrate.py --check-plans   EXPLAIN the hot queries; exits 1 if one
+                                      does a full table scan or misses its index
+
+Migrations are the numbered .sql files in migrations/, applied in order on
+top of smart_classroom.sql and recorded in schema_migrations.
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+
+import mysql.connector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# (description, table alias in the plan, index that should serve it, query, params)
+HOT_QUERIES = [
+    (
+        "/student/attendance history",
+        'a', 'idx_attendance_student_date',
+        """
+            SELECT a.date, a.status FROM attendance a
+            WHERE a.student_id = %s
+            ORDER BY a.date DESC
+        """,
+        (1,)
+    ),
+    (
+        "recovery-assignment absence streaks",
+        'ca', 'PRIMARY',
+        """
+            SELECT ca.subject_id, ca.current_streak FROM absence_streaks ca
+            WHERE ca.student_id = %s AND ca.current_streak >= %s
+            AND ca.last_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+        """,
+        (1, 3)
+    ),
+    (
+        "/teacher/at-risk-students",
+        'st', 'idx_streaks_subject_streak',
+        """
+            SELECT st.student_id, st.current_streak FROM absence_streaks st
+            JOIN subjects sub ON st.subject_id = sub.id
+            WHERE st.current_streak >= %s AND sub.teacher_id = %s
+        """,
+        (3, 1)
+    ),
+    (
+        "/teacher/monitoring-logs day range",
+        'cml', 'idx_monitoring_student_subject_ts',
+        """
+            SELECT cml.id, cml.status, cml.timestamp FROM class_monitoring_logs cml
+            WHERE cml.student_id = %s AND cml.subject_id = %s
+            AND cml.timestamp >= %s AND cml.timestamp < %s
+            ORDER BY cml.timestamp DESC
+        """,
+        (1, 1, '2025-01-01 00:00:00', '2025-01-02 00:00:00')
+    ),
+    (
+        "/teacher/monitoring-summary day timeline",
+        'r', 'PRIMARY',
+        """
+            SELECT r.bucket_start, r.active_count FROM monitoring_rollups r
+            WHERE r.student_id = %s AND r.subject_id = %s
+            AND r.bucket_start >= %s AND r.bucket_start < %s
+            ORDER BY r.bucket_start
+        """,
+        (1, 1, '2025-01-01 00:00:00', '2025-01-02 00:00:00')
+    ),
+    (
+        "/teacher/attendance-requests by date",
+        'ar', 'idx_requests_subject_date_time',
+        """
+            SELECT ar.id FROM attendance_requests ar
+            JOIN subjects sub ON ar.subject_id = sub.id
+            WHERE sub.teacher_id = %s AND ar.class_date = %s
+            ORDER BY ar.request_time DESC
+        """,
+        (1, '2025-01-01')
+    ),
+    (
+        "/current-class attendance request state",
+        'ar', 'idx_requests_student_subject_date',
+        """
+            SELECT ar.status FROM attendance_requests ar
+            WHERE ar.student_id = %s AND ar.subject_id = %s AND ar.class_date = CURDATE()
+        """,
+        (1, 1)
+    ),
+    (
+        "recent assignments per subject",
+        'asg', 'idx_assignments_subject_created',
+        """
+            SELECT asg.id FROM assignments asg
+            WHERE asg.subject_id = %s
+            AND asg.created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+        """,
+        (1,)
+    ),
+    (
+        "/student/marks",
+        'ia', 'idx_assessments_student_date',
+        """
+            SELECT ia.id FROM internal_assessments ia
+            WHERE ia.student_id = %s
+            ORDER BY ia.date DESC
+        """,
+        (1,)
+    ),
+]
+
+
+def get_connection():
+    from app import DB_CONFIG
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+def split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [stmt.strip() for stmt in re.split(r';\s*$', '\n'.join(lines), flags=re.M) if stmt.strip()]
+
+
+def available_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d+)_.*\.sql$', filename)
+        if match:
+            migrations.append((int(match.group(1)), filename))
+    return migrations
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(db):
+    cursor = db.cursor()
+    try:
+        applied = applied_versions(cursor)
+        pending = [(version, name) for version, name in available_migrations() if version not in applied]
+        for version, name in pending:
+            logger.info(f"Applying migration {name}")
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                statements = split_statements(f.read())
+            # MySQL DDL auto-commits, so a migration is recorded only once every
+            # statement has gone through
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            db.commit()
+        if not pending:
+            logger.info("Schema is up to date")
+        return [name for _, name in pending]
+    finally:
+        cursor.close()
+
+
+def status(db):
+    cursor = db.cursor()
+    try:
+        applied = applied_versions(cursor)
+    finally:
+        cursor.close()
+    for version, name in available_migrations():
+        print(f"{'applied' if version in applied else 'pending'}  {name}")
+
+
+def check_plans(db):
+    """
+    EXPLAIN every hot query. A query fails when its table is read with a full
+    scan or through any index other than the expected one. Run it against a
+    database with realistic row counts; on near-empty tables the optimizer
+    may pick a scan and fail the check.
+    """
+    failures = []
+    cursor = db.cursor(dictionary=True)
+    try:
+        for description, alias, index, query, params in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + query, params)
+            plan = [row for row in cursor.fetchall() if row['table'] == alias]
+            if not plan:
+                failures.append(f"{description}: table {alias} missing from plan")
+                continue
+            row = plan[0]
+            possible = (row['possible_keys'] or '').split(',')
+            if row['type'] == 'ALL':
+                reason = "usable but not chosen" if index in possible else "not usable"
+                failures.append(f"{description}: full scan of {alias}, {index} {reason}")
+            elif row['key'] != index:
+                failures.append(f"{description}: {alias} read via {row['key']}, expected {index}")
+            else:
+                logger.info(f"{description}: {row['type']} via {row['key']}")
+    finally:
+        cursor.close()
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument('--status', action='store_true', help="list applied and pending migrations")
+    parser.add_argument('--check-plans', action='store_true', help="fail if a hot query does a full scan")
+    args = parser.parse_args()
+
+    db = get_connection()
+    try:
+        if args.status:
+            status(db)
+        elif args.check_plans:
+            failures = check_plans(db)
+            for failure in failures:
+                logger.error(failure)
+            sys.exit(1 if failures else 0)
+        else:
+            migrate(db)
+    finally:
+        db.close()
@@ -0,0 +1,18 @@
+-- Outbound SMS queue, drained by the notification dispatcher
+CREATE TABLE IF NOT EXISTS notification_queue (
+   id BIGINT AUTO_INCREMENT PRIMARY KEY,
+   recipient VARCHAR(20) NOT NULL,
+   body TEXT NOT NULL,
+   dedup_key VARCHAR(191),
+   status ENUM('pending', 'sending', 'sent', 'failed') DEFAULT 'pending',
+   attempts INT DEFAULT 0,
+   next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+   locked_at DATETIME,
+   last_error VARCHAR(255),
+   provider_id VARCHAR(64),
+   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+   sent_at DATETIME,
+   UNIQUE KEY unique_dedup (dedup_key),
+   KEY idx_queue_pending (status, next_attempt_at),
+   KEY idx_queue_recipient_sent (recipient, sent_at)
+);
@@ -0,0 +1,31 @@
+-- Composite indexes matched to the WHERE / ORDER BY of the hot routes
+
+-- /student/attendance (student_id ORDER BY date) and the recovery-assignment
+-- absence scan (student_id, status = 0, date >= ...)
+CREATE INDEX idx_attendance_student_date ON attendance (student_id, date);
+CREATE INDEX idx_attendance_student_status_date ON attendance (student_id, status, date);
+
+-- /teacher/monitoring-logs (student_id, subject_id, timestamp range ORDER BY timestamp)
+CREATE INDEX idx_monitoring_student_subject_ts ON class_monitoring_logs (student_id, subject_id, timestamp);
+
+-- /teacher/attendance-requests (subject_id IN teacher's subjects, class_date ORDER BY request_time)
+-- and /current-class (student_id, subject_id, class_date)
+CREATE INDEX idx_requests_subject_date_time ON attendance_requests (subject_id, class_date, request_time);
+CREATE INDEX idx_requests_student_subject_date ON attendance_requests (student_id, subject_id, class_date);
+
+-- Schedule index load and the respond-attendance join
+CREATE INDEX idx_schedule_subject_day_start ON subject_schedule (subject_id, day_of_week, start_time);
+
+-- Class rosters: /teacher/students, /current-class
+CREATE INDEX idx_subjects_class ON subjects (class_id);
+CREATE INDEX idx_students_class ON students (class_id);
+
+-- Recovery assignments created in the last 7 days per subject
+CREATE INDEX idx_assignments_subject_created ON assignments (subject_id, created_at);
+
+-- /student/marks (student_id ORDER BY date) and per-subject averages
+CREATE INDEX idx_assessments_student_date ON internal_assessments (student_id, date);
+CREATE INDEX idx_assessments_student_subject ON internal_assessments (student_id, subject_id);
+
+-- Submission lookups by student
+CREATE INDEX idx_submissions_student ON assignment_submissions (student_id);
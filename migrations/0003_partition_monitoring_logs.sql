@@ -0,0 +1,20 @@
+-- Range-partition class_monitoring_logs by month so old months can be
+-- dropped in O(1) and day/week queries only touch the partitions they need.
+-- Partitioned InnoDB tables cannot have foreign keys, and the partitioning
+-- column must be part of every unique key.
+ALTER TABLE class_monitoring_logs
+    DROP FOREIGN KEY class_monitoring_logs_ibfk_1,
+    DROP FOREIGN KEY class_monitoring_logs_ibfk_2;
+
+ALTER TABLE class_monitoring_logs
+    MODIFY timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, timestamp);
+
+-- Monthly partitions are added ahead of time (and expired) by
+-- monitoring_logs.PartitionManager; p_future catches anything beyond them.
+ALTER TABLE class_monitoring_logs
+    PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+        PARTITION p_archive VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION p_future VALUES LESS THAN MAXVALUE
+    );
@@ -0,0 +1,30 @@
+-- Per-(student, subject, 5-minute bucket) status counts, maintained
+-- incrementally by monitoring_logs.MonitoringLogWriter as log batches are
+-- written. The bucket width must match ROLLUP_BUCKET_MINUTES.
+CREATE TABLE IF NOT EXISTS monitoring_rollups (
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    active_count INT NOT NULL DEFAULT 0,
+    inactive_count INT NOT NULL DEFAULT 0,
+    not_joined_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (student_id, subject_id, bucket_start)
+);
+
+-- Backfill from the logs already stored
+INSERT INTO monitoring_rollups
+    (student_id, subject_id, bucket_start, active_count, inactive_count, not_joined_count)
+SELECT
+    student_id,
+    subject_id,
+    FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP(timestamp) / 300) * 300) as bucket,
+    SUM(status = 'active'),
+    SUM(status = 'inactive'),
+    SUM(status = 'not_joined')
+FROM class_monitoring_logs
+GROUP BY student_id, subject_id, bucket
+ON DUPLICATE KEY UPDATE
+    active_count = VALUES(active_count),
+    inactive_count = VALUES(inactive_count),
+    not_joined_count = VALUES(not_joined_count);
@@ -0,0 +1,37 @@
+-- Consecutive absent sessions per (student, subject), maintained by
+-- absence_streaks.AbsenceStreakTracker as attendance rows are written
+CREATE TABLE IF NOT EXISTS absence_streaks (
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    current_streak INT NOT NULL DEFAULT 0,
+    last_date DATE NOT NULL,
+    last_status BOOLEAN NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (student_id, subject_id),
+    KEY idx_streaks_subject_streak (subject_id, current_streak),
+    KEY idx_streaks_streak (current_streak),
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+);
+
+-- Backfill: absent sessions after each pair's most recent present one
+INSERT INTO absence_streaks
+    (student_id, subject_id, current_streak, last_date, last_status)
+SELECT
+    a.student_id,
+    a.subject_id,
+    SUM(a.status = 0 AND a.date > COALESCE(p.last_present, '1000-01-01')),
+    MAX(a.date),
+    COALESCE(MAX(a.date) = MAX(p.last_present), 0)
+FROM attendance a
+LEFT JOIN (
+    SELECT student_id, subject_id, MAX(date) as last_present
+    FROM attendance
+    WHERE status = 1
+    GROUP BY student_id, subject_id
+) p ON p.student_id = a.student_id AND p.subject_id = a.subject_id
+GROUP BY a.student_id, a.subject_id
+ON DUPLICATE KEY UPDATE
+    current_streak = VALUES(current_streak),
+    last_date = VALUES(last_date),
+    last_status = VALUES(last_status);
@@ -0,0 +1,14 @@
+-- Per-(student, subject) present / total session counts next to the absence
+-- streak, so attendance summaries need no scan of attendance
+ALTER TABLE absence_streaks
+    ADD COLUMN present_count INT NOT NULL DEFAULT 0 AFTER current_streak,
+    ADD COLUMN total_count INT NOT NULL DEFAULT 0 AFTER present_count;
+
+UPDATE absence_streaks st
+JOIN (
+    SELECT student_id, subject_id, SUM(status = 1) as present_count, COUNT(*) as total_count
+    FROM attendance
+    GROUP BY student_id, subject_id
+) a ON a.student_id = st.student_id AND a.subject_id = st.subject_id
+SET st.present_count = a.present_count,
+    st.total_count = a.total_count;
@@ -0,0 +1,74 @@
+-- Rolling per-(student, subject) sum of assessment percentages, kept in step
+-- with internal_assessments by triggers (marks are loaded directly into the
+-- table, not through the API). percentage_count mirrors AVG(): rows whose
+-- percentage is NULL count in row_count only.
+-- With binary logging enabled, creating the triggers needs SUPER or
+-- log_bin_trust_function_creators = 1.
+CREATE TABLE IF NOT EXISTS assessment_aggregates (
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    percentage_sum DECIMAL(16,6) NOT NULL DEFAULT 0,
+    percentage_count INT NOT NULL DEFAULT 0,
+    row_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (student_id, subject_id)
+);
+
+INSERT INTO assessment_aggregates
+    (student_id, subject_id, percentage_sum, percentage_count, row_count)
+SELECT
+    student_id,
+    subject_id,
+    COALESCE(SUM(marks_obtained / NULLIF(total_marks, 0) * 100), 0),
+    COUNT(marks_obtained / NULLIF(total_marks, 0) * 100),
+    COUNT(*)
+FROM internal_assessments
+GROUP BY student_id, subject_id
+ON DUPLICATE KEY UPDATE
+    percentage_sum = VALUES(percentage_sum),
+    percentage_count = VALUES(percentage_count),
+    row_count = VALUES(row_count);
+
+CREATE TRIGGER trg_assessments_insert AFTER INSERT ON internal_assessments
+FOR EACH ROW
+    INSERT INTO assessment_aggregates
+        (student_id, subject_id, percentage_sum, percentage_count, row_count)
+    VALUES (
+        NEW.student_id, NEW.subject_id,
+        COALESCE(NEW.marks_obtained / NEW.total_marks * 100, 0),
+        (NEW.marks_obtained / NEW.total_marks) IS NOT NULL,
+        1
+    )
+    ON DUPLICATE KEY UPDATE
+        percentage_sum = percentage_sum + VALUES(percentage_sum),
+        percentage_count = percentage_count + VALUES(percentage_count),
+        row_count = row_count + VALUES(row_count);
+
+-- Remove the old row's contribution and add the new one; both rows target
+-- the same key unless the student or subject changed
+CREATE TRIGGER trg_assessments_update AFTER UPDATE ON internal_assessments
+FOR EACH ROW
+    INSERT INTO assessment_aggregates
+        (student_id, subject_id, percentage_sum, percentage_count, row_count)
+    VALUES (
+        OLD.student_id, OLD.subject_id,
+        -COALESCE(OLD.marks_obtained / OLD.total_marks * 100, 0),
+        -((OLD.marks_obtained / OLD.total_marks) IS NOT NULL),
+        -1
+    ), (
+        NEW.student_id, NEW.subject_id,
+        COALESCE(NEW.marks_obtained / NEW.total_marks * 100, 0),
+        (NEW.marks_obtained / NEW.total_marks) IS NOT NULL,
+        1
+    )
+    ON DUPLICATE KEY UPDATE
+        percentage_sum = percentage_sum + VALUES(percentage_sum),
+        percentage_count = percentage_count + VALUES(percentage_count),
+        row_count = row_count + VALUES(row_count);
+
+CREATE TRIGGER trg_assessments_delete AFTER DELETE ON internal_assessments
+FOR EACH ROW
+    UPDATE assessment_aggregates
+    SET percentage_sum = percentage_sum - COALESCE(OLD.marks_obtained / OLD.total_marks * 100, 0),
+        percentage_count = percentage_count - ((OLD.marks_obtained / OLD.total_marks) IS NOT NULL),
+        row_count = row_count - 1
+    WHERE student_id = OLD.student_id AND subject_id = OLD.subject_id;
@@ -0,0 +1,5 @@
+-- SHA-256 and size of each submitted file, computed while the upload
+-- streams to disk
+ALTER TABLE assignment_submissions
+    ADD COLUMN content_hash CHAR(64) NULL AFTER file_path,
+    ADD COLUMN file_size BIGINT NULL AFTER content_hash;
@@ -0,0 +1,24 @@
+-- Content-addressed submission files (see blob_store.py): one row per
+-- stored file with the number of submissions pointing at it.
+-- BlobStore.add_ref counts references up as submissions are written; the
+-- trigger counts them down on delete. FK cascades skip triggers, so
+-- BlobStore.collect reconciles the counts before removing anything.
+CREATE TABLE IF NOT EXISTS blobs (
+    content_hash CHAR(64) NOT NULL,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (content_hash),
+    KEY idx_blobs_refs (ref_count, updated_at)
+);
+
+-- The original filename, for downloads of blob-backed submissions
+ALTER TABLE assignment_submissions
+    ADD COLUMN file_name VARCHAR(255) NULL AFTER file_path,
+    ADD KEY idx_submissions_content_hash (content_hash);
+
+CREATE TRIGGER trg_submissions_blob_delete AFTER DELETE ON assignment_submissions
+FOR EACH ROW
+    UPDATE blobs SET ref_count = ref_count - 1
+    WHERE content_hash = OLD.content_hash;
@@ -0,0 +1,10 @@
+-- Tag versions shared by every server process (see
+-- response_cache.DatabaseVersions). Bumping a tag here invalidates what
+-- each gunicorn worker and the monitoring WebSocket server cached under it,
+-- not only the caches of the process that handled the write.
+CREATE TABLE IF NOT EXISTS cache_versions (
+    tag VARCHAR(191) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (tag)
+);
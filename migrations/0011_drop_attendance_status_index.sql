@@ -0,0 +1,5 @@
+-- The recovery-assignment absence scan reads absence_streaks since
+-- migrations/0005, so nothing filters attendance by (student_id, status, date)
+-- any more. Drop the index rather than maintain it on every attendance write;
+-- idx_attendance_student_date still serves the per-student history.
+DROP INDEX idx_attendance_student_status_date ON attendance;
@@ -0,0 +1,52 @@
+-- Recreate the assessment_aggregates triggers from migrations/0007 with the
+-- per-row percentage guarded by NULLIF(total_marks, 0). Under strict SQL
+-- mode with ERROR_FOR_DIVISION_BY_ZERO, a row with total_marks = 0 made the
+-- trigger, and with it the INSERT / UPDATE / DELETE on internal_assessments,
+-- fail. Such a row now counts like a NULL percentage (row_count only), as it
+-- does in AVG(). Reads divide by NULLIF(percentage_count, 0) already.
+DROP TRIGGER IF EXISTS trg_assessments_insert;
+DROP TRIGGER IF EXISTS trg_assessments_update;
+DROP TRIGGER IF EXISTS trg_assessments_delete;
+
+CREATE TRIGGER trg_assessments_insert AFTER INSERT ON internal_assessments
+FOR EACH ROW
+    INSERT INTO assessment_aggregates
+        (student_id, subject_id, percentage_sum, percentage_count, row_count)
+    VALUES (
+        NEW.student_id, NEW.subject_id,
+        COALESCE(NEW.marks_obtained / NULLIF(NEW.total_marks, 0) * 100, 0),
+        (NEW.marks_obtained / NULLIF(NEW.total_marks, 0)) IS NOT NULL,
+        1
+    )
+    ON DUPLICATE KEY UPDATE
+        percentage_sum = percentage_sum + VALUES(percentage_sum),
+        percentage_count = percentage_count + VALUES(percentage_count),
+        row_count = row_count + VALUES(row_count);
+
+CREATE TRIGGER trg_assessments_update AFTER UPDATE ON internal_assessments
+FOR EACH ROW
+    INSERT INTO assessment_aggregates
+        (student_id, subject_id, percentage_sum, percentage_count, row_count)
+    VALUES (
+        OLD.student_id, OLD.subject_id,
+        -COALESCE(OLD.marks_obtained / NULLIF(OLD.total_marks, 0) * 100, 0),
+        -((OLD.marks_obtained / NULLIF(OLD.total_marks, 0)) IS NOT NULL),
+        -1
+    ), (
+        NEW.student_id, NEW.subject_id,
+        COALESCE(NEW.marks_obtained / NULLIF(NEW.total_marks, 0) * 100, 0),
+        (NEW.marks_obtained / NULLIF(NEW.total_marks, 0)) IS NOT NULL,
+        1
+    )
+    ON DUPLICATE KEY UPDATE
+        percentage_sum = percentage_sum + VALUES(percentage_sum),
+        percentage_count = percentage_count + VALUES(percentage_count),
+        row_count = row_count + VALUES(row_count);
+
+CREATE TRIGGER trg_assessments_delete AFTER DELETE ON internal_assessments
+FOR EACH ROW
+    UPDATE assessment_aggregates
+    SET percentage_sum = percentage_sum - COALESCE(OLD.marks_obtained / NULLIF(OLD.total_marks, 0) * 100, 0),
+        percentage_count = percentage_count - ((OLD.marks_obtained / NULLIF(OLD.total_marks, 0)) IS NOT NULL),
+        row_count = row_count - 1
+    WHERE student_id = OLD.student_id AND subject_id = OLD.subject_id;
@@ -0,0 +1,260 @@
+"""
+WebSocket ingest for class monitoring.
+
+    python monitor_ws.py [--host 0.0.0.0] [--port 5001]
+
+A student session connects to ws://host:5001/monitor?student_id=12 and sends
+every captured JPEG frame as a binary message. Each frame is answered with
+one JSON text message:
+
+    {"type": "verdict", "expression": "active" | "inactive", "inactivity_count": n,
+     "subject_id": ..., "timing": {...}}
+
+or {"type": "dropped"} when detection is saturated, or {"type": "error"} when
+the frame cannot be analyzed. Reaching the inactivity threshold adds an
+{"type": "alert", "message": ...} message once the mentor SMS is queued. A
+{"type": "class", "data": {...} | null} message is sent on connect and
+whenever the ongoing class changes.
+
+Activity is recorded server-side, and class_monitoring_logs are written
+through the activity tracker's log writer. The client does not call
+/current-class, /analyze-stream or /store-monitoring-log. The server runs
+next to the Flask app and shares its detection pool, trackers and schedule
+index. An idle connection costs one coroutine; GET /metrics reports
+connection and frame counts.
+
+Run exactly one instance: the activity tracker's streaks and alert cooldowns
+live in this process, which is why gunicorn workers refuse /analyze-stream
+(see HTTP_FRAME_INGEST in app.py).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+from app import (
+    app as flask_app,
+    activity_tracker,
+    connection_pool,
+    detection_engine,
+    schedule_index,
+    send_inactivity_alert,
+    warm_up
+)
+from detection import FrameDropped
+
+logger = logging.getLogger(__name__)
+
+WS_CONFIG = {
+    'host': '0.0.0.0',
+    'port': 5001,
+    # Frames are ~640px JPEGs; anything far bigger is not a camera frame
+    'max_frame_bytes': 2 * 1024 * 1024,
+    # Frames buffered per connection before reads stop and TCP pushes back
+    'max_queue': 4
+}
+
+CLASS_FIELDS = ('subject_id', 'subject_name', 'subject_code', 'teacher_id', 'teacher_name',
+                'formatted_start_time', 'formatted_end_time')
+
+stats = {
+    "connections": 0,
+    "sessions": 0,
+    "frames": 0,
+    "dropped": 0,
+    "errors": 0,
+    "alerts": 0
+}
+
+
+def _student_id(path):
+    student_id = parse_qs(urlsplit(path).query).get('student_id', [''])[0]
+    return int(student_id) if student_id.isdigit() else None
+
+
+def _student_class(student_id):
+    with connection_pool.acquire() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            return schedule_index.student_class(cursor, student_id)
+        finally:
+            cursor.close()
+
+
+def _send_alert(student_id, subject_id):
+    """
+    Queue the mentor SMS as /analyze-stream does. Returns the message, or
+    None if none was sent.
+    """
+    try:
+        with flask_app.app_context():
+            return send_inactivity_alert(student_id, subject_id)
+    except LookupError as e:
+        logger.error(f"Inactivity alert failed for student {student_id}: {e}")
+    except Exception as e:
+        logger.error(f"Inactivity alert failed for student {student_id}: {e}")
+        activity_tracker.alert_failed(student_id, subject_id)
+    return None
+
+
+def class_message(class_info):
+    data = {field: class_info[field] for field in CLASS_FIELDS} if class_info else None
+    return json.dumps({"type": "class", "data": data}, default=str)
+
+
+def process_request(connection, request):
+    if request.path == '/metrics':
+        return connection.respond(HTTPStatus.OK, json.dumps({
+            "status": "success",
+            "data": dict(stats, detection=detection_engine.metrics())
+        }) + "\n")
+    if urlsplit(request.path).path != '/monitor':
+        return connection.respond(HTTPStatus.NOT_FOUND, "Not found\n")
+    if _student_id(request.path) is None:
+        return connection.respond(HTTPStatus.BAD_REQUEST, "student_id is required\n")
+    return None
+
+
+async def analyze(student_id, subject_id, frame):
+    """
+    Detect, record and (if due) alert for one frame. Returns the messages to
+    send back.
+    """
+    try:
+        future = detection_engine.submit(frame, key=student_id)
+    except FrameDropped:
+        stats['dropped'] += 1
+        return [{"type": "dropped"}]
+    except Exception as e:
+        logger.error(f"Could not submit frame for student {student_id}: {e}")
+        stats['errors'] += 1
+        return [{"type": "error", "message": "Detection unavailable"}]
+
+    # Wait on the event loop, then collect without blocking it
+    await asyncio.wait([asyncio.wrap_future(future)], timeout=detection_engine.timeout)
+    try:
+        detection = detection_engine.result(future, timeout=0)
+    except FutureTimeout:
+        stats['errors'] += 1
+        return [{"type": "error", "message": "Detection timed out"}]
+    except ValueError as e:
+        stats['errors'] += 1
+        return [{"type": "error", "message": str(e)}]
+    except Exception as e:
+        # e.g. BrokenProcessPool; the session stays open for the next frame
+        logger.error(f"Detection failed for student {student_id}: {e}")
+        stats['errors'] += 1
+        return [{"type": "error", "message": "Detection failed"}]
+
+    stats['frames'] += 1
+    is_active = detection['is_active']
+    try:
+        # The tracker takes thread locks and may flush logs; keep it off the loop
+        verdict = await asyncio.to_thread(activity_tracker.record, student_id, subject_id, is_active)
+    except Exception as e:
+        logger.error(f"Could not record activity for student {student_id}: {e}")
+        stats['errors'] += 1
+        return [{"type": "error", "message": "Activity could not be recorded"}]
+    messages = [{
+        "type": "verdict",
+        "expression": "active" if is_active else "inactive",
+        "inactivity_count": verdict['inactivity_count'],
+        "subject_id": subject_id,
+        "timing": detection['timing']
+    }]
+
+    if verdict['alert']:
+        sent_message = await asyncio.to_thread(_send_alert, student_id, subject_id)
+        if sent_message:
+            stats['alerts'] += 1
+            messages.append({"type": "alert", "message": sent_message})
+    return messages
+
+
+async def current_class(class_id, previous=None):
+    """
+    Ongoing class for `class_id`, resolved in a thread because the schedule
+    index reloads from the database when its TTL runs out. Keeps `previous`
+    if the reload fails.
+    """
+    try:
+        return await asyncio.to_thread(schedule_index.current_class, class_id)
+    except Exception as e:
+        logger.error(f"Could not resolve current class for class {class_id}: {e}")
+        return previous
+
+
+async def monitor(connection):
+    student_id = _student_id(connection.request.path)
+    try:
+        class_id = await asyncio.to_thread(_student_class, student_id)
+    except Exception as e:
+        logger.error(f"Could not load class for student {student_id}: {e}")
+        await connection.close(1011, "Database unavailable")
+        return
+    if class_id is None:
+        await connection.close(1008, "Unknown student")
+        return
+
+    stats['connections'] += 1
+    stats['sessions'] += 1
+    started = time.monotonic()
+    current = await current_class(class_id)
+    try:
+        await connection.send(class_message(current))
+        async for frame in connection:
+            if isinstance(frame, str):
+                # Only binary frames carry data; text is ignored
+                continue
+
+            class_info = await current_class(class_id, current)
+            if class_info != current:
+                current = class_info
+                await connection.send(class_message(current))
+
+            subject_id = current['subject_id'] if current else None
+            for message in await analyze(student_id, subject_id, frame):
+                await connection.send(json.dumps(message, default=str))
+    except ConnectionClosed:
+        pass
+    except Exception as e:
+        logger.error(f"Monitoring session for student {student_id} failed: {e}")
+    finally:
+        stats['connections'] -= 1
+        logger.info(f"Monitoring session for student {student_id} closed after "
+                    f"{round(time.monotonic() - started)}s")
+
+
+async def run(host, port):
+    async with serve(
+        monitor, host, port,
+        process_request=process_request,
+        max_size=WS_CONFIG['max_frame_bytes'],
+        max_queue=WS_CONFIG['max_queue'],
+        # JPEG does not deflate; compression would only cost CPU and memory
+        compression=None
+    ) as server:
+        logger.info(f"Monitoring WebSocket server listening on ws://{host}:{port}/monitor")
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the class monitoring WebSocket")
+    parser.add_argument('--host', default=WS_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=WS_CONFIG['port'])
+    args = parser.parse_args()
+
+    warm_up(detection=True)
+    try:
+        asyncio.run(run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        detection_engine.shutdown()
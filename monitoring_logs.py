@@ -0,0 +1,389 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import date, datetime
+
+from mysql.connector import errors
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('active', 'inactive', 'not_joined')
+
+# Errors that say the connection, not the rows, is the problem
+DISCONNECTED = (errors.InterfaceError, errors.OperationalError)
+
+# Width of a monitoring_rollups bucket; must divide 60 and match the
+# backfill in migrations/0004
+ROLLUP_BUCKET_MINUTES = 5
+
+
+def _month_start(day, offset=0):
+    month = day.month - 1 + offset
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def bucket_start(timestamp):
+    return timestamp.replace(minute=timestamp.minute - timestamp.minute % ROLLUP_BUCKET_MINUTES,
+                             second=0, microsecond=0)
+
+
+def rollup(rows):
+    """
+    Reduce log rows to sorted monitoring_rollups upsert rows:
+    (student_id, subject_id, bucket_start, active, inactive, not_joined).
+    """
+    counts = {}
+    for student_id, subject_id, status, timestamp in rows:
+        key = (student_id, subject_id, bucket_start(timestamp))
+        bucket = counts.setdefault(key, [0, 0, 0])
+        bucket[STATUSES.index(status)] += 1
+    # Sorted so concurrent writers lock rollup rows in the same order
+    return [key + tuple(bucket) for key, bucket in sorted(counts.items())]
+
+
+def encode_cursor(timestamp, log_id):
+    return f"{timestamp:%Y%m%d%H%M%S}-{log_id}"
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of `encode_cursor`; raises ValueError on a malformed cursor.
+    """
+    timestamp, _, log_id = cursor.partition('-')
+    return datetime.strptime(timestamp, '%Y%m%d%H%M%S'), int(log_id)
+
+
+class MonitoringLogWriter:
+    """
+    Append-only buffer in front of class_monitoring_logs. Rows are written by
+    a background flusher as multi-row INSERTs of up to `batch_size` rows,
+    every `flush_interval` seconds or as soon as `batch_size` rows are
+    waiting. Each batch also bumps its monitoring_rollups buckets in the
+    same transaction, so the rollups never drift from the logs. At most `max_buffer` rows are kept; when the database is
+    unavailable the oldest rows are dropped first.
+
+    A batch the database rejects is retried on later flushes; after
+    `max_retries` failures it is written row by row and rows that still fail
+    are logged and dropped, so one bad row cannot hold up the rest.
+    """
+
+    def __init__(self, pool, batch_size=500, flush_interval=5, max_buffer=50000, max_retries=3):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._written = 0
+        self._batches = 0
+        self._dropped = 0
+        self._failures = 0
+        self._rejected = 0
+        # Failed attempts at the batch at the head of the buffer
+        self._attempts = 0
+
+    def append(self, student_id, subject_id, status, timestamp=None):
+        if status not in STATUSES:
+            raise ValueError(f"Invalid monitoring status: {status}")
+        self.extend([(int(student_id), int(subject_id), status, timestamp or datetime.now())])
+
+    def extend(self, rows):
+        if not rows:
+            return
+        self._ensure_thread()
+        with self._lock:
+            self._buffer.extend(rows)
+            self._trim()
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _trim(self):
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self._dropped += overflow
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='monitoring-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def _insert(self, cursor, batch):
+        # mysql-connector turns executemany on a plain INSERT ... VALUES
+        # into one multi-row statement
+        cursor.executemany("""
+            INSERT INTO class_monitoring_logs
+            (student_id, subject_id, status, timestamp)
+            VALUES (%s, %s, %s, %s)
+        """, batch)
+        cursor.executemany("""
+            INSERT INTO monitoring_rollups
+            (student_id, subject_id, bucket_start,
+             active_count, inactive_count, not_joined_count)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                active_count = active_count + VALUES(active_count),
+                inactive_count = inactive_count + VALUES(inactive_count),
+                not_joined_count = not_joined_count + VALUES(not_joined_count)
+        """, rollup(batch))
+
+    def flush(self):
+        """
+        Write everything buffered so far. Returns the number of rows written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+
+            # Rows consumed from `rows`, written or rejected
+            done = 0
+            written = 0
+            try:
+                with self.pool.acquire() as db:
+                    cursor = db.cursor()
+                    try:
+                        for i in range(0, len(rows), self.batch_size):
+                            batch = rows[i:i + self.batch_size]
+                            try:
+                                self._insert(cursor, batch)
+                                db.commit()
+                                failure = None
+                            except DISCONNECTED:
+                                raise
+                            except Exception as e:
+                                db.rollback()
+                                self._attempts += 1
+                                if self._attempts < self.max_retries:
+                                    raise
+                                failure = e
+
+                            if failure is None:
+                                done += len(batch)
+                                written += len(batch)
+                                with self._lock:
+                                    self._written += len(batch)
+                                    self._batches += 1
+                            else:
+                                logger.warning(f"Monitoring log batch failed {self._attempts} times, "
+                                               f"writing its {len(batch)} rows one by one: {failure}")
+                                for row in batch:
+                                    try:
+                                        self._insert(cursor, [row])
+                                        db.commit()
+                                    except DISCONNECTED:
+                                        raise
+                                    except Exception as e:
+                                        db.rollback()
+                                        logger.error(f"Dropping monitoring log row {row}: {e}")
+                                        with self._lock:
+                                            self._rejected += 1
+                                    else:
+                                        written += 1
+                                        with self._lock:
+                                            self._written += 1
+                                    done += 1
+                            self._attempts = 0
+                    finally:
+                        cursor.close()
+            except Exception as e:
+                logger.error(f"Monitoring log flush failed, re-queueing {len(rows) - done} rows: {e}")
+                with self._lock:
+                    self._failures += 1
+                    self._buffer[:0] = rows[done:]
+                    self._trim()
+            return written
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "buffered": len(self._buffer),
+                "written": self._written,
+                "batches": self._batches,
+                "dropped": self._dropped,
+                "failures": self._failures,
+                "rejected": self._rejected
+            }
+
+
+class PartitionManager:
+    """
+    Keeps the monthly RANGE partitions of class_monitoring_logs (see
+    migrations/0003) rolling: partitions for the next `months_ahead` months
+    are split off p_future ahead of time, and partitions (p_archive included)
+    whose range ends before `retention_months` ago are dropped, which
+    discards a month of logs without a DELETE scan. Runs every `interval`
+    seconds once started.
+
+    Rows that landed in p_future before their month had a partition get one
+    per month too, starting from the oldest of them, rather than all being
+    folded into the first partition split off.
+
+    Every server process runs this; a MySQL named lock lets one of them do
+    the work per round and the others skip it.
+    """
+
+    TABLE = 'class_monitoring_logs'
+    LOCK_NAME = 'partition_maintenance'
+
+    def __init__(self, pool, months_ahead=2, retention_months=6, interval=6 * 3600):
+        self.pool = pool
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_run = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='monitoring-partitions', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.error(f"Monitoring partition maintenance failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def _partitions(self, cursor, cutoff):
+        """
+        [(name, expired)] in range order; a partition is expired when its
+        upper bound is at or before `cutoff`.
+        """
+        cursor.execute("""
+            SELECT partition_name,
+                   partition_name <> 'p_future'
+                   AND CAST(partition_description AS SIGNED) <= UNIX_TIMESTAMP(%s)
+            FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND table_name = %s
+            AND partition_name IS NOT NULL
+            ORDER BY partition_ordinal_position
+        """, (f"{cutoff:%Y-%m-%d} 00:00:00", self.TABLE))
+        return [(row[0], bool(row[1])) for row in cursor.fetchall()]
+
+    def _first_month(self, cursor, existing, today):
+        """
+        Month of the first partition to split off p_future: the month after
+        the newest monthly partition, or the oldest row still in p_future if
+        that is earlier than the current month.
+        """
+        cursor.execute(f"SELECT MIN(timestamp) FROM {self.TABLE} PARTITION (p_future)")
+        oldest = cursor.fetchone()[0]
+        first = _month_start(oldest.date() if oldest else today)
+        first = min(first, _month_start(today))
+        monthly = [name for name in existing if name.startswith('p2')]
+        if monthly:
+            last = datetime.strptime(monthly[-1], 'p%Y%m').date()
+            first = max(first, _month_start(last, 1))
+        return first
+
+    def maintain(self, today=None):
+        """
+        Create upcoming partitions and drop expired ones. Returns
+        {"created": [...], "dropped": [...]}; a no-op when the table is not
+        partitioned or another process holds the maintenance lock.
+        """
+        today = today or date.today()
+        cutoff = _month_start(today, -self.retention_months)
+        created, dropped = [], []
+        with self.pool.acquire() as db:
+            cursor = db.cursor()
+            try:
+                cursor.execute("SELECT GET_LOCK(%s, 0)", (self.LOCK_NAME,))
+                if (cursor.fetchone() or (0,))[0] != 1:
+                    logger.debug("Monitoring partition maintenance is running elsewhere, skipped")
+                    return {"created": created, "dropped": dropped}
+                try:
+                    self._maintain(cursor, today, cutoff, created, dropped)
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (self.LOCK_NAME,))
+                    cursor.fetchall()
+            finally:
+                cursor.close()
+
+        self._last_run = time.time()
+        if created or dropped:
+            logger.info(f"Monitoring partitions created={created} dropped={dropped}")
+        return {"created": created, "dropped": dropped}
+
+    def _maintain(self, cursor, today, cutoff, created, dropped):
+        partitions = self._partitions(cursor, cutoff)
+        existing = [name for name, _ in partitions]
+        if 'p_future' not in existing:
+            logger.warning(f"{self.TABLE} is not partitioned; run migrate.py")
+            return
+
+        # Split in ascending order, each off the front of p_future
+        month = self._first_month(cursor, existing, today)
+        last = _month_start(today, self.months_ahead)
+        while month <= last:
+            name = partition_name(month)
+            upper = _month_start(month, 1)
+            if name not in existing:
+                cursor.execute(f"""
+                    ALTER TABLE {self.TABLE} REORGANIZE PARTITION p_future INTO (
+                        PARTITION {name} VALUES LESS THAN (UNIX_TIMESTAMP('{upper:%Y-%m-%d} 00:00:00')),
+                        PARTITION p_future VALUES LESS THAN MAXVALUE
+                    )
+                """)
+                created.append(name)
+                # Backfilled months may already be past retention
+                if upper <= cutoff:
+                    partitions.append((name, True))
+            month = upper
+
+        expired = [name for name, is_expired in partitions if is_expired]
+        if expired:
+            cursor.execute(f"ALTER TABLE {self.TABLE} DROP PARTITION {', '.join(expired)}")
+            dropped.extend(expired)
+
+    def metrics(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "last_run": self._last_run,
+            "months_ahead": self.months_ahead,
+            "retention_months": self.retention_months
+        }
@@ -0,0 +1,253 @@
+import atexit
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_phone(phone):
+    phone = phone.strip()
+    if not phone.startswith('+'):
+        phone = '+' + phone
+    return phone
+
+
+def enqueue(cursor, recipient, body, dedup_key=None):
+    """
+    Queue an SMS using the caller's cursor, so the message is committed (or
+    rolled back) together with the caller's transaction. Messages sharing a
+    `dedup_key` are only queued once. Returns True if a row was queued.
+    """
+    if not recipient:
+        return False
+    cursor.execute("""
+        INSERT IGNORE INTO notification_queue
+        (recipient, body, dedup_key)
+        VALUES (%s, %s, %s)
+    """, (normalize_phone(recipient), body, dedup_key))
+    return cursor.rowcount == 1
+
+
+class TwilioTransport:
+    def __init__(self, client, from_number):
+        self.client = client
+        self.from_number = from_number
+
+    def send(self, to, body):
+        message = self.client.messages.create(
+            body=body,
+            from_=self.from_number,
+            to=to
+        )
+        return message.sid
+
+
+class FakeTransport:
+    """
+    Stand-in transport that records messages instead of sending them. Used
+    when no Twilio credentials are configured and in tests.
+    """
+
+    def __init__(self, fail_times=0):
+        self.sent = []
+        self.fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise RuntimeError("Simulated transport failure")
+            self.sent.append({"to": to, "body": body})
+            logger.info(f"[fake sms] to={to}: {body}")
+            return f"fake-{len(self.sent)}"
+
+
+class NotificationDispatcher:
+    """
+    Background worker that drains notification_queue through `transport`.
+
+    Failed sends are retried with exponential backoff (plus jitter) up to
+    `max_attempts`. Each recipient gets at most `rate_limit` messages per
+    `rate_window` seconds; messages over the limit are pushed back rather
+    than counted as failures.
+    """
+
+    def __init__(self, pool, transport, batch_size=20, poll_interval=5,
+                 max_attempts=5, backoff_base=30, backoff_max=3600,
+                 rate_limit=5, rate_window=3600, lease_timeout=300):
+        self.pool = pool
+        self.transport = transport
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.lease_timeout = lease_timeout
+
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._sent = 0
+        self._retried = 0
+        self._failed = 0
+        self._throttled = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='notification-dispatcher', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while self.dispatch_once() and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                logger.error(f"Notification dispatch error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _claim(self, cursor):
+        # Release leases left behind by a dispatcher that died mid-send
+        cursor.execute("""
+            UPDATE notification_queue
+            SET status = 'pending', locked_at = NULL
+            WHERE status = 'sending'
+            AND locked_at < NOW() - INTERVAL %s SECOND
+        """, (self.lease_timeout,))
+
+        cursor.execute("""
+            SELECT id, recipient, body, attempts
+            FROM notification_queue
+            WHERE status = 'pending'
+            AND next_attempt_at <= NOW()
+            ORDER BY next_attempt_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (self.batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            return rows
+
+        ids = [row['id'] for row in rows]
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"""
+            UPDATE notification_queue
+            SET status = 'sending', locked_at = NOW()
+            WHERE id IN ({placeholders})
+        """, ids)
+
+        recipients = sorted({row['recipient'] for row in rows})
+        placeholders = ', '.join(['%s'] * len(recipients))
+        cursor.execute(f"""
+            SELECT recipient, COUNT(*) as sent_count
+            FROM notification_queue
+            WHERE recipient IN ({placeholders})
+            AND status = 'sent'
+            AND sent_at >= NOW() - INTERVAL %s SECOND
+            GROUP BY recipient
+        """, recipients + [self.rate_window])
+        sent_counts = {row['recipient']: row['sent_count'] for row in cursor.fetchall()}
+        for row in rows:
+            row['sent_count'] = sent_counts.get(row['recipient'], 0)
+        return rows
+
+    def dispatch_once(self):
+        """
+        Claim and send one batch. Returns the number of rows claimed.
+        """
+        with self.pool.acquire() as db:
+            cursor = db.cursor(dictionary=True)
+            try:
+                rows = self._claim(cursor)
+                db.commit()
+                if not rows:
+                    return 0
+
+                sent_now = {}
+                for row in rows:
+                    recipient = row['recipient']
+                    if row['sent_count'] + sent_now.get(recipient, 0) >= self.rate_limit:
+                        cursor.execute("""
+                            UPDATE notification_queue
+                            SET status = 'pending', locked_at = NULL,
+                                next_attempt_at = NOW() + INTERVAL %s SECOND
+                            WHERE id = %s
+                        """, (self.rate_window // self.rate_limit, row['id']))
+                        db.commit()
+                        with self._lock:
+                            self._throttled += 1
+                        continue
+
+                    try:
+                        provider_id = self.transport.send(recipient, row['body'])
+                    except Exception as e:
+                        attempts = row['attempts'] + 1
+                        if attempts >= self.max_attempts:
+                            logger.error(f"Giving up on notification {row['id']} to {recipient}: {e}")
+                            cursor.execute("""
+                                UPDATE notification_queue
+                                SET status = 'failed', attempts = %s, last_error = %s, locked_at = NULL
+                                WHERE id = %s
+                            """, (attempts, str(e)[:255], row['id']))
+                            with self._lock:
+                                self._failed += 1
+                        else:
+                            logger.warning(f"Notification {row['id']} to {recipient} failed, retrying: {e}")
+                            cursor.execute("""
+                                UPDATE notification_queue
+                                SET status = 'pending', attempts = %s, last_error = %s, locked_at = NULL,
+                                    next_attempt_at = NOW() + INTERVAL %s SECOND
+                                WHERE id = %s
+                            """, (attempts, str(e)[:255], int(self._backoff(attempts)), row['id']))
+                            with self._lock:
+                                self._retried += 1
+                        db.commit()
+                        continue
+
+                    sent_now[recipient] = sent_now.get(recipient, 0) + 1
+                    cursor.execute("""
+                        UPDATE notification_queue
+                        SET status = 'sent', attempts = attempts + 1, provider_id = %s,
+                            sent_at = NOW(), locked_at = NULL
+                        WHERE id = %s
+                    """, (provider_id, row['id']))
+                    db.commit()
+                    with self._lock:
+                        self._sent += 1
+                    logger.info(f"Notification {row['id']} sent to {recipient}: {provider_id}")
+
+                return len(rows)
+            finally:
+                cursor.close()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "sent": self._sent,
+                "retried": self._retried,
+                "failed": self._failed,
+                "throttled": self._throttled
+            }
@@ -0,0 +1,217 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+import requests.adapters
+
+logger = logging.getLogger(__name__)
+
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent"
+
+QUESTION_PROMPT = """Generate 5 random questions about {subject_name}.
+                                Include a mix of:
+                                - Easy questions (basic understanding)
+                                - Medium questions (application-based)
+                                - Hard questions (analysis and problem-solving)
+                                Make each question different in difficulty and concept.
+                                Return only the questions, one per line."""
+
+
+class GeminiQuestionProvider:
+    """
+    Gemini client sharing one keep-alive session across generator threads.
+    `timeout` is the per-call deadline.
+    """
+
+    def __init__(self, api_key, timeout=10, max_connections=4):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount('https://', adapter)
+
+    def generate(self, subject_name):
+        headers = {
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "contents": [{
+                "parts": [{
+                    "text": QUESTION_PROMPT.format(subject_name=subject_name)
+                }]
+            }]
+        }
+
+        logger.info(f"Sending request to Gemini API for {subject_name}")
+        response = self.session.post(
+            f"{GEMINI_URL}?key={self.api_key}",
+            headers=headers,
+            json=payload,
+            timeout=self.timeout
+        )
+        logger.info(f"Gemini API response status: {response.status_code}")
+        response.raise_for_status()
+
+        response_json = response.json()
+        questions = response_json.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '').strip().split('\n')
+        return [q.strip() for q in questions if q.strip()][:5]
+
+
+class StubQuestionProvider:
+    """
+    Offline provider used when no API key is configured and in tests.
+    """
+
+    def generate(self, subject_name):
+        return [
+            f"Define the basic terminology used in {subject_name}.",
+            f"Explain one core concept of {subject_name} with an example.",
+            f"Apply a {subject_name} technique to solve a simple problem.",
+            f"Compare two approaches used in {subject_name} and their trade-offs.",
+            f"Analyze a real-world problem using ideas from {subject_name}."
+        ]
+
+
+class QuestionBank:
+    """
+    Per-subject cache of generated questions, so regenerating a recovery
+    assignment within `ttl` seconds reuses the previous output.
+    """
+
+    def __init__(self, ttl=7 * 24 * 3600):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject_id):
+        with self._lock:
+            entry = self._entries.get(subject_id)
+            if entry and entry[0] > time.time():
+                return entry[1]
+            self._entries.pop(subject_id, None)
+            return None
+
+    def put(self, subject_id, questions):
+        with self._lock:
+            self._entries[subject_id] = (time.time() + self.ttl, questions)
+
+
+class RecoveryAssignmentGenerator:
+    """
+    Creates recovery assignments in the background. Generation fans out
+    across subjects with at most `max_concurrency` provider calls at once.
+    At most one generation per subject is in flight at a time; subjects that
+    already have an assignment from the last 7 days are skipped.
+    `on_created(subject_id, assignment_id)` is called after each commit.
+    """
+
+    def __init__(self, pool, provider, question_bank, max_concurrency=4, on_created=None):
+        self.pool = pool
+        self.provider = provider
+        self.question_bank = question_bank
+        self.on_created = on_created
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='recovery')
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, subject_id, subject_name):
+        with self._lock:
+            future = self._in_flight.get(subject_id)
+            if future is None:
+                future = self._executor.submit(self._generate, subject_id, subject_name)
+                self._in_flight[subject_id] = future
+                future.add_done_callback(lambda f: self._finished(subject_id))
+            return future
+
+    def generate_many(self, subjects, budget):
+        """
+        Schedule generation for every (subject_id, subject_name) pair and wait
+        up to `budget` seconds. Returns {subject_id: assignment_id} for the
+        subjects that finished in time; the rest keep running in the
+        background.
+        """
+        futures = {self.schedule(subject_id, subject_name): subject_id
+                   for subject_id, subject_name in subjects}
+        done, _ = wait(futures, timeout=budget)
+
+        finished = {}
+        for future in done:
+            try:
+                assignment_id = future.result()
+            except Exception:
+                continue
+            if assignment_id:
+                finished[futures[future]] = assignment_id
+        return finished
+
+    def _finished(self, subject_id):
+        with self._lock:
+            self._in_flight.pop(subject_id, None)
+
+    def _has_recent_assignment(self, cursor, subject_id, lock=False):
+        if lock:
+            # Serialize creation per subject across processes
+            cursor.execute("SELECT id FROM subjects WHERE id = %s FOR UPDATE", (subject_id,))
+            cursor.fetchall()
+        cursor.execute("""
+            SELECT id FROM assignments
+            WHERE subject_id = %s
+            AND created_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+            LIMIT 1
+        """, (subject_id,))
+        return cursor.fetchone() is not None
+
+    def _generate(self, subject_id, subject_name):
+        try:
+            with self.pool.acquire() as db:
+                cursor = db.cursor()
+                try:
+                    if self._has_recent_assignment(cursor, subject_id):
+                        return None
+                finally:
+                    cursor.close()
+
+            # No connection is held while waiting on the provider
+            questions = self.question_bank.get(subject_id)
+            if questions is None:
+                logger.info(f"Generating new assignment for {subject_name}")
+                questions = self.provider.generate(subject_name)
+                if not questions:
+                    logger.error(f"No questions generated for {subject_name}")
+                    return None
+                self.question_bank.put(subject_id, questions)
+
+            with self.pool.acquire() as db:
+                cursor = db.cursor()
+                try:
+                    if self._has_recent_assignment(cursor, subject_id, lock=True):
+                        db.rollback()
+                        return None
+                    cursor.execute("""
+                        INSERT INTO assignments
+                        (subject_id, title, description, due_date, status, created_at)
+                        VALUES (%s, %s, %s, DATE_ADD(CURDATE(), INTERVAL 7 DAY), 'pending', CURDATE())
+                    """, (
+                        subject_id,
+                        f"Recovery Assignment - {subject_name}",
+                        json.dumps(questions)
+                    ))
+                    db.commit()
+                    assignment_id = cursor.lastrowid
+                    logger.info(f"Recovery assignment {assignment_id} created for {subject_name}")
+                finally:
+                    cursor.close()
+
+            if self.on_created:
+                self.on_created(subject_id, assignment_id)
+            return assignment_id
+        except Exception as e:
+            logger.error(f"Error generating recovery assignment for {subject_name}: {e}")
+            raise
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,242 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseVersions:
+    """
+    Tag versions in the cache_versions table (migrations/0010), so every
+    process using the database sees every invalidation. A tag without a row
+    is at version 0.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        with self.pool.acquire() as db:
+            cursor = db.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT tag, version FROM cache_versions
+                    WHERE tag IN ({', '.join(['%s'] * len(tags))})
+                """, list(tags))
+                found = dict(cursor.fetchall())
+            finally:
+                cursor.close()
+        return [found.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self.pool.acquire() as db:
+            cursor = db.cursor()
+            try:
+                # Sorted so concurrent bumps lock rows in the same order
+                cursor.executemany("""
+                    INSERT INTO cache_versions (tag, version)
+                    VALUES (%s, 1)
+                    ON DUPLICATE KEY UPDATE version = version + 1
+                """, [(tag,) for tag in sorted(set(tags))])
+                db.commit()
+            finally:
+                cursor.close()
+
+
+class MemoryBackend:
+    """
+    In-process LRU store with per-entry TTL. Tag versions live in a separate
+    map that is never evicted, so an invalidation cannot be forgotten; with
+    `versions` (e.g. DatabaseVersions) they are kept there instead, and an
+    invalidation reaches the entries of every process.
+    """
+
+    def __init__(self, max_entries=5000, versions=None):
+        self.max_entries = max_entries
+        self.shared_versions = versions
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tags):
+        if self.shared_versions is not None:
+            return self.shared_versions.versions(tags)
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        if self.shared_versions is not None:
+            self.shared_versions.bump(tags)
+            return
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared store for multi-worker deployments. `client` is a redis.Redis (or
+    anything with the same get / set / mget / incr calls); Redis' own
+    maxmemory-policy allkeys-lru does the LRU part.
+    """
+
+    def __init__(self, client, prefix='response-cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        return [int(v or 0) for v in self.client.mget([self.prefix + 'tag:' + tag for tag in tags])]
+
+    def bump(self, tags):
+        for tag in tags:
+            self.client.incr(self.prefix + 'tag:' + tag)
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """
+    Caches successful JSON responses of GET views. Every entry is tagged
+    (e.g. "student:3"); invalidating a tag bumps its version, which is part
+    of the cache key, so all entries carrying the tag are skipped from then
+    on and age out of the backend by LRU / TTL.
+    """
+
+    def __init__(self, backend, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._errors = 0
+
+    def cached(self, tags, ttl=None):
+        """
+        Decorator for a view. `tags` maps the request args to the entry's
+        tags; returning None (e.g. a required arg is missing) bypasses the
+        cache.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                entry_tags = tags(request.args)
+                if entry_tags is None:
+                    return view(*args, **kwargs)
+
+                key = None
+                try:
+                    versions = self.backend.versions(entry_tags)
+                    params = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+                    key = f"{request.path}?{params}|" + ','.join(
+                        f"{tag}@{version}" for tag, version in zip(entry_tags, versions)
+                    )
+                    body = self.backend.get(key)
+                except Exception as e:
+                    # A broken cache must not take the endpoint down
+                    logger.error(f"Response cache lookup failed: {e}")
+                    self._count('_errors')
+                    return view(*args, **kwargs)
+
+                if body is not None:
+                    self._count('_hits')
+                    response = Response(body, mimetype='application/json')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count('_misses')
+                response = view(*args, **kwargs)
+                status = 200
+                if isinstance(response, tuple):
+                    response, status = response[0], response[1]
+                if status == 200 and response.status_code == 200:
+                    try:
+                        self.backend.set(key, response.get_data(), ttl or self.default_ttl)
+                    except Exception as e:
+                        logger.error(f"Response cache store failed: {e}")
+                        self._count('_errors')
+                    response.headers['X-Cache'] = 'MISS'
+                    return response
+                return response, status
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            return
+        try:
+            self.backend.bump(tags)
+            self._count('_invalidations', len(tags))
+        except Exception as e:
+            logger.error(f"Response cache invalidation failed for {tags}: {e}")
+            self._count('_errors')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def metrics(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": self.backend.size(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else None,
+                "invalidations": self._invalidations,
+                "errors": self._errors
+            }
+
+
+def create_backend(redis_url=None, max_entries=5000, pool=None):
+    """
+    A shared Redis backend when `redis_url` is set (the redis package is then
+    required). Otherwise a memory backend, whose tag versions live in the
+    database when `pool` is given; without either, invalidations only reach
+    the current process, which is only correct for a single-process server.
+    """
+    if redis_url:
+        import redis
+        return RedisBackend(redis.Redis.from_url(redis_url))
+    versions = DatabaseVersions(pool) if pool is not None else None
+    return MemoryBackend(max_entries=max_entries, versions=versions)
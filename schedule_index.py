@@ -0,0 +1,179 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _seconds(value):
+    # mysql-connector returns TIME columns as timedelta
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _format_time(seconds):
+    return (datetime.min + timedelta(seconds=seconds)).strftime('%I:%M %p')
+
+
+class ScheduleIndex:
+    """
+    In-memory timetable keyed by (class_id, day_of_week) with slots sorted
+    by start time, so resolving the current class is a bisect instead of a
+    multi-join query. The index loads lazily, reloads after `ttl` seconds
+    and can be dropped explicitly with `invalidate()`.
+
+    With `versions` (response_cache.DatabaseVersions), `invalidate()` bumps
+    the shared "schedule" tag and every process checks it at most every
+    `check_interval` seconds, so a reload reaches all gunicorn workers and
+    the monitoring WebSocket server.
+    """
+
+    VERSION_TAG = 'schedule'
+
+    def __init__(self, pool, ttl=600, versions=None, check_interval=10):
+        self.pool = pool
+        self.ttl = ttl
+        self.versions = versions
+        self.check_interval = check_interval
+
+        # (slots, starts), replaced as a whole so readers never mix two loads
+        self._index = ({}, {})
+        self._student_classes = {}
+        self._loaded_at = None
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+            self._student_classes = {}
+        if self.versions is not None:
+            self.versions.bump([self.VERSION_TAG])
+
+    def load(self):
+        with self._lock:
+            self._load(self._shared_version())
+
+    def _shared_version(self):
+        if self.versions is None:
+            return None
+        self._checked_at = time.monotonic()
+        return self.versions.versions([self.VERSION_TAG])[0]
+
+    def _is_fresh(self):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.ttl:
+            return False
+        return self.versions is None or now - self._checked_at < self.check_interval
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            unexpired = self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+            try:
+                version = self._shared_version()
+            except Exception as e:
+                if not unexpired:
+                    raise
+                # Keep serving the loaded timetable; checked again next interval
+                logger.warning(f"Schedule version check failed: {e}")
+                return
+            if unexpired and version == self._version:
+                return
+            self._load(version)
+
+    def _load(self, version=None):
+        with self.pool.acquire() as db:
+            cursor = db.cursor(dictionary=True)
+            try:
+                cursor.execute("""
+                    SELECT
+                        s.id as subject_id,
+                        s.name as subject_name,
+                        s.code as subject_code,
+                        s.class_id,
+                        t.id as teacher_id,
+                        t.name as teacher_name,
+                        ss.day_of_week,
+                        ss.start_time,
+                        ss.end_time
+                    FROM subject_schedule ss
+                    JOIN subjects s ON ss.subject_id = s.id
+                    LEFT JOIN teachers t ON s.teacher_id = t.id
+                """)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+
+        slots = {}
+        for row in rows:
+            start, end = _seconds(row['start_time']), _seconds(row['end_time'])
+            slots.setdefault((row['class_id'], row['day_of_week']), []).append({
+                "subject_id": row['subject_id'],
+                "subject_name": row['subject_name'],
+                "subject_code": row['subject_code'],
+                "teacher_id": row['teacher_id'],
+                "teacher_name": row['teacher_name'],
+                "day_of_week": row['day_of_week'],
+                "day_name": DAYS[row['day_of_week'] - 1],
+                "start": start,
+                "end": end,
+                "formatted_start_time": _format_time(start),
+                "formatted_end_time": _format_time(end)
+            })
+        for day_slots in slots.values():
+            day_slots.sort(key=lambda slot: slot['start'])
+
+        starts = {key: [slot['start'] for slot in day_slots] for key, day_slots in slots.items()}
+        self._index = (slots, starts)
+        self._student_classes = {}
+        self._version = version
+        self._loaded_at = time.monotonic()
+        logger.info(f"Schedule index loaded: {len(rows)} slots for {len(slots)} class-days")
+
+    def current_class(self, class_id, at=None):
+        """
+        Return the slot running for `class_id` at `at` (default now), or None.
+        """
+        self._ensure_loaded()
+        at = at or datetime.now()
+        key = (int(class_id), at.weekday() + 1)
+        slots, starts = self._index
+        starts = starts.get(key)
+        if not starts:
+            return None
+
+        now = at.hour * 3600 + at.minute * 60 + at.second
+        day_slots = slots[key]
+        i = bisect.bisect_right(starts, now) - 1
+        while i >= 0:
+            if day_slots[i]['start'] <= now <= day_slots[i]['end']:
+                return dict(day_slots[i])
+            i -= 1
+        return None
+
+    def student_class(self, cursor, student_id):
+        """
+        Cached student -> class_id lookup; `cursor` is only used on a miss.
+        The cache is emptied whenever the timetable reloads, so a student
+        moved to another class is picked up within `ttl` seconds.
+        """
+        self._ensure_loaded()
+        student_id = int(student_id)
+        if student_id in self._student_classes:
+            return self._student_classes[student_id]
+        cursor.execute("SELECT class_id FROM students WHERE id = %s", (student_id,))
+        row = cursor.fetchone()
+        class_id = row['class_id'] if row else None
+        if row:
+            self._student_classes[student_id] = class_id
+        return class_id
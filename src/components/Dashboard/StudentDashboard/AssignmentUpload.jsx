@@ -12,6 +12,43 @@ import {
 } from '@mui/material';
 import { CloudUpload as UploadIcon } from '@mui/icons-material';
 
+const UPLOADS_URL = 'http://localhost:5000/student/uploads';
+const CHUNK_RETRIES = 3;
+
+// Resumable upload: the file goes up in server-sized chunks, and a failed
+// chunk is retried from the offset the server reports
+const uploadInChunks = async (file, studentId, assignmentId) => {
+  const started = await axios.post(UPLOADS_URL, {
+    student_id: studentId,
+    assignment_id: assignmentId,
+    filename: file.name,
+    size: file.size
+  });
+  const { upload_id: uploadId, chunk_size: chunkSize } = started.data.data;
+
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    try {
+      const response = await axios.put(
+        `${UPLOADS_URL}/${uploadId}`,
+        file.slice(offset, offset + chunkSize),
+        { headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': offset } }
+      );
+      offset = response.data.data.offset;
+      retries = 0;
+    } catch (error) {
+      const status = error.response?.status;
+      if (status && status !== 409 && status < 500) throw error;
+      if (++retries > CHUNK_RETRIES) throw error;
+      const resumed = await axios.get(`${UPLOADS_URL}/${uploadId}`);
+      offset = resumed.data.data.offset;
+    }
+  }
+
+  return axios.post(`${UPLOADS_URL}/${uploadId}/complete`);
+};
+
 const AssignmentUpload = () => {
   const [assignments, setAssignments] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -23,7 +60,7 @@ const AssignmentUpload = () => {
     fetchRecoveryAssignments();
   }, []);
 
-  const fetchRecoveryAssignments = async () => {
+  const fetchRecoveryAssignments = async (retries = 3) => {
     try {
       setLoading(true);
       const user = JSON.parse(localStorage.getItem('user'));
@@ -31,15 +68,13 @@ const AssignmentUpload = () => {
         throw new Error('User data not found');
       }
 
-      // First fetch attendance to check for consecutive absences
-      const attendanceResponse = await axios.get(`http://localhost:5000/student/attendance`, {
+      // The cached summary says whether any subject is on an absence streak
+      const summaryResponse = await axios.get(`http://localhost:5000/student/attendance/summary`, {
         params: { student_id: user.role_id }
       });
 
-      if (attendanceResponse.data.status === 'success') {
-        // Check for consecutive absences
-        const absences = attendanceResponse.data.data.filter(record => record.status === 0);
-        if (absences.length >= 3) {
+      if (summaryResponse.data.status === 'success') {
+        if (summaryResponse.data.data.subjects.some(subject => subject.at_risk)) {
           // If there are consecutive absences, fetch recovery assignments
           const response = await axios.get(`http://localhost:5000/student/recovery-assignments`, {
             params: { student_id: user.role_id }
@@ -48,6 +83,10 @@ const AssignmentUpload = () => {
           if (response.data.status === 'success') {
             setAssignments(response.data.data);
             setError('');
+            // Some assignments are still being generated server-side
+            if (response.data.generating?.length && retries > 0) {
+              setTimeout(() => fetchRecoveryAssignments(retries - 1), 5000);
+            }
           }
         }
       }
@@ -79,11 +118,6 @@ const AssignmentUpload = () => {
     setError('');
     setSuccess('');
 
-    const formData = new FormData();
-    formData.append('file', file);
-    formData.append('student_id', JSON.parse(localStorage.getItem('user')).role_id);
-    formData.append('assignment_id', assignmentId);
-
     try {
       // First check if already submitted
       const checkResponse = await axios.get(
@@ -100,14 +134,10 @@ const AssignmentUpload = () => {
         return;
       }
 
-      const response = await axios.post(
-        'http://localhost:5000/student/submit-assignment',
-        formData,
-        {
-          headers: {
-            'Content-Type': 'multipart/form-data'
-          }
-        }
+      const response = await uploadInChunks(
+        file,
+        JSON.parse(localStorage.getItem('user')).role_id,
+        assignmentId
       );
 
       if (response.data.status === 'success') {
@@ -26,6 +26,8 @@ import axios from 'axios';
 
 const Attendance = () => {
   const [attendance, setAttendance] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [currentClass, setCurrentClass] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
@@ -33,6 +35,7 @@ const Attendance = () => {
 
   useEffect(() => {
     fetchAttendance();
+    fetchSummary();
     fetchCurrentClass();
     // Refresh current class every minute
     const interval = setInterval(fetchCurrentClass, 60000);
@@ -67,19 +70,39 @@ const Attendance = () => {
     }
   };
 
-  const fetchAttendance = async () => {
+  const fetchSummary = async () => {
     try {
       const user = JSON.parse(localStorage.getItem('user'));
       if (!user || !user.role_id) {
         throw new Error('User data not found');
       }
 
-      const response = await axios.get(`http://localhost:5000/student/attendance`, {
+      const response = await axios.get(`http://localhost:5000/student/attendance/summary`, {
         params: { student_id: user.role_id }
       });
 
       if (response.data.status === 'success') {
-        setAttendance(response.data.data);
+        setSummary(response.data.data);
+      }
+    } catch (err) {
+      console.error('Error fetching attendance summary:', err);
+    }
+  };
+
+  const fetchAttendance = async (cursor = null) => {
+    try {
+      const user = JSON.parse(localStorage.getItem('user'));
+      if (!user || !user.role_id) {
+        throw new Error('User data not found');
+      }
+
+      const response = await axios.get(`http://localhost:5000/student/attendance`, {
+        params: { student_id: user.role_id, cursor: cursor || undefined }
+      });
+
+      if (response.data.status === 'success') {
+        setAttendance(prev => cursor ? [...prev, ...response.data.data] : response.data.data);
+        setNextCursor(response.data.next_cursor);
       } else {
         setError('Failed to fetch attendance data');
       }
@@ -177,6 +200,37 @@ const Attendance = () => {
     ) : (
       <Typography>No ongoing class at the moment</Typography>
     )}
+      {summary && summary.subjects.length > 0 && (
+        <>
+          <Typography variant="h5" gutterBottom sx={{ mt: 2 }}>
+            Attendance Summary ({summary.overall.percentage}%)
+          </Typography>
+          <TableContainer component={Paper} sx={{ mb: 3 }}>
+            <Table size="small">
+              <TableHead>
+                <TableRow>
+                  <TableCell>Subject</TableCell>
+                  <TableCell>Present</TableCell>
+                  <TableCell>Percentage</TableCell>
+                  <TableCell>Absence Streak</TableCell>
+                </TableRow>
+              </TableHead>
+              <TableBody>
+                {summary.subjects.map((subject) => (
+                  <TableRow key={subject.subject_id}>
+                    <TableCell>{subject.subject}</TableCell>
+                    <TableCell>{subject.present_count} / {subject.total_count}</TableCell>
+                    <TableCell>{subject.percentage}%</TableCell>
+                    <TableCell sx={{ color: subject.at_risk ? 'error.main' : 'inherit' }}>
+                      {subject.current_streak}
+                    </TableCell>
+                  </TableRow>
+                ))}
+              </TableBody>
+            </Table>
+          </TableContainer>
+        </>
+      )}
       {/* Attendance History Table */}
       <Typography variant="h5" gutterBottom>
         Attendance Record
@@ -230,6 +284,11 @@ const Attendance = () => {
               ))}
             </TableBody>
           </Table>
+          {nextCursor && (
+            <Box sx={{ display: 'flex', justifyContent: 'center', p: 1 }}>
+              <Button onClick={() => fetchAttendance(nextCursor)}>Load more</Button>
+            </Box>
+          )}
         </TableContainer>
       )}
     </Box>
@@ -1,10 +1,20 @@
 import React, { useEffect, useRef, useState } from 'react';
-import axios from 'axios';
 import { Box, Typography, CircularProgress } from '@mui/material';
 
+// Frames are detected at 640px wide at most (DETECTION_CONFIG['preprocess']
+// in app.py), so there is no point uploading more than that
+const CAPTURE_WIDTH = 640;
+const CAPTURE_QUALITY = 0.8;
+// Frames go to the monitoring WebSocket server (monitor_ws.py), which replies
+// with verdicts and alerts and writes the monitoring logs itself
+const MONITOR_WS_URL = 'ws://localhost:5001/monitor';
+const RECONNECT_DELAY = 3000;
+
 const ClassMonitoring = () => {
   const videoRef = useRef(null);
   const isAnalyzing = useRef(false);
+  const socketRef = useRef(null);
+  const unmounted = useRef(false);
   const [status, setStatus] = useState('active');
   const [message, setMessage] = useState('');
   const [error, setError] = useState('');
@@ -30,106 +40,115 @@ const ClassMonitoring = () => {
     }
   };
 
+  const frameDone = () => {
+    isAnalyzing.current = false;
+    setIsProcessing(false);
+  };
+
+  const handleMessage = (message) => {
+    switch (message.type) {
+      case 'verdict':
+        setError('');
+        setStatus(message.expression);
+        // The server tracks inactivity and writes monitoring logs itself
+        setInactivityCount(Math.min(message.inactivity_count ?? 0, 5));
+        if (message.expression === 'active') {
+          setNotificationMessage('');
+        }
+        frameDone();
+        break;
+      case 'alert':
+        setNotificationMessage(message.message);
+        setTimeout(() => {
+          setNotificationMessage('');
+        }, 3000);
+        break;
+      case 'dropped':
+        // Server shed this frame under load; just try again on the next tick
+        frameDone();
+        break;
+      case 'error':
+        setError(message.message || 'Failed to analyze activity');
+        frameDone();
+        break;
+      default:
+        break;
+    }
+  };
+
+  const connectSocket = () => {
+    const user = JSON.parse(localStorage.getItem('user'));
+    const socket = new WebSocket(`${MONITOR_WS_URL}?student_id=${user?.role_id}`);
+    socketRef.current = socket;
+
+    socket.onmessage = (event) => handleMessage(JSON.parse(event.data));
+    socket.onclose = (event) => {
+      if (socketRef.current !== socket) return;
+      socketRef.current = null;
+      frameDone();
+      if (event.code === 1008) {
+        setError(event.reason || 'Monitoring connection refused');
+        return;
+      }
+      if (!unmounted.current) {
+        setTimeout(() => {
+          if (!unmounted.current) connectSocket();
+        }, RECONNECT_DELAY);
+      }
+    };
+  };
+
   const captureAndAnalyze = async () => {
-    if (isAnalyzing.current || isProcessing) return;
-    
+    const socket = socketRef.current;
+    if (isAnalyzing.current || socket?.readyState !== WebSocket.OPEN) return;
+
     try {
         isAnalyzing.current = true;
         setIsProcessing(true);
-        setError('');
-        
-        // Get current class info first
-        const user = JSON.parse(localStorage.getItem('user'));
-        const currentClassResponse = await axios.get('http://localhost:5000/current-class', {
-            params: { student_id: user?.role_id }
-        });
-         // Get the current subject_id if there's an ongoing class
-        const subject_id = currentClassResponse.data?.data?.subject_id;
-        
+
         // Create canvas and capture image
         const video = videoRef.current;
         const canvas = document.createElement('canvas');
-        canvas.width = video.videoWidth;
-        canvas.height = video.videoHeight;
-        
+        const scale = Math.min(1, CAPTURE_WIDTH / video.videoWidth);
+        canvas.width = Math.round(video.videoWidth * scale);
+        canvas.height = Math.round(video.videoHeight * scale);
+
         const context = canvas.getContext('2d');
         context.drawImage(video, 0, 0, canvas.width, canvas.height);
-        
-        const blob = await new Promise(resolve => 
-            canvas.toBlob(resolve, 'image/jpeg', 0.95)
-        );
-        
-        const formData = new FormData();
-        formData.append('image', blob, 'capture.jpg');
-        formData.append('student_id', user?.role_id);
-        formData.append('inactivity_count', inactivityCount.toString());
-         const response = await axios.post(
-            'http://localhost:5000/analyze-stream',
-            formData,
-            {
-                headers: {
-                    'Content-Type': 'multipart/form-data',
-                },
-                timeout: 10000
-            }
+
+        const blob = await new Promise(resolve =>
+            canvas.toBlob(resolve, 'image/jpeg', CAPTURE_QUALITY)
         );
-         if (response.data.status === 'success') {
-            setStatus(response.data.expression);
-            
-            // Store monitoring log if there's an ongoing class
-            if (subject_id) {
-                await axios.post('http://localhost:5000/store-monitoring-log', {
-                    student_id: user?.role_id,
-                    subject_id: subject_id,
-                    status: response.data.expression
-                });
-            }
-             if (response.data.notification_sent) {
-                setNotificationMessage(response.data.notification_message);
-                setInactivityCount(0);
-                setTimeout(() => {
-                    setNotificationMessage('');
-                }, 3000);
-            } else if (response.data.expression === 'inactive') {
-                if (inactivityCount < 5) {
-                    setInactivityCount(prevCount => prevCount + 1);
-                }
-            } else {
-                setInactivityCount(0);
-                setNotificationMessage('');
-            }
-        } else {
-            setError(response.data.message || 'Analysis failed');
-        }
-        
+
+        // The reply (verdict, dropped or error) releases isAnalyzing
+        socket.send(blob);
     } catch (error) {
-        console.error('Analysis error:', error);
-        setError(error.response?.data?.message || 'Failed to analyze activity');
-    } finally {
-        isAnalyzing.current = false;
-        setIsProcessing(false);
+        console.error('Capture error:', error);
+        setError('Failed to capture frame');
+        frameDone();
     }
 };
 
-// Update the useEffect to handle the interval
 useEffect(() => {
+    unmounted.current = false;
     startVideoStream();
-    
-    // Only start interval if count is less than 5
+    connectSocket();
+
     const intervalId = setInterval(() => {
-        if (inactivityCount <= 5) {
-            captureAndAnalyze();
-        }
+        captureAndAnalyze();
     }, 5000);
 
     return () => {
+        unmounted.current = true;
         clearInterval(intervalId);
+        socketRef.current?.close();
+        socketRef.current = null;
         if (videoRef.current?.srcObject) {
             const tracks = videoRef.current.srcObject.getTracks();
             tracks.forEach(track => track.stop());
         }
     };
-}, [inactivityCount]); // Add inactivityCount as dependency
+}, []);
 
   return (
     <Box sx={{ p: 3 }}>
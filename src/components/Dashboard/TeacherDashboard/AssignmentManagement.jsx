@@ -232,7 +232,7 @@ const AssignmentManagement = () => {
               {submissionDetails.file_path && (
                 <Button
                   variant="contained"
-                  href={`http://localhost:5000/uploads/${submissionDetails.file_path}`}
+                  href={`http://localhost:5000/submissions/${submissionDetails.submission_id}/file?teacher_id=${JSON.parse(localStorage.getItem('user') || '{}').role_id}`}
                   target="_blank"
                   sx={{ mt: 2 }}
                 >
@@ -34,6 +34,9 @@ const AttendanceManagement = () => {
   const [showLogsDialog, setShowLogsDialog] = useState(false);
   const [selectedLogs, setSelectedLogs] = useState([]);
   const [monitoringLogs, setMonitoringLogs] = useState([]);
+  const [monitoringSummary, setMonitoringSummary] = useState(null);
+  const [logsQuery, setLogsQuery] = useState(null);
+  const [logsCursor, setLogsCursor] = useState(null);
 
   useEffect(() => {
     fetchAttendanceRequests();
@@ -149,21 +152,42 @@ const AttendanceManagement = () => {
         const user = getTeacherInfo();
         if (!user) return;
 
+        const params = {
+            student_id: studentId,
+            subject_id: subjectId,
+            date: selectedDate.toISOString().split('T')[0],
+            teacher_id: user.role_id
+        };
+
+        // The summary comes pre-aggregated; raw logs are fetched a page at a time
+        const [summaryResponse, logsResponse] = await Promise.all([
+            axios.get("http://localhost:5000/teacher/monitoring-summary", { params }),
+            axios.get("http://localhost:5000/teacher/monitoring-logs", { params })
+        ]);
+
+        if (summaryResponse.data.status === "success" && logsResponse.data.status === "success") {
+            setMonitoringSummary(summaryResponse.data.data);
+            setSelectedLogs(logsResponse.data.data);
+            setLogsQuery(params);
+            setLogsCursor(logsResponse.data.next_cursor);
+            setShowLogsDialog(true);
+        }
+    } catch (error) {
+        console.error("Error fetching logs:", error);
+        setError("Failed to fetch monitoring logs");
+    }
+};
+
+  const loadMoreLogs = async () => {
+    try {
         const response = await axios.get(
             "http://localhost:5000/teacher/monitoring-logs",
-            {
-                params: {
-                    student_id: studentId,
-                    subject_id: subjectId,
-                    date: selectedDate.toISOString().split('T')[0],
-                    teacher_id: user.role_id  // Add this line
-                },
-            }
+            { params: { ...logsQuery, cursor: logsCursor } }
         );
 
         if (response.data.status === "success") {
-            setSelectedLogs(response.data.data);
-            setShowLogsDialog(true);
+            setSelectedLogs((logs) => [...logs, ...response.data.data]);
+            setLogsCursor(response.data.next_cursor);
         }
     } catch (error) {
         console.error("Error fetching logs:", error);
@@ -199,6 +223,35 @@ const AttendanceManagement = () => {
       );
     }
   };
+  const handleBulkResponse = async (newStatus) => {
+    try {
+      const user = JSON.parse(localStorage.getItem("user"));
+      if (!user || !user.role_id) {
+        setError("User information not found");
+        return;
+      }
+
+      const pending = attendanceRequests.filter((r) => r.status === "pending");
+      if (pending.length === 0) return;
+
+      const response = await axios.post(
+        "http://localhost:5000/teacher/respond-attendance/bulk",
+        {
+          teacher_id: user.role_id,
+          responses: pending.map((r) => ({ request_id: r.id, status: newStatus })),
+        }
+      );
+
+      if (response.data.status === "success") {
+        setSuccess(response.data.message);
+        fetchAttendanceRequests();
+      }
+    } catch (error) {
+      setError(
+        error.response?.data?.message || `Failed to ${newStatus} requests`
+      );
+    }
+  };
   const LogsDialog = ({ open, onClose, logs }) => {
     return (
       <Dialog open={open} onClose={onClose} maxWidth="md" fullWidth>
@@ -263,6 +316,14 @@ const AttendanceManagement = () => {
             </MenuItem>
           ))}
         </TextField>
+        <Button
+          variant="contained"
+          color="success"
+          disabled={!attendanceRequests.some((r) => r.status === "pending")}
+          onClick={() => handleBulkResponse("approved")}
+        >
+          Approve all pending
+        </Button>
       </Box>
 
       {error && (
@@ -359,6 +420,35 @@ const AttendanceManagement = () => {
       >
         <DialogTitle>Student Monitoring Logs</DialogTitle>
         <DialogContent>
+          {monitoringSummary && monitoringSummary.summary.total > 0 && (
+            <Box sx={{ mb: 2 }}>
+              <Box sx={{ display: "flex", gap: 1, mb: 1 }}>
+                <Chip label={`Active ${monitoringSummary.summary.active_pct}%`} color="success" size="small" />
+                <Chip label={`Inactive ${monitoringSummary.summary.inactive_pct}%`} color="warning" size="small" />
+                <Chip label={`Not joined ${monitoringSummary.summary.not_joined_pct}%`} color="error" size="small" />
+              </Box>
+              <Table size="small">
+                <TableHead>
+                  <TableRow>
+                    <TableCell>{monitoringSummary.bucket_minutes}-minute window</TableCell>
+                    <TableCell>Active</TableCell>
+                    <TableCell>Inactive</TableCell>
+                    <TableCell>Not joined</TableCell>
+                  </TableRow>
+                </TableHead>
+                <TableBody>
+                  {monitoringSummary.timeline.map((bucket) => (
+                    <TableRow key={bucket.bucket_start}>
+                      <TableCell>{bucket.bucket_start.split(" ")[1]}</TableCell>
+                      <TableCell>{bucket.active_pct}%</TableCell>
+                      <TableCell>{bucket.inactive_pct}%</TableCell>
+                      <TableCell>{bucket.not_joined_pct}%</TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+            </Box>
+          )}
           <Box sx={{ width: "100%" }}>
             {selectedLogs.length === 0 ? (
               <Typography color="text.secondary">
@@ -394,6 +484,11 @@ const AttendanceManagement = () => {
                 </TableBody>
               </Table>
             )}
+            {logsCursor && (
+              <Button size="small" onClick={loadMoreLogs} sx={{ mt: 1 }}>
+                Load more
+              </Button>
+            )}
           </Box>
         </DialogContent>
         <DialogActions>
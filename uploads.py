@@ -0,0 +1,268 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = 64 * 1024
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    """
+    A chunk did not start where the upload currently ends; `offset` is where
+    the client has to resume from.
+    """
+
+    def __init__(self, offset):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+def copy_stream(stream, out, limit, digest=None):
+    """
+    Copy `stream` into `out` in BUFFER_SIZE reads, feeding `digest` on the
+    way. Raises UploadTooLarge as soon as more than `limit` bytes arrive.
+    Returns the number of bytes copied.
+    """
+    copied = 0
+    while True:
+        chunk = stream.read(BUFFER_SIZE)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if copied > limit:
+            raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+        if digest is not None:
+            digest.update(chunk)
+        out.write(chunk)
+
+
+class PartFile:
+    """
+    Writable temporary file in `directory` that hashes everything written to
+    it and raises UploadTooLarge once more than `limit` bytes arrive. Werkzeug
+    writes multipart file parts into it while parsing the request body (see
+    UploadStore.open_part); closing it before `UploadStore.receive` claims it
+    removes the file.
+    """
+
+    def __init__(self, directory, limit):
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        self._file = os.fdopen(fd, 'w+b')
+        self.limit = limit
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.claimed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            self.close()
+            raise UploadTooLarge(f"Upload exceeds {self.limit} bytes")
+        self.digest.update(data)
+        return self._file.write(data)
+
+    def close(self):
+        self._file.close()
+        if not self.claimed:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadStore:
+    """
+    Streams uploads to disk under `root`. Files are written to root/.partial
+    while their SHA-256 is computed, and never exceed `max_bytes`; keeping
+    the final location on the same filesystem makes moving them there an
+    atomic rename.
+
+    Besides one-shot `receive`, uploads can be resumable: `start` opens a
+    session, `append` adds chunks of at most `chunk_size` bytes at the
+    offset the client last saw, and `complete` hands back the finished file.
+    Session state lives on disk, so any server process can take the next
+    chunk; sessions untouched for `session_ttl` seconds are removed.
+    """
+
+    def __init__(self, root='uploads', max_bytes=25 * 1024 * 1024, chunk_size=1024 * 1024,
+                 session_ttl=24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+        self.partial_dir = os.path.join(root, '.partial')
+
+    def _ensure_dirs(self):
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def open_part(self):
+        """
+        A PartFile for a request body parser to stream a file part into.
+        """
+        self._ensure_dirs()
+        return PartFile(self.partial_dir, self.max_bytes)
+
+    def receive(self, stream):
+        """
+        Write `stream` to a temporary file, or take it over as is if it is a
+        PartFile already on disk. Returns (temp_path, size, sha256); the
+        caller must move or `discard` temp_path.
+        """
+        if isinstance(stream, PartFile):
+            stream.flush()
+            os.fsync(stream.fileno())
+            stream.claimed = True
+            stream.close()
+            return stream.path, stream.size, stream.digest.hexdigest()
+
+        self._ensure_dirs()
+        fd, temp_path = tempfile.mkstemp(dir=self.partial_dir, suffix='.upload')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                size = copy_stream(stream, out, self.max_bytes, digest)
+                out.flush()
+                os.fsync(out.fileno())
+        except BaseException:
+            self.discard(temp_path)
+            raise
+        return temp_path, size, digest.hexdigest()
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _paths(self, upload_id):
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise KeyError(upload_id)
+        base = os.path.join(self.partial_dir, upload_id)
+        return base + '.part', base + '.json'
+
+    def start(self, size, metadata):
+        """
+        Open a resumable upload of `size` bytes; `metadata` (JSON-able) is
+        returned again by `status` and `complete`. Returns the upload id.
+        """
+        if size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        self._ensure_dirs()
+        self.expire()
+
+        upload_id = uuid.uuid4().hex
+        data_path, meta_path = self._paths(upload_id)
+        open(data_path, 'wb').close()
+        fd, temp_path = tempfile.mkstemp(dir=self.partial_dir, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"size": size, "metadata": metadata}, f)
+        os.replace(temp_path, meta_path)
+        return upload_id
+
+    def status(self, upload_id):
+        """
+        {"offset", "size", "metadata"} of an open upload; KeyError if unknown.
+        """
+        data_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                session = json.load(f)
+            session['offset'] = os.path.getsize(data_path)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+        return session
+
+    def append(self, upload_id, offset, stream):
+        """
+        Add the chunk in `stream` at `offset`, which must be the current end
+        of the upload. Returns the new offset. Concurrent writers (a client
+        retrying while its first request is still running, possibly on
+        another server process) are serialized by a lock on the .part file,
+        and the offset is checked again once it is held.
+        """
+        session = self.status(upload_id)
+        if offset != session['offset']:
+            raise UploadOffsetMismatch(session['offset'])
+
+        data_path, _ = self._paths(upload_id)
+        try:
+            out = open(data_path, 'r+b')
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+        with out:
+            fcntl.flock(out.fileno(), fcntl.LOCK_EX)
+            current = os.fstat(out.fileno()).st_size
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+
+            limit = min(self.chunk_size, session['size'] - offset)
+            out.seek(offset)
+            try:
+                copy_stream(stream, out, limit)
+                out.flush()
+            except BaseException:
+                # Drop the partial chunk so the client can resend it
+                out.truncate(offset)
+                raise
+            return out.tell()
+
+    def complete(self, upload_id):
+        """
+        Close a fully received upload. Returns (temp_path, size, sha256,
+        metadata) like `receive`, plus the session metadata.
+        """
+        session = self.status(upload_id)
+        if session['offset'] != session['size']:
+            raise UploadOffsetMismatch(session['offset'])
+
+        data_path, meta_path = self._paths(upload_id)
+        digest = hashlib.sha256()
+        with open(data_path, 'rb') as f:
+            # Waits for an append still holding the file
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+            for chunk in iter(lambda: f.read(BUFFER_SIZE), b''):
+                digest.update(chunk)
+            os.fsync(f.fileno())
+        self.discard(meta_path)
+        return data_path, session['size'], digest.hexdigest(), session['metadata']
+
+    def abort(self, upload_id):
+        for path in self._paths(upload_id):
+            self.discard(path)
+
+    def expire(self):
+        """
+        Remove partial files and sessions older than `session_ttl`.
+        """
+        cutoff = time.time() - self.session_ttl
+        try:
+            entries = list(os.scandir(self.partial_dir))
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info(f"Removed {removed} expired partial uploads")
+        return removed